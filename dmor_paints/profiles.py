@@ -0,0 +1,142 @@
+"""
+Settings profiles picked by environment variables (see settings.py).
+
+Each helper turns a short profile name into the matching Django settings,
+so settings.py and the benchmarks (which switch profiles at run time)
+use the same definitions.
+"""
+
+SESSION_ENGINES = {
+    # every request with a session reads it from the database
+    "db": "django.contrib.sessions.backends.db",
+    # reads from the cache, writes through to the database
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    # cache only: sessions are lost when the cache is cleared
+    "cache": "django.contrib.sessions.backends.cache",
+    # no server-side storage at all, the session lives in a signed cookie
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+MESSAGE_STORAGES = {
+    # cookie, falling back to the session for messages too big for a cookie
+    "fallback": "django.contrib.messages.storage.fallback.FallbackStorage",
+    "cookie": "django.contrib.messages.storage.cookie.CookieStorage",
+    "session": "django.contrib.messages.storage.session.SessionStorage",
+}
+
+
+def _pick(table, name, setting):
+    try:
+        return table[name]
+    except KeyError:
+        raise ValueError(f"{setting}={name!r}, expected one of: {', '.join(table)}")
+
+
+def session_engine(name):
+    return _pick(SESSION_ENGINES, name, "DMOR_SESSIONS")
+
+
+def message_storage(name):
+    return _pick(MESSAGE_STORAGES, name, "DMOR_MESSAGES")
+
+
+def cache_settings(name, cache_dir):
+    """CACHES for "locmem" (per process) or "file" (shared by the processes of one host)."""
+    if name == "locmem":
+        backend = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    elif name == "file":
+        backend = {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(cache_dir),
+        }
+    else:
+        raise ValueError(f"DMOR_CACHE={name!r}, expected one of: locmem, file")
+    return {"default": backend}
+
+
+def _flag(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def sqlite_options(profile, env):
+    """
+    OPTIONS for the sqlite3 backend. "default" leaves SQLite as it comes;
+    "tuned" sets it up for several clerks working at once, on every new
+    connection (init_command):
+
+    - WAL journal: readers no longer block the writer and vice versa
+    - synchronous=NORMAL: safe with WAL, one fsync per checkpoint
+      instead of per commit
+    - busy timeout (DMOR_SQLITE_BUSY_TIMEOUT seconds, default 20): wait
+      for the write lock instead of failing with "database is locked"
+    - BEGIN IMMEDIATE for transactions: take the write lock up front, so
+      a transaction never has to upgrade a read lock (which fails at
+      once, whatever the timeout)
+    - temp_store=MEMORY, mmap_size (DMOR_SQLITE_MMAP_MB, default 128) and
+      cache_size (DMOR_SQLITE_CACHE_MB, default 32)
+    """
+    if profile == "default":
+        return {}
+    if profile != "tuned":
+        raise ValueError(f"DMOR_SQLITE={profile!r}, expected one of: default, tuned")
+
+    mmap_bytes = int(env.get("DMOR_SQLITE_MMAP_MB", 128)) * 1024 * 1024
+    cache_kib = int(env.get("DMOR_SQLITE_CACHE_MB", 32)) * 1024
+    return {
+        "init_command": (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA temp_store=MEMORY;"
+            f"PRAGMA mmap_size={mmap_bytes};"
+            f"PRAGMA cache_size=-{cache_kib};"  # negative = KiB
+        ),
+        "timeout": int(env.get("DMOR_SQLITE_BUSY_TIMEOUT", 20)),
+        "transaction_mode": "IMMEDIATE",
+    }
+
+
+def database_settings(env, base_dir):
+    """
+    DATABASES["default"] from the environment:
+
+    DMOR_DB=sqlite (default)    DMOR_DB_NAME (default <base_dir>/db.sqlite3)
+        DMOR_SQLITE             default | tuned, see sqlite_options()
+    DMOR_DB=postgres            DMOR_DB_NAME / _USER / _PASSWORD / _HOST / _PORT
+        DMOR_DB_CONN_MAX_AGE    seconds a connection is kept open (default 60)
+        DMOR_DB_POOL            use psycopg's connection pool instead of
+                                persistent connections (needs psycopg[pool])
+        DMOR_DB_POOL_MIN / _MAX pool size (default 2 / 10)
+    """
+    engine = env.get("DMOR_DB", "sqlite")
+
+    if engine == "sqlite":
+        return {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": env.get("DMOR_DB_NAME") or base_dir / "db.sqlite3",
+            "OPTIONS": sqlite_options(env.get("DMOR_SQLITE", "default"), env),
+        }
+
+    if engine in ("postgres", "postgresql"):
+        db = {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": env.get("DMOR_DB_NAME", "dmor_paints"),
+            "USER": env.get("DMOR_DB_USER", ""),
+            "PASSWORD": env.get("DMOR_DB_PASSWORD", ""),
+            "HOST": env.get("DMOR_DB_HOST", "localhost"),
+            "PORT": env.get("DMOR_DB_PORT", "5432"),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+        if _flag(env.get("DMOR_DB_POOL", "")):
+            # the pool hands out connections per request; Django requires
+            # CONN_MAX_AGE = 0 with it
+            db["CONN_MAX_AGE"] = 0
+            db["OPTIONS"]["pool"] = {
+                "min_size": int(env.get("DMOR_DB_POOL_MIN", 2)),
+                "max_size": int(env.get("DMOR_DB_POOL_MAX", 10)),
+            }
+        else:
+            db["CONN_MAX_AGE"] = int(env.get("DMOR_DB_CONN_MAX_AGE", 60))
+        return db
+
+    raise ValueError(f"DMOR_DB={engine!r}, expected one of: sqlite, postgres")
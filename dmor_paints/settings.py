@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .profiles import cache_settings, database_settings, message_storage, session_engine
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -75,14 +78,39 @@ WSGI_APPLICATION = 'dmor_paints.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DMOR_DB=sqlite (default) or DMOR_DB=postgres, see database_settings()
+# in dmor_paints/profiles.py for the connection / pooling variables.
+# DMOR_SQLITE=tuned turns on WAL, busy timeout and the other pragmas
+# (sqlite_options()).
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_settings(os.environ, BASE_DIR),
 }
 
 
+# Cache, sessions and flash messages
+# Picked by environment variables, see dmor_paints/profiles.py:
+#   DMOR_CACHE     locmem (default) | file   (file: DMOR_CACHE_DIR)
+#   DMOR_SESSIONS  db (default) | cached_db | cache | signed_cookies
+#   DMOR_MESSAGES  fallback (default) | cookie | session
+# cached_db with the locmem cache is only safe with a single server
+# process (each process caches its own copy); use the file cache when
+# running several workers on one host. The same goes for the BOM
+# explosion cache (operations/requirements.py): with locmem its entries
+# only live a few minutes, so BOM edits reach the other workers late.
+
+CACHES = cache_settings(
+    os.environ.get("DMOR_CACHE", "locmem"),
+    os.environ.get("DMOR_CACHE_DIR", BASE_DIR / ".cache"),
+)
+SESSION_ENGINE = session_engine(os.environ.get("DMOR_SESSIONS", "db"))
+MESSAGE_STORAGE = message_storage(os.environ.get("DMOR_MESSAGES", "fallback"))
+
+# Broker of the payment / factory change feed (operations/feed.py). The
+# local one only reaches clients served by the same process.
+CHANGE_FEED_BROKER = os.environ.get("DMOR_FEED_BROKER", "operations.feed.LocalBroker")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
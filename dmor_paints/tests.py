@@ -0,0 +1,114 @@
+import tempfile
+from pathlib import Path
+
+from django.contrib.messages import get_messages
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from operations.management.commands.bench_sqlite_locking import Command as LockBenchmark
+
+from .profiles import (
+    MESSAGE_STORAGES, SESSION_ENGINES, cache_settings, database_settings, message_storage, session_engine,
+    sqlite_options,
+)
+
+
+class SessionProfileTests(TestCase):
+    def test_profile_names(self):
+        self.assertEqual(session_engine("cached_db"), "django.contrib.sessions.backends.cached_db")
+        self.assertEqual(message_storage("cookie"), "django.contrib.messages.storage.cookie.CookieStorage")
+        self.assertEqual(cache_settings("file", "/tmp/x")["default"]["LOCATION"], "/tmp/x")
+        self.assertNotIn("LOCATION", cache_settings("locmem", "/tmp/x")["default"])
+
+    def test_unknown_names_name_the_variable(self):
+        for pick, setting in [(session_engine, "DMOR_SESSIONS"), (message_storage, "DMOR_MESSAGES"),
+                              (lambda name: cache_settings(name, "/tmp"), "DMOR_CACHE")]:
+            with self.subTest(setting=setting), self.assertRaisesMessage(ValueError, f"{setting}='redis'"):
+                pick("redis")
+
+    def test_flash_message_survives_the_redirect_with_every_profile(self):
+        for sessions in SESSION_ENGINES:
+            for msgs in MESSAGE_STORAGES:
+                with self.subTest(sessions=sessions, messages=msgs), override_settings(
+                    SESSION_ENGINE=session_engine(sessions), MESSAGE_STORAGE=message_storage(msgs)
+                ):
+                    response = Client().post(reverse("bom_production"), {"action": "clear_draft"}, follow=True)
+
+                    self.assertEqual(response.redirect_chain, [(reverse("bom_production"), 302)])
+                    self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ["Draft cleared."])
+
+
+class DatabaseProfileTests(TestCase):
+    base_dir = Path("/srv/dmor")
+
+    def test_sqlite_is_the_default(self):
+        db = database_settings({}, self.base_dir)
+
+        self.assertEqual(db["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(db["NAME"], self.base_dir / "db.sqlite3")
+        self.assertEqual(database_settings({"DMOR_DB_NAME": "/data/ops.db"}, self.base_dir)["NAME"], "/data/ops.db")
+
+    def test_postgres_keeps_connections_open(self):
+        env = {"DMOR_DB": "postgres", "DMOR_DB_NAME": "ops", "DMOR_DB_HOST": "db", "DMOR_DB_CONN_MAX_AGE": "300"}
+        db = database_settings(env, self.base_dir)
+
+        self.assertEqual(db["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual((db["NAME"], db["HOST"], db["PORT"]), ("ops", "db", "5432"))
+        self.assertEqual((db["CONN_MAX_AGE"], db["CONN_HEALTH_CHECKS"]), (300, True))
+        self.assertNotIn("pool", db["OPTIONS"])
+
+    def test_postgres_pool_turns_off_persistent_connections(self):
+        env = {"DMOR_DB": "postgresql", "DMOR_DB_POOL": "yes", "DMOR_DB_POOL_MAX": "20"}
+        db = database_settings(env, self.base_dir)
+
+        self.assertEqual(db["CONN_MAX_AGE"], 0)
+        self.assertEqual(db["OPTIONS"]["pool"], {"min_size": 2, "max_size": 20})
+        self.assertNotIn("pool", database_settings({**env, "DMOR_DB_POOL": "0"}, self.base_dir)["OPTIONS"])
+
+    def test_unknown_engine(self):
+        with self.assertRaisesMessage(ValueError, "DMOR_DB='mysql'"):
+            database_settings({"DMOR_DB": "mysql"}, self.base_dir)
+
+
+class SQLiteProfileTests(TestCase):
+    def test_default_leaves_sqlite_alone(self):
+        self.assertEqual(sqlite_options("default", {}), {})
+        with self.assertRaisesMessage(ValueError, "DMOR_SQLITE='fast'"):
+            sqlite_options("fast", {})
+
+    def test_tuned_options_follow_the_environment(self):
+        options = sqlite_options("tuned", {"DMOR_SQLITE_BUSY_TIMEOUT": "5", "DMOR_SQLITE_CACHE_MB": "8"})
+
+        self.assertEqual((options["timeout"], options["transaction_mode"]), (5, "IMMEDIATE"))
+        self.assertIn("PRAGMA cache_size=-8192;", options["init_command"])
+        self.assertIn(f"PRAGMA mmap_size={128 * 1024 * 1024};", options["init_command"])
+
+    def test_every_new_connection_is_tuned(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            settings = {
+                **connection.settings_dict,
+                "NAME": str(Path(tmp) / "tuned.sqlite3"),
+                "OPTIONS": sqlite_options("tuned", {"DMOR_SQLITE_BUSY_TIMEOUT": "7"}),
+            }
+            tuned = DatabaseWrapper(settings, alias="tuned")
+            try:
+                with tuned.cursor() as cursor:
+                    pragmas = {}
+                    for pragma in ("journal_mode", "synchronous", "temp_store", "busy_timeout"):
+                        cursor.execute(f"PRAGMA {pragma}")
+                        pragmas[pragma] = cursor.fetchone()[0]
+            finally:
+                tuned.close()
+
+        # synchronous 1 = NORMAL, temp_store 2 = MEMORY
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "temp_store": 2, "busy_timeout": 7000})
+        self.assertEqual(tuned.transaction_mode, "IMMEDIATE")
+
+    def test_lock_benchmark_holds_only_its_own_orders(self):
+        bench = LockBenchmark()
+        bench._order_ids = [101, 102, 103]
+
+        held = {bench._hold_data(worker, round_)["order_id"] for worker in range(4) for round_ in range(10)}
+        self.assertEqual(held, {101, 102, 103})
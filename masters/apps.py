@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MastersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'masters'
+
+    def ready(self):
+        from . import search
+        from .models import Product
+
+        search.register("product", Product)
@@ -0,0 +1,231 @@
+# masters/formulation.py
+"""
+Product Development formulation engine.
+
+A formulation (the items of one ProductDevelopment) is handled as columns:
+one list of Decimals per input field, all in item order. Derived columns
+and totals are computed in one pass over those columns:
+
+    amount = percent * rate
+    solid  = percent * solid_percent / 100
+    wt_ltr = percent / density          (0 when density <= 0)
+    sv     = solid / density            (0 when density <= 0)
+
+    total_volume       = sum(wt_ltr)
+    solid_volume_ratio = sum(solid) / total_volume * 100
+
+Same formulas as the JS on the product_development screen.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from .models import ProductDevelopmentItem
+
+ZERO = Decimal("0")
+HUNDRED = Decimal("100")
+ITEM_PLACES = Decimal("0.001")
+
+DERIVED_FIELDS = ["amount", "solid", "wt_ltr", "sv"]
+INPUT_FIELDS = ["percent", "sequence", "rate", "solid_percent", "density"]
+
+
+# largest accepted input per column (ProductDevelopmentItem max_digits - decimal_places)
+INPUT_LIMITS = {
+    "percent": Decimal("1e7"),
+    "rate": Decimal("1e9"),
+    "solid_percent": Decimal("1e7"),
+    "density": Decimal("1e7"),
+}
+
+
+class InvalidInput(ValueError):
+    """A posted grid / what-if value that is not a usable number; .field is the parameter name."""
+
+    def __init__(self, field, message):
+        super().__init__(f"{field}: {message}")
+        self.field = field
+
+
+def parse_input(raw, column, field, default=ZERO):
+    """Decimal for one input column from form text (blank = default); InvalidInput otherwise."""
+    s = str(raw if raw is not None else "").strip()
+    if not s:
+        return default
+    try:
+        value = Decimal(s)
+    except InvalidOperation:
+        raise InvalidInput(field, f"'{s}' is not a number")
+    if not value.is_finite():
+        raise InvalidInput(field, f"'{s}' is not a number")
+    if abs(value) >= INPUT_LIMITS[column]:
+        raise InvalidInput(field, f"'{s}' is out of range")
+    return value
+
+
+@dataclass
+class FormulationColumns:
+    """Input columns of a formulation, index-aligned with product_ids."""
+    product_ids: list = field(default_factory=list)
+    percent: list = field(default_factory=list)
+    sequence: list = field(default_factory=list)
+    rate: list = field(default_factory=list)
+    solid_percent: list = field(default_factory=list)
+    density: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @classmethod
+    def from_items(cls, items):
+        """Columns from saved ProductDevelopmentItem rows."""
+        cols = cls()
+        for it in items:
+            cols.product_ids.append(it.product_id)
+            cols.percent.append(it.percent or ZERO)
+            cols.sequence.append(it.sequence or 0)
+            cols.rate.append(it.rate or ZERO)
+            cols.solid_percent.append(it.solid_percent or ZERO)
+            cols.density.append(it.density or ZERO)
+        return cols
+
+    @classmethod
+    def from_post(cls, items, data):
+        """
+        Columns for the given items, read from the posted grid
+        (percent_<pid>, seq_<pid>, rate_<pid>, solidp_<pid>, dens_<pid>).
+        Blank cells count as 0; anything else that is not a number raises
+        InvalidInput.
+        """
+        cols = cls()
+        for it in items:
+            pid = it.product_id
+            raw_seq = (data.get(f"seq_{pid}") or "").strip()
+            try:
+                seq = int(raw_seq or 0)
+            except ValueError:
+                raise InvalidInput(f"seq_{pid}", f"'{raw_seq}' is not a whole number")
+            cols.product_ids.append(pid)
+            cols.percent.append(parse_input(data.get(f"percent_{pid}"), "percent", f"percent_{pid}"))
+            cols.sequence.append(seq)
+            cols.rate.append(parse_input(data.get(f"rate_{pid}"), "rate", f"rate_{pid}"))
+            cols.solid_percent.append(parse_input(data.get(f"solidp_{pid}"), "solid_percent", f"solidp_{pid}"))
+            cols.density.append(parse_input(data.get(f"dens_{pid}"), "density", f"dens_{pid}"))
+        return cols
+
+    def with_rates(self, rates):
+        """Copy of these columns with rates replaced from {product_id: rate}."""
+        return FormulationColumns(
+            product_ids=list(self.product_ids),
+            percent=list(self.percent),
+            sequence=list(self.sequence),
+            rate=[
+                parse_input(rates[pid], "rate", f"rate_{pid}", rate) if pid in rates else rate
+                for pid, rate in zip(self.product_ids, self.rate)
+            ],
+            solid_percent=list(self.solid_percent),
+            density=list(self.density),
+        )
+
+
+@dataclass
+class FormulationResult:
+    """Derived columns plus formulation totals."""
+    amount: list
+    solid: list
+    wt_ltr: list
+    sv: list
+    total_percent: Decimal
+    total_amount: Decimal
+    total_solid: Decimal
+    total_volume: Decimal
+    total_sv: Decimal
+    solid_volume_ratio: Decimal
+
+    def rows(self, cols):
+        """Per-product dicts, handy for JSON responses."""
+        return [
+            {
+                "product_id": pid,
+                "rate": str(cols.rate[i]),
+                "amount": str(self.amount[i]),
+                "solid": str(self.solid[i]),
+                "wt_ltr": str(self.wt_ltr[i]),
+                "sv": str(self.sv[i]),
+            }
+            for i, pid in enumerate(cols.product_ids)
+        ]
+
+
+def compute(cols):
+    """Compute all derived columns and totals in one pass."""
+    amount, solid, wt_ltr, sv = [], [], [], []
+    total_percent = total_amount = total_solid = total_volume = total_sv = ZERO
+
+    for percent, rate, solid_p, dens in zip(cols.percent, cols.rate, cols.solid_percent, cols.density):
+        a = (percent * rate).quantize(ITEM_PLACES)
+        s = (percent * solid_p / HUNDRED).quantize(ITEM_PLACES) if solid_p else ZERO
+        if dens > 0:
+            w = (percent / dens).quantize(ITEM_PLACES)
+            v = (s / dens).quantize(ITEM_PLACES)
+        else:
+            w = v = ZERO
+
+        amount.append(a)
+        solid.append(s)
+        wt_ltr.append(w)
+        sv.append(v)
+
+        total_percent += percent
+        total_amount += a
+        total_solid += s
+        total_volume += w
+        total_sv += v
+
+    ratio = (total_solid / total_volume) * HUNDRED if total_volume > 0 else ZERO
+
+    return FormulationResult(
+        amount=amount,
+        solid=solid,
+        wt_ltr=wt_ltr,
+        sv=sv,
+        total_percent=total_percent,
+        total_amount=total_amount,
+        total_solid=total_solid,
+        total_volume=total_volume,
+        total_sv=total_sv,
+        solid_volume_ratio=ratio,
+    )
+
+
+def save(items, cols, result):
+    """
+    Write inputs + derived values back onto items (same order as cols)
+    with a single bulk_update.
+    """
+    for i, it in enumerate(items):
+        it.percent = cols.percent[i]
+        it.sequence = cols.sequence[i]
+        it.rate = cols.rate[i]
+        it.solid_percent = cols.solid_percent[i]
+        it.density = cols.density[i]
+        it.amount = result.amount[i]
+        it.solid = result.solid[i]
+        it.wt_ltr = result.wt_ltr[i]
+        it.sv = result.sv[i]
+
+    if items:
+        ProductDevelopmentItem.objects.bulk_update(
+            items, INPUT_FIELDS + DERIVED_FIELDS, batch_size=500
+        )
+
+
+def what_if(development, rates):
+    """
+    Re-price a saved formulation against new rates without writing anything.
+
+    rates = {product_id: rate}; products not in rates (or with a blank
+    rate) keep their saved rate. Returns (columns, result); InvalidInput
+    for a rate that is not a number.
+    """
+    cols = FormulationColumns.from_items(development.items.all()).with_rates(rates)
+    return cols, compute(cols)
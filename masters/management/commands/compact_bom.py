@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from masters.models import ProductBOMItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove zero-percent ProductBOMItem rows. BOM lines are stored sparse "
+        "now, older saves created a row for every product."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows would be removed.",
+        )
+
+    def handle(self, *args, **options):
+        zero_lines = ProductBOMItem.objects.filter(percent=0)
+
+        if options["dry_run"]:
+            self.stdout.write(f"{zero_lines.count()} zero-percent BOM line(s) would be removed.")
+            return
+
+        with transaction.atomic():
+            deleted, _ = zero_lines.delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} zero-percent BOM line(s)."))
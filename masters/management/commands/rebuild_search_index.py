@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from masters import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the product search index (name / code). Needed after bulk "
+        "loads that skip post_save, e.g. bulk_create or raw SQL imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kinds",
+            nargs="*",
+            help="Only these kinds (product, master_product). Default: all.",
+        )
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError(
+                "No search index on this database (needs SQLite with FTS5); searches use icontains."
+            )
+        with transaction.atomic():
+            counts = search.rebuild(options["kinds"] or None)
+        for kind, count in counts.items():
+            self.stdout.write(f"{kind:<16} {count} row(s)")
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from masters import search
+
+
+def forwards(apps, schema_editor):
+    search.create_table(schema_editor)
+    if search.SEARCH_TABLE in schema_editor.connection.introspection.table_names():
+        search.populate("product", apps.get_model("masters", "Product"), using=schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    search.drop_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0012_productdevelopmentitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,234 @@
+# masters/search.py
+"""
+Product search over name / code.
+
+On SQLite the names live in an FTS5 table with the trigram tokenizer
+(`product_search`), so "contains" searches are index lookups instead of
+LIKE '%q%' scans. One table serves every searchable model; rows are
+tagged with a `kind` ("product", "master_product", ...) and kept in sync
+by post_save / post_delete receivers set up by register().
+
+Results are ranked: name/code starting with the query first, then a
+word in the name starting with it, then everything else.
+
+Where the table does not exist (other databases, SQLite without FTS5)
+everything falls back to icontains.
+"""
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+SEARCH_TABLE = "product_search"
+MIN_TRIGRAM = 3  # shorter terms cannot use the trigram index
+INDEX_BATCH_SIZE = 1000
+LIKE = "LIKE %s ESCAPE '\\'"  # for patterns built with _like()
+
+# kind -> (model, name field, code field or None)
+_registry = {}
+_available = False
+
+
+def create_table(schema_editor):
+    """Create the FTS5 table (SQLite only). Used by the migrations."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "name, code, kind UNINDEXED, object_id UNINDEXED, tokenize='trigram')"
+        )
+    except DatabaseError:
+        pass  # no FTS5 / trigram in this SQLite build: icontains fallback
+
+
+def drop_table(schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def available():
+    """True when the FTS table exists on the default database."""
+    global _available
+    if not _available:
+        # only a hit is remembered: the table may be created later on (migrate)
+        _available = (
+            connection.vendor == "sqlite"
+            and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _available
+
+
+# -------------------------------------------------------------------
+# Index maintenance
+# -------------------------------------------------------------------
+def register(kind, model, name_field="name", code_field=None):
+    """Make model searchable as kind and keep its rows in sync."""
+    _registry[kind] = (model, name_field, code_field)
+
+    def on_save(sender, instance, raw=False, **kwargs):
+        if not raw and available():
+            index_rows(kind, [_row(instance, name_field, code_field)], replace=True)
+
+    def on_delete(sender, instance, **kwargs):
+        if available():
+            unindex(kind, [instance.pk])
+
+    uid = f"product_search_{kind}"
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=uid)
+
+
+def _row(obj, name_field, code_field):
+    return obj.pk, getattr(obj, name_field) or "", (getattr(obj, code_field) or "") if code_field else ""
+
+
+def index_rows(kind, rows, replace=False, using=None):
+    """Add (id, name, code) rows for kind; replace=True drops their old entries first."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    conn = connection if using is None else using
+    with conn.cursor() as cursor:
+        if replace:
+            unindex(kind, [pk for pk, _, _ in rows], using=conn)
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (name, code, kind, object_id) VALUES (%s, %s, %s, %s)",
+            [(name, code, kind, pk) for pk, name, code in rows],
+        )
+    return len(rows)
+
+
+def unindex(kind, ids, using=None):
+    conn = connection if using is None else using
+    with conn.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE kind = %s AND object_id = %s",
+            [(kind, pk) for pk in ids],
+        )
+
+
+def populate(kind, model, name_field="name", code_field=None, using=None):
+    """(Re)index every row of model as kind. model may be a historical model."""
+    conn = connection if using is None else using
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE kind = %s", [kind])
+
+    fields = ["pk", name_field] + ([code_field] if code_field else [])
+    batch = []
+    count = 0
+    for values in model._default_manager.using(conn.alias).values_list(*fields).iterator(
+        chunk_size=INDEX_BATCH_SIZE
+    ):
+        pk, name = values[0], values[1] or ""
+        code = (values[2] or "") if code_field else ""
+        batch.append((pk, name, code))
+        if len(batch) >= INDEX_BATCH_SIZE:
+            count += index_rows(kind, batch, using=conn)
+            batch = []
+    return count + index_rows(kind, batch, using=conn)
+
+
+def rebuild(kinds=None):
+    """Reindex the registered kinds (all by default). Returns {kind: rows}."""
+    return {
+        kind: populate(kind, model, name_field, code_field)
+        for kind, (model, name_field, code_field) in _registry.items()
+        if kinds is None or kind in kinds
+    }
+
+
+# -------------------------------------------------------------------
+# Queries
+# -------------------------------------------------------------------
+def _terms(q):
+    return [t for t in q.split() if t]
+
+
+def _like(t):
+    """t with the LIKE wildcards escaped, for patterns compared with LIKE."""
+    return t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _match_sql(kind, q):
+    """WHERE clause + params selecting the index rows of kind matching every term of q."""
+    where = ["kind = %s"]
+    params = [kind]
+    long_terms = [t for t in _terms(q) if len(t) >= MIN_TRIGRAM]
+    if long_terms:
+        where.append(f"{SEARCH_TABLE} MATCH %s")
+        params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in long_terms))
+    for t in _terms(q):
+        if len(t) < MIN_TRIGRAM:
+            where.append(f"(name {LIKE} OR code {LIKE})")
+            params += [f"%{_like(t)}%", f"%{_like(t)}%"]
+    return " AND ".join(where), params
+
+
+def filter_queryset(qs, kind, q, field="id", fallback=()):
+    """
+    qs restricted to rows whose <field> is a search hit of kind for q.
+    fallback: lookups OR-ed with icontains when the index is not available.
+    """
+    q = (q or "").strip()
+    if not q:
+        return qs
+    if not available():
+        cond = Q()
+        for lookup in fallback:
+            cond |= Q(**{f"{lookup}__icontains": q})
+        return qs.filter(cond)
+
+    where, params = _match_sql(kind, q)
+    return qs.filter(**{
+        f"{field}__in": RawSQL(f"SELECT object_id FROM {SEARCH_TABLE} WHERE {where}", params)
+    })
+
+
+def search(kind, q, limit=20, exclude=()):
+    """
+    Ranked hits of kind for q: [{"id", "name", "code"}], best first.
+    """
+    q = (q or "").strip()
+    if not q:
+        return []
+    exclude = [int(pk) for pk in exclude]
+
+    if not available():
+        model, name_field, code_field = _registry[kind]
+        cond = Q(**{f"{name_field}__icontains": q})
+        if code_field:
+            cond |= Q(**{f"{code_field}__icontains": q})
+        qs = model._default_manager.filter(cond).exclude(pk__in=exclude).order_by(name_field)
+        fields = ["pk", name_field] + ([code_field] if code_field else [])
+        return [
+            {"id": v[0], "name": v[1], "code": v[2] if code_field else ""}
+            for v in qs.values_list(*fields)[:limit]
+        ]
+
+    # Ranking every hit (bm25 + sort) costs tens of ms when a short query
+    # hits thousands of rows, so fetch tier by tier instead, each with a
+    # LIMIT the FTS scan can stop at: name/code starting with the first
+    # term, a word of the name starting with it, then the rest. Rows of a
+    # tier are ordered by name length / name.
+    where, params = _match_sql(kind, q)
+    head = _like(_terms(q)[0])
+    tiers = [
+        (f"(name {LIKE} OR code {LIKE})", [f"{head}%", f"{head}%"]),
+        (f"name {LIKE}", [f"% {head}%"]),
+        ("1", []),
+    ]
+    skip = list(exclude)
+    hits = []
+    with connection.cursor() as cursor:
+        for cond, tier_params in tiers:
+            if len(hits) >= limit:
+                break
+            sql = f"SELECT object_id, name, code FROM {SEARCH_TABLE} WHERE {where} AND {cond}"
+            if skip:
+                sql += f" AND object_id NOT IN ({', '.join(['%s'] * len(skip))})"
+            cursor.execute(f"{sql} LIMIT %s", params + tier_params + skip + [limit - len(hits)])
+            rows = sorted(cursor.fetchall(), key=lambda r: (len(r[1]), r[1].lower()))
+            hits += [{"id": pk, "name": name, "code": code} for pk, name, code in rows]
+            skip += [pk for pk, _, _ in rows]
+    return hits
@@ -0,0 +1,7 @@
+# masters/signals.py
+from django.dispatch import Signal
+
+# Sent after a Product BOM (header + lines) has been saved from the BOM screen.
+# Lines are written in bulk there, so model save signals do not fire for them.
+# kwargs: category_id
+bom_saved = Signal()
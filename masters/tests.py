@@ -1,3 +1,288 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import search
+from .models import Product, ProductBOM, ProductBOMItem, ProductDevelopment, ProductDevelopmentItem
+
+
+class ProductBOMSaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Product.objects.create(name="Enamel White")
+        cls.resin = Product.objects.create(name="Resin")
+        cls.pigment = Product.objects.create(name="TiO2")
+        cls.solvent = Product.objects.create(name="Solvent")
+
+    def post(self, lines):
+        data = {"category_id": self.category.id, "per_percent": "100", "density": "1.2", "hours": "3"}
+        for product, (percent, seq) in lines.items():
+            data[f"percent_{product.id}"] = percent
+            data[f"seq_{product.id}"] = seq
+        return self.client.post(reverse("product_bom_master"), data)
+
+    def lines(self):
+        return {
+            it.product_id: (it.percent, it.sequence)
+            for it in ProductBOMItem.objects.filter(bom__category=self.category)
+        }
+
+    def test_creates_non_zero_lines_only(self):
+        response = self.post({self.resin: ("40", "1"), self.pigment: ("25.5", "2"), self.solvent: ("0", "3")})
+
+        self.assertRedirects(
+            response, f"{reverse('product_bom_master')}?category_id={self.category.id}", fetch_redirect_response=False
+        )
+        self.assertEqual(ProductBOM.objects.get(category=self.category).per_percent, Decimal("100"))
+        self.assertEqual(
+            self.lines(),
+            {self.resin.id: (Decimal("40.00"), 1), self.pigment.id: (Decimal("25.50"), 2)},
+        )
+
+    def test_updates_changed_deletes_zero_and_keeps_unposted_lines(self):
+        self.post({self.resin: ("40", "1"), self.pigment: ("25", "2"), self.solvent: ("35", "3")})
+        solvent_line = ProductBOMItem.objects.get(product=self.solvent)
+
+        # resin changes, pigment goes to 0, solvent is not on the posted page
+        self.post({self.resin: ("45", "1"), self.pigment: ("0", "2")})
+
+        self.assertEqual(
+            self.lines(),
+            {self.resin.id: (Decimal("45.00"), 1), self.solvent.id: (Decimal("35.00"), 3)},
+        )
+        self.assertEqual(ProductBOMItem.objects.get(product=self.solvent).pk, solvent_line.pk)
+
+    def test_unchanged_post_writes_no_lines(self):
+        lines = {self.resin: ("40", "1"), self.pigment: ("25", "2")}
+        self.post(lines)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.post(lines)
+
+        writes = [
+            q["sql"] for q in queries
+            if "masters_productbomitem" in q["sql"] and not q["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(len(self.lines()), 2)
+
+    def test_unknown_products_are_ignored(self):
+        response = self.client.post(
+            reverse("product_bom_master"),
+            {"category_id": self.category.id, "per_percent": "100", "percent_999999": "10", "seq_999999": "1"},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.lines(), {})
+
+    def test_lines_that_cannot_be_stored_save_nothing(self):
+        self.post({self.resin: ("40", "1")})
+
+        for percent, seq in [("abc", "1"), ("1e30", "1"), ("Infinity", "1"), ("NaN", "1"), ("123456789", "1"),
+                             ("99999999.995", "1"), ("-5", "1"), ("10", "x"), ("10", "99999999999999999999")]:
+            with self.subTest(percent=percent, seq=seq):
+                response = self.post({self.resin: ("45", "1"), self.pigment: (percent, seq)})
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.lines(), {self.resin.id: (Decimal("40.00"), 1)})
+                messages = [str(m) for m in get_messages(response.wsgi_request)]
+                self.assertTrue(any(m.startswith("Nothing saved.") and "TiO2" in m for m in messages), messages)
+
+        self.assertEqual(self.client.get(reverse("product_bom_lines", args=[self.category.id])).status_code, 200)
+
+    def test_lines_json_pages_saved_lines(self):
+        self.post({self.resin: ("40", "2"), self.pigment: ("25", "1"), self.solvent: ("35", "3")})
+
+        url = reverse("product_bom_lines", args=[self.category.id])
+        first = self.client.get(url, {"page_size": 2}).json()
+        second = self.client.get(url, {"page_size": 2, "page": 2}).json()
+
+        self.assertEqual(first["count"], 3)
+        self.assertEqual(first["num_pages"], 2)
+        self.assertTrue(first["has_next"])
+        self.assertFalse(second["has_next"])
+        self.assertEqual(
+            [(r["product_name"], r["percent"], r["sequence"]) for r in first["results"] + second["results"]],
+            [("TiO2", "25.00", 1), ("Resin", "40.00", 2), ("Solvent", "35.00", 3)],
+        )
+
+    def test_lines_json_for_one_product(self):
+        self.post({self.resin: ("40", "2"), self.pigment: ("25", "1")})
+        url = reverse("product_bom_lines", args=[self.category.id])
+
+        saved = self.client.get(url, {"product": self.resin.id}).json()
+        self.assertEqual(
+            [(r["product_id"], r["percent"], r["sequence"]) for r in saved["results"]], [(self.resin.id, "40.00", 2)]
+        )
+        self.assertEqual(self.client.get(url, {"product": self.solvent.id}).json()["results"], [])
+        self.assertEqual(self.client.get(url, {"product": "x"}).json()["results"], [])
+
+    def test_picker_starts_from_the_saved_line(self):
+        response = self.client.get(reverse("product_bom_master"), {"category_id": self.category.id})
+
+        self.assertContains(response, 'fetch(linesUrl + "?product=" + encodeURIComponent(p.id))')
+
+
+class CompactBOMTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Product.objects.create(name="Enamel White")
+        bom = ProductBOM.objects.create(category=cls.category, per_percent=Decimal("100"))
+        for seq, (name, percent) in enumerate([("Resin", "40"), ("TiO2", "0"), ("Solvent", "0"), ("Drier", "0.5")], 1):
+            ProductBOMItem.objects.create(
+                bom=bom, product=Product.objects.create(name=name), percent=Decimal(percent), sequence=seq
+            )
+
+    def compact(self, *args):
+        out = StringIO()
+        call_command("compact_bom", *args, stdout=out)
+        return out.getvalue()
+
+    def names(self):
+        return sorted(ProductBOMItem.objects.values_list("product__name", flat=True))
+
+    def test_dry_run_only_counts(self):
+        self.assertIn("2 zero-percent BOM line(s) would be removed.", self.compact("--dry-run"))
+        self.assertEqual(len(self.names()), 4)
+
+    def test_removes_zero_lines_only(self):
+        self.assertIn("Removed 2 zero-percent BOM line(s).", self.compact())
+        self.assertEqual(self.names(), ["Drier", "Resin"])
+        self.assertIn("Removed 0 zero-percent BOM line(s).", self.compact())
+
+    def test_lines_json_page_size_is_clamped(self):
+        url = reverse("product_bom_lines", args=[self.category.id])
+
+        for page_size, expected in [("1", 1), ("0", 1), ("x", 4), ("100000", 4)]:
+            with self.subTest(page_size=page_size):
+                data = self.client.get(url, {"page_size": page_size}).json()
+                self.assertEqual(len(data["results"]), expected)
+        self.assertEqual(self.client.get(url, {"page_size": 1, "page": 99}).json()["page"], 4)
+
+
+class FormulationInputTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Product.objects.create(name="Primer Grey")
+        cls.resin = Product.objects.create(name="Alkyd Resin")
+        cls.filler = Product.objects.create(name="Calcite")
+        cls.development = ProductDevelopment.objects.create(category=cls.category, per_percent=Decimal("100"))
+        for seq, (product, percent, rate) in enumerate([(cls.resin, "60", "150"), (cls.filler, "40", "20")], 1):
+            ProductDevelopmentItem.objects.create(
+                development=cls.development,
+                product=product,
+                sequence=seq,
+                percent=Decimal(percent),
+                rate=Decimal(rate),
+                solid_percent=Decimal("50"),
+                density=Decimal("1.2"),
+            )
+
+    def what_if(self, **rates):
+        url = reverse("product_development_what_if", args=[self.category.id])
+        return self.client.get(url, rates)
+
+    def test_what_if_reprices_and_blank_keeps_saved_rate(self):
+        response = self.what_if(**{f"rate_{self.resin.id}": "200", f"rate_{self.filler.id}": ""})
+
+        self.assertEqual(response.status_code, 200)
+        items = {row["product_id"]: row for row in response.json()["items"]}
+        self.assertEqual(Decimal(items[self.resin.id]["rate"]), Decimal("200"))
+        self.assertEqual(Decimal(items[self.filler.id]["rate"]), Decimal("20"))
+        self.assertEqual(Decimal(response.json()["total_amount"]), Decimal("60") * 200 + Decimal("40") * 20)
+
+    def test_what_if_rejects_bad_rates_with_the_field(self):
+        for bad in ("abc", "NaN", "inf", "1e30"):
+            with self.subTest(rate=bad):
+                response = self.what_if(**{f"rate_{self.resin.id}": bad})
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["field"], f"rate_{self.resin.id}")
+
+    def save_all(self, **cells):
+        data = {"action": "save_all", "category_id": self.category.id, "per_percent": "100"}
+        for product in (self.resin, self.filler):
+            data.update({
+                f"percent_{product.id}": "50",
+                f"seq_{product.id}": "1",
+                f"rate_{product.id}": "10",
+                f"solidp_{product.id}": "50",
+                f"dens_{product.id}": "1",
+            })
+        data.update(cells)
+        return self.client.post(reverse("product_development"), data)
+
+    def test_save_all_computes_derived_columns(self):
+        response = self.save_all()
+
+        self.assertEqual(response.status_code, 302)
+        item = ProductDevelopmentItem.objects.get(development=self.development, product=self.resin)
+        self.assertEqual((item.percent, item.rate, item.amount), (Decimal("50"), Decimal("10"), Decimal("500")))
+        self.assertEqual((item.solid, item.wt_ltr, item.sv), (Decimal("25"), Decimal("50"), Decimal("25")))
+
+    def test_save_all_with_invalid_cell_saves_nothing(self):
+        for field, bad in [(f"percent_{self.filler.id}", "12,5x"), (f"dens_{self.resin.id}", "1e30"),
+                           (f"seq_{self.resin.id}", "2.5")]:
+            with self.subTest(field=field):
+                response = self.save_all(**{field: bad})
+
+                self.assertEqual(response.status_code, 302)
+                saved = ProductDevelopmentItem.objects.get(development=self.development, product=self.resin)
+                self.assertEqual((saved.percent, saved.rate), (Decimal("60"), Decimal("150")))
+                messages = [str(m) for m in get_messages(response.wsgi_request)]
+                self.assertTrue(any(m.startswith("Nothing saved:") and field in m for m in messages), messages)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ["Superprimer", "Red Oxide Primer", "Primer Grey", "Epoxy Primer", "Enamel White",
+                     "50% Resin", "500 Resin", "A_B Thinner", "AXB Thinner"]:
+            Product.objects.create(name=name)
+
+    def names(self, q, **kwargs):
+        return [hit["name"] for hit in search.search("product", q, **kwargs)]
+
+    def test_index_exists(self):
+        self.assertTrue(search.available())
+
+    def test_hits_are_ranked_by_tier(self):
+        # name starting with the term, a word starting with it, then the rest
+        self.assertEqual(self.names("primer"), ["Primer Grey", "Epoxy Primer", "Red Oxide Primer", "Superprimer"])
+        self.assertEqual(self.names("primer", limit=1), ["Primer Grey"])
+        self.assertEqual(self.names("primer grey"), ["Primer Grey"])
+
+    def test_saves_and_deletes_keep_the_index_in_sync(self):
+        product = Product.objects.get(name="Enamel White")
+        product.name = "Enamel Ivory"
+        product.save()
+
+        self.assertEqual(self.names("white"), [])
+        self.assertEqual(self.names("ivory"), ["Enamel Ivory"])
+        product.delete()
+        self.assertEqual(self.names("ivory"), [])
+
+    def test_like_wildcards_match_literally(self):
+        self.assertEqual(self.names("0%"), ["50% Resin"])
+        self.assertEqual(self.names("A_"), ["A_B Thinner"])
+        self.assertEqual(self.names("%"), ["50% Resin"])
+        self.assertEqual(
+            list(search.filter_queryset(Product.objects.all(), "product", "_").values_list("name", flat=True)),
+            ["A_B Thinner"],
+        )
+
+    def test_rebuild_search_index_picks_up_bulk_loads(self):
+        Product.objects.bulk_create([Product(name="Zinc Chromate")])  # no post_save
+        self.assertEqual(self.names("zinc"), [])
+
+        out = StringIO()
+        call_command("rebuild_search_index", "product", stdout=out)
 
-# Create your tests here.
+        self.assertEqual(self.names("zinc"), ["Zinc Chromate"])
+        self.assertIn(f"product          {Product.objects.count()} row(s)", out.getvalue())
@@ -19,6 +19,14 @@ urlpatterns = [
     ),
     path("terms-conditions/", views.terms_conditions, name="terms_conditions"),
     path("customers/", views.customer_master, name="customer_master"),
+    path("product-search/", views.product_search, name="product_search"),
     path("product-bom/", views.product_bom_master, name="product_bom_master"),
+    path("product-bom/products/", views.product_bom_products, name="product_bom_products"),
+    path("product-bom/<int:category_id>/lines/", views.product_bom_lines, name="product_bom_lines"),
     path("product-development/", views.product_development, name="product_development"),
+    path(
+        "product-development/<int:category_id>/what-if/",
+        views.product_development_what_if,
+        name="product_development_what_if",
+    ),
 ]
\ No newline at end of file
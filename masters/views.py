@@ -1,7 +1,11 @@
 # masters/views.py
+import re
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from decimal import Decimal, InvalidOperation
 
 from .models import (
@@ -19,6 +23,8 @@ from .models import (
     COMPANY_SIZE_CHOICES,
 )
 from .forms import DepartmentForm, EmployeeForm, UnitForm, ProductForm
+from . import formulation, search
+from .signals import bom_saved
 from django.db.models import Q
 from datetime import datetime
 from django.db import transaction
@@ -264,10 +270,7 @@ def product_master_detail(request):
         ProductMaster.objects.select_related("base_product", "unit")
         .order_by("base_product__name")
     )
-    if q:
-        rows = rows.filter(
-            Q(base_product__name__icontains=q)
-        )
+    rows = search.filter_queryset(rows, "product", q, field="base_product_id", fallback=("base_product__name",))
 
     # default inventory type for first load
     current_inventory_type = ProductMaster.INVENTORY_TYPE_FINISHED
@@ -533,6 +536,117 @@ def customer_master(request):
     }
     return render(request, "masters/customer_master.html", context)
 
+BOM_PERCENT_PLACES = Decimal("0.01")
+BOM_PERCENT_LIMIT = Decimal("1e8")  # ProductBOMItem.percent: max_digits=10, decimal_places=2
+BOM_SEQUENCE_LIMIT = 2 ** 31        # ProductBOMItem.sequence: IntegerField
+BOM_PERCENT_FIELD_RE = re.compile(r"^percent_(\d+)$")
+BOM_PAGE_SIZE = 50
+
+
+def _parse_bom_line(raw_percent, raw_seq):
+    """
+    (percent, sequence) of one posted BOM grid line; blank = 0.
+    ValueError with a readable message for anything that can't be stored.
+    """
+    raw_percent = (raw_percent or "").strip().replace(",", ".")
+    try:
+        percent = Decimal(raw_percent or "0")
+    except InvalidOperation:
+        raise ValueError(f"percent '{raw_percent}' is not a number")
+    if not percent.is_finite():
+        raise ValueError(f"percent '{raw_percent}' is not a number")
+    if percent < 0:
+        raise ValueError(f"percent '{raw_percent}' cannot be negative")
+    # before quantize(), which fails on huge values ("1e30"); after it, 99999999.995 rounds up
+    if percent >= BOM_PERCENT_LIMIT or percent.quantize(BOM_PERCENT_PLACES) >= BOM_PERCENT_LIMIT:
+        raise ValueError(f"percent '{raw_percent}' is out of range")
+
+    raw_seq = (raw_seq or "").strip()
+    try:
+        seq = int(raw_seq or 0)
+    except ValueError:
+        raise ValueError(f"sequence '{raw_seq}' is not a whole number")
+    if abs(seq) >= BOM_SEQUENCE_LIMIT:
+        raise ValueError(f"sequence '{raw_seq}' is out of range")
+    return percent.quantize(BOM_PERCENT_PLACES), seq
+
+
+def _posted_bom_lines(data):
+    """
+    Read percent_<productId> / seq_<productId> of the grid lines that were
+    loaded/added on screen (everything else is left untouched).
+
+    Returns (posted, errors): {product_id: (percent, sequence)} for
+    _save_bom_items() and ["<product>: <problem>"] for lines that can't be
+    stored. Unknown product ids are skipped.
+    """
+    posted_ids = [
+        int(m.group(1))
+        for m in (BOM_PERCENT_FIELD_RE.match(key) for key in data)
+        if m
+    ]
+    names = dict(Product.objects.filter(id__in=posted_ids).values_list("id", "name"))
+    posted, errors = {}, []
+    for pid in posted_ids:
+        if pid not in names:
+            continue
+        try:
+            posted[pid] = _parse_bom_line(data.get(f"percent_{pid}"), data.get(f"seq_{pid}"))
+        except ValueError as exc:
+            errors.append(f"{names[pid]}: {exc}")
+    return posted, errors
+
+
+def _save_bom_items(bom_obj, posted):
+    """
+    Apply posted BOM grid values to bom_obj in bulk.
+
+    posted = {product_id: (percent, sequence)}, as checked by _parse_bom_line()
+
+    BOM lines are stored sparse: only non-zero percentages are kept.
+    Existing lines are loaded once and diffed against the posted values:
+    - new non-zero lines go through one bulk_create
+    - changed lines go through one bulk_update
+    - lines set to zero are removed with one DELETE
+    - unchanged lines are not written
+
+    Returns (created_count, updated_count, deleted_count).
+    """
+    existing = {
+        it.product_id: it
+        for it in bom_obj.items.only("id", "product", "percent", "sequence")
+    }
+
+    to_create = []
+    to_update = []
+    to_delete = []
+    for product_id, (percent, seq) in posted.items():
+        item = existing.get(product_id)
+
+        if item is None:
+            if percent:
+                to_create.append(
+                    ProductBOMItem(bom=bom_obj, product_id=product_id, percent=percent, sequence=seq)
+                )
+            continue
+
+        if not percent:
+            to_delete.append(item.id)
+        elif item.percent != percent or item.sequence != seq:
+            item.percent = percent
+            item.sequence = seq
+            to_update.append(item)
+
+    if to_create:
+        ProductBOMItem.objects.bulk_create(to_create, batch_size=500)
+    if to_update:
+        ProductBOMItem.objects.bulk_update(to_update, ["percent", "sequence"], batch_size=500)
+    if to_delete:
+        ProductBOMItem.objects.filter(id__in=to_delete).delete()
+
+    return len(to_create), len(to_update), len(to_delete)
+
+
 @transaction.atomic
 def product_bom_master(request):
     products = Product.objects.order_by("name")
@@ -553,32 +667,17 @@ def product_bom_master(request):
         except ValueError:
             return None
 
-    def _to_decimal(raw: str, default=Decimal("0.00")):
-        raw = (raw or "").strip().replace(",", ".")
-        if not raw:
-            return default
-        try:
-            return Decimal(raw)
-        except InvalidOperation:
-            return default
-
-    def _to_int(raw: str, default=0):
-        raw = (raw or "").strip()
-        if not raw:
-            return default
-        try:
-            return int(raw)
-        except ValueError:
-            return default
-
     if request.method == "POST":
         form_category_id = request.POST.get("category_id", "").strip()
         form_per_percent = request.POST.get("per_percent", "").strip()
         form_density = request.POST.get("density", "").strip()
         form_hours = request.POST.get("hours", "").strip()
+        posted, line_errors = _posted_bom_lines(request.POST)
 
         if not form_category_id or not form_per_percent:
             messages.error(request, "Category and Per % are required.")
+        elif line_errors:
+            messages.error(request, "Nothing saved. " + "; ".join(line_errors))
         else:
             try:
                 category = Product.objects.get(id=form_category_id)
@@ -597,23 +696,11 @@ def product_bom_master(request):
                         "is_active": True,
                     },
                 )
+                _save_bom_items(bom_obj, posted)
 
-                # ----- SAVE GRID LINE ITEMS -----
-                # Saves percent_<productId> and seq_<productId> into ProductBOMItem
-                # If the grid is shown, this will update/create items for all products.
-                for p in products:
-                    percent_val = _to_decimal(request.POST.get(f"percent_{p.id}"), default=Decimal("0.00"))
-                    seq_val = _to_int(request.POST.get(f"seq_{p.id}"), default=0)
-
-                    ProductBOMItem.objects.update_or_create(
-                        bom=bom_obj,
-                        product=p,
-                        defaults={
-                            "percent": percent_val,
-                            "sequence": seq_val,
-                        },
-                    )
-                # ----- END SAVE GRID LINE ITEMS -----
+                transaction.on_commit(
+                    lambda: bom_saved.send(sender=ProductBOM, category_id=category.id)
+                )
 
                 messages.success(
                     request,
@@ -632,6 +719,7 @@ def product_bom_master(request):
         form_category_id = request.GET.get("category_id", "").strip()
 
     # show detail grid only if a category is selected
+    # (grid lines are loaded page by page from product_bom_lines)
     show_bom_table = bool(form_category_id)
 
     context = {
@@ -642,9 +730,87 @@ def product_bom_master(request):
         "form_density": form_density,
         "form_hours": form_hours,
         "show_bom_table": show_bom_table,
+        "bom_page_size": BOM_PAGE_SIZE,
     }
     return render(request, "masters/product_bom_master.html", context)
 
+
+def _page_size(request, default, maximum=200):
+    try:
+        size = int(request.GET.get("page_size") or default)
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
+
+
+def product_bom_lines(request, category_id):
+    """
+    JSON: saved BOM lines for one category, paginated.
+    Only the lines in use are stored, so this is usually a single short page.
+    ?product=<id> returns just the saved line of that product (if any).
+    """
+    lines = (
+        ProductBOMItem.objects.filter(bom__category_id=category_id)
+        .select_related("product")
+        .order_by("sequence", "id")
+    )
+    product_id = (request.GET.get("product") or "").strip()
+    if product_id:
+        lines = lines.filter(product_id=product_id) if product_id.isdigit() else lines.none()
+    page = Paginator(lines, _page_size(request, BOM_PAGE_SIZE)).get_page(request.GET.get("page"))
+
+    return JsonResponse({
+        "results": [
+            {
+                "product_id": it.product_id,
+                "product_name": it.product.name,
+                "percent": str(it.percent),
+                "sequence": it.sequence,
+            }
+            for it in page
+        ],
+        "page": page.number,
+        "num_pages": page.paginator.num_pages,
+        "count": page.paginator.count,
+        "has_next": page.has_next(),
+    })
+
+
+def product_bom_products(request):
+    """
+    JSON: product picker for the BOM grid (search by name).
+    ?q=<text>&exclude=<category id>&page_size=<n>
+    """
+    q = (request.GET.get("q") or "").strip()
+    exclude_id = (request.GET.get("exclude") or "").strip()
+
+    limit = _page_size(request, 20, maximum=50)
+    if q:
+        # ranked search (prefix matches first)
+        hits = search.search("product", q, limit=limit, exclude=[exclude_id] if exclude_id.isdigit() else ())
+        return JsonResponse({"results": [{"id": h["id"], "name": h["name"]} for h in hits]})
+
+    qs = Product.objects.order_by("name")
+    if exclude_id.isdigit():
+        qs = qs.exclude(id=exclude_id)
+    return JsonResponse({"results": list(qs.values("id", "name")[:limit])})
+
+
+SEARCH_KINDS = ("product", "master_product")
+
+
+def product_search(request):
+    """
+    JSON type-ahead over product names / codes.
+    ?q=<text>&kind=product|master_product&page_size=<n>
+    """
+    kind = request.GET.get("kind", "product")
+    if kind not in SEARCH_KINDS:
+        return JsonResponse({"error": f"kind must be one of {', '.join(SEARCH_KINDS)}"}, status=400)
+    limit = _page_size(request, 20, maximum=50)
+    hits = search.search(kind, request.GET.get("q"), limit=limit)
+    return JsonResponse({"results": hits})
+
 def _d(val: str, default="0"):
     """Safe Decimal parse."""
     try:
@@ -672,7 +838,6 @@ def product_development(request):
     dev_items = []
 
     total_volume = Decimal("0.000")
-    total_solid = Decimal("0.000")
     solid_volume_ratio = Decimal("0.00")
 
     # ---------------------------
@@ -787,35 +952,16 @@ def product_development(request):
 
         # ---- SAVE ALL ----
         if action == "save_all":
-            # Only update existing dev_items (legacy behavior)
-            current_items = list(development.items.select_related("product").all())
-
-            for it in current_items:
-                p = it.product
-
-                percent = _d(request.POST.get(f"percent_{p.id}"), "0")
-                seq = int((request.POST.get(f"seq_{p.id}") or "0").strip() or 0)
-                rate = _d(request.POST.get(f"rate_{p.id}"), "0")
-                solid_percent = _d(request.POST.get(f"solidp_{p.id}"), "0")
-                dens = _d(request.POST.get(f"dens_{p.id}"), "0")
-
-                # server-side derived (same as your JS)
-                amount = percent * rate
-                solid = percent * (solid_percent / Decimal("100")) if solid_percent else Decimal("0")
-                wt_ltr = (percent / dens) if dens and dens > 0 else Decimal("0")
-                sv = (solid / dens) if dens and dens > 0 else Decimal("0")
-
-                ProductDevelopmentItem.objects.filter(id=it.id).update(
-                    percent=percent,
-                    sequence=seq,
-                    rate=rate,
-                    amount=amount,
-                    solid_percent=solid_percent,
-                    solid=solid,
-                    density=dens,
-                    wt_ltr=wt_ltr,
-                    sv=sv,
-                )
+            # Only update existing dev_items (legacy behavior).
+            # Derived fields are computed server-side (same as the JS) for the
+            # whole item set at once and written back with one bulk_update.
+            current_items = list(development.items.all())
+            try:
+                cols = formulation.FormulationColumns.from_post(current_items, request.POST)
+            except formulation.InvalidInput as exc:
+                messages.error(request, f"Nothing saved: {exc}")
+                return redirect(f"{reverse('product_development')}?category_id={category.id}")
+            formulation.save(current_items, cols, formulation.compute(cols))
 
             messages.success(request, "Product Development saved.")
             return redirect(f"{reverse('product_development')}?category_id={category.id}")
@@ -829,12 +975,10 @@ def product_development(request):
     if form_category_id:
         load_development(form_category_id)
 
-    for it in dev_items:
-        total_volume += (it.wt_ltr or Decimal("0"))
-        total_solid += (it.solid or Decimal("0"))
-
-    if total_volume > 0:
-        solid_volume_ratio = (total_solid / total_volume) * Decimal("100")
+    if dev_items:
+        totals = formulation.compute(formulation.FormulationColumns.from_items(dev_items))
+        total_volume = totals.total_volume
+        solid_volume_ratio = totals.solid_volume_ratio
 
     # NOTE: these are placeholders until you confirm legacy formulas
     summary_rows = []
@@ -868,4 +1012,30 @@ def product_development(request):
 
         "summary_rows": summary_rows,
     }
-    return render(request, "masters/product_development.html", context)
\ No newline at end of file
+    return render(request, "masters/product_development.html", context)
+
+
+def product_development_what_if(request, category_id):
+    """
+    JSON: re-price the saved formulation of a category against new rates,
+    without saving anything. Rates are passed as rate_<productId>=<value>
+    (GET or POST); products without a new rate keep their saved rate.
+    """
+    development = get_object_or_404(ProductDevelopment, category_id=category_id)
+    params = request.POST if request.method == "POST" else request.GET
+
+    rates = {}
+    for key, value in params.items():
+        if key.startswith("rate_") and key[5:].isdigit():
+            rates[int(key[5:])] = value
+
+    try:
+        cols, result = formulation.what_if(development, rates)
+    except formulation.InvalidInput as exc:
+        return JsonResponse({"error": str(exc), "field": exc.field}, status=400)
+    return JsonResponse({
+        "items": result.rows(cols),
+        "total_amount": str(result.total_amount),
+        "total_volume": str(round(result.total_volume, 2)),
+        "solid_volume_ratio": str(round(result.solid_volume_ratio, 2)),
+    })
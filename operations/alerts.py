@@ -0,0 +1,163 @@
+# operations/alerts.py
+"""
+Min-stock alerts: products whose on-hand qty (StockBalance) is under the
+min_stock_level of their ProductMaster record. A ProductMaster belongs to
+a masters Product; the stock is kept against the MasterProduct its name
+resolves to (MasterProduct.objects.ids_by_name, case-insensitive). With
+several active records for one product the highest level counts.
+
+below_min() finds the short products with a few queries (levels, name
+matching, balances). check() keeps the
+StockAlert rows up to date and only looks at the products that had stock
+movements since the previous run (StockCheck). It runs from
+`manage.py check_stock` (cron); the screens only read StockAlert. Level
+changes re-check their product right away (receivers below).
+
+A movement committed after a later one was already checked can be
+missed by the incremental run; `check_stock --full` catches up.
+"""
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from masters.models import ProductMaster
+
+from .models import MasterProduct, StockAlert, StockBalance, StockCheck, StockMovement
+from .stock import ZERO
+
+# incremental runs touching more products than this re-check everything
+FULL_CHECK_THRESHOLD = 5000
+ID_CHUNK_SIZE = 500  # ids per IN (...) list
+
+
+def min_levels():
+    """
+    {MasterProduct id: min level}: the highest active level per product
+    name, matched to MasterProduct like the rest of the stock code
+    (MasterProduct.objects.ids_by_name, case-insensitive).
+    """
+    by_name = dict(
+        ProductMaster.objects.filter(is_active=True, min_stock_level__isnull=False)
+        .values("base_product__name")
+        .annotate(level=Max("min_stock_level"))
+        .values_list("base_product__name", "level")
+    )
+    levels = {}
+    for name, pid in MasterProduct.objects.ids_by_name(by_name).items():
+        levels[pid] = max(levels.get(pid, by_name[name]), by_name[name])
+    return levels
+
+
+def below_min(product_ids=None):
+    """{product_id: (min_level, on_hand)} of the products under their min level."""
+    levels = min_levels()
+    if product_ids is not None:
+        wanted = set(product_ids)
+        levels = {pid: level for pid, level in levels.items() if pid in wanted}
+
+    ids = list(levels)
+    on_hand = {}
+    for i in range(0, len(ids), ID_CHUNK_SIZE):
+        on_hand.update(StockBalance.objects.filter(pk__in=ids[i:i + ID_CHUNK_SIZE]).values_list("pk", "on_hand"))
+    return {
+        pid: (level, on_hand.get(pid, ZERO))
+        for pid, level in levels.items()
+        if on_hand.get(pid, ZERO) < level
+    }
+
+
+def refresh(product_ids=None, now=None):
+    """
+    Bring the alerts of these products (all with None) in line with
+    below_min(). Returns (raised, cleared).
+    """
+    now = now or timezone.now()
+    if product_ids is not None:
+        product_ids = list(product_ids)
+    short = below_min(product_ids)
+    with transaction.atomic():
+        alerts = StockAlert.objects.all()
+        if product_ids is not None:
+            alerts = alerts.filter(pk__in=product_ids)
+        existing = {pk: (level, qty) for pk, level, qty in alerts.values_list("pk", "min_level", "on_hand")}
+
+        cleared = [pk for pk in existing if pk not in short]
+        for i in range(0, len(cleared), ID_CHUNK_SIZE):
+            StockAlert.objects.filter(pk__in=cleared[i:i + ID_CHUNK_SIZE]).delete()
+
+        raised = [
+            StockAlert(product_id=pk, min_level=level, on_hand=qty, raised_at=now, checked_at=now)
+            for pk, (level, qty) in short.items()
+            if pk not in existing
+        ]
+        StockAlert.objects.bulk_create(raised, batch_size=1000, ignore_conflicts=True)
+
+        changed = [
+            StockAlert(product_id=pk, min_level=level, on_hand=qty, checked_at=now)
+            for pk, (level, qty) in short.items()
+            if pk in existing and existing[pk] != (level, qty)
+        ]
+        StockAlert.objects.bulk_update(changed, ["min_level", "on_hand", "checked_at"], batch_size=1000)
+    return len(raised), len(cleared)
+
+
+def check(full=False, now=None):
+    """
+    Re-check the products with stock movements since the last run (every
+    product with full=True, or on the first run). Returns the StockCheck
+    row, or None when nothing moved.
+    """
+    now = now or timezone.now()
+    last = StockCheck.objects.order_by("-pk").first()
+    top = StockMovement.objects.aggregate(top=Max("pk"))["top"] or 0
+
+    product_ids = None
+    if not full and last is not None:
+        if top <= last.last_movement_id:
+            return None
+        product_ids = set(
+            StockMovement.objects.filter(pk__gt=last.last_movement_id, pk__lte=top)
+            .values_list("product_id", flat=True)
+            .distinct()
+        )
+        if len(product_ids) > FULL_CHECK_THRESHOLD:
+            product_ids = None
+
+    raised, cleared = refresh(product_ids, now)
+    return StockCheck.objects.create(
+        ran_at=now,
+        last_movement_id=top,
+        full=product_ids is None,
+        checked=len(product_ids) if product_ids is not None else MasterProduct.objects.count(),
+        raised=raised,
+        cleared=cleared,
+    )
+
+
+def alert_count():
+    """Number of products under their min level as of the last check (read only)."""
+    return StockAlert.objects.count()
+
+
+# -------------------------------------------------------------------
+# Level / product changes
+# -------------------------------------------------------------------
+def _same_name(name):
+    """Ids of the MasterProducts named name in any case (Lower("name") index)."""
+    return MasterProduct.objects.annotate(lname=Lower("name")).filter(lname=name.lower()).values_list("pk", flat=True)
+
+
+@receiver([post_save, post_delete], sender=ProductMaster)
+def product_master_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh(_same_name(instance.base_product.name))
+
+
+@receiver(post_save, sender=MasterProduct)
+def master_product_saved(sender, instance, raw=False, **kwargs):
+    # a new / renamed product can change which one its name resolves to
+    if not raw:
+        refresh({instance.pk, *_same_name(instance.name)})
@@ -4,3 +4,22 @@ from django.apps import AppConfig
 class OperationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'operations'
+
+    def ready(self):
+        # connect BOM cache invalidation receivers
+        from . import requirements  # noqa: F401
+        # and the change feed publishers (Order / FactoryOrder saves)
+        from . import feed  # noqa: F401
+        # and the stock ledger postings
+        from . import stock  # noqa: F401
+        # and the min-stock alert re-checks
+        from . import alerts  # noqa: F401
+        # and the sales rollups (Order saves / deletes)
+        from . import sales  # noqa: F401
+        # and the incentive payouts going stale
+        from . import incentives  # noqa: F401
+
+        from masters import search
+        from .models import MasterProduct
+
+        search.register("master_product", MasterProduct, code_field="code")
@@ -0,0 +1,161 @@
+# operations/async_views.py
+"""
+Async, read-only versions of the screens the floor monitors keep polling
+(payment clearance, factory status, dispatch planning).
+
+They load the same data as the normal views with the async ORM and start
+the independent queries of a screen together (asyncio.gather). With
+today's Django the async ORM still hands every query to one
+thread-sensitive worker, so on a single database connection the queries
+take turns; what the monitors gain under ASGI is that a waiting request
+no longer ties up a worker thread. The templates are rendered in a
+thread (sync_to_async) since context processors (user, messages) are sync.
+
+A POST (the action buttons on the page) is passed on to the normal view.
+
+feed_stream serves the change feed (feed.py) as server-sent events.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from . import feed, views
+from .elapsed import age_options
+from .forms import DispatchHeaderForm
+from .models import Dispatch
+from .paging import akeyset_page, pager
+from .queries import (
+    FACTORY_FILTERS,
+    PAYMENT_FILTERS,
+    factory_orders,
+    payment_orders,
+    pending_dispatch_items,
+)
+from .views import RECENT_DISPATCH_LIMIT
+
+FEED_KEEPALIVE = 15  # seconds between keep-alive comments
+FEED_MAX_AGE = 600  # a stream ends after this; EventSource reconnects with Last-Event-ID
+
+arender = sync_to_async(render)
+
+
+async def _alist(qs):
+    return [row async for row in qs.aiterator()]
+
+
+async def payment_clearance(request):
+    if request.method == "POST":
+        return await sync_to_async(views.payment_clearance)(request)
+
+    params = request.GET
+    # the cursor is read before the queries: a change committed while they
+    # run is then sent again on the feed instead of being missed
+    feed_since = feed.get_broker().last_id
+    active, on_hold, active_count, hold_count = await asyncio.gather(
+        akeyset_page(payment_orders(params, False), params.get("active_cursor")),
+        akeyset_page(payment_orders(params, True), params.get("hold_cursor")),
+        payment_orders(params, False).acount(),
+        payment_orders(params, True).acount(),
+    )
+    return await arender(request, "operations/payment_clearance.html", {
+        "orders_active": active,
+        "orders_on_hold": on_hold,
+        "counts": {"active": active_count, "hold": hold_count},
+        "feed_since": feed_since,
+        "active_pager": pager(params, active, "active_cursor"),
+        "hold_pager": pager(params, on_hold, "hold_cursor"),
+        "filters": PAYMENT_FILTERS.context(params),
+    })
+
+
+async def factory_status(request):
+    if request.method == "POST":
+        return await sync_to_async(views.factory_status)(request)
+
+    params = request.GET
+    now = timezone.now()
+    feed_since = feed.get_broker().last_id  # before the queries, see payment_clearance
+    orders, count = await asyncio.gather(
+        akeyset_page(
+            factory_orders(params, now),
+            params.get("cursor"),
+            descending=params.get("sort") != "-age",
+        ),
+        factory_orders(params, now).acount(),
+    )
+    return await arender(request, "operations/factory_status.html", {
+        "orders": orders,
+        "counts": {"orders": count},
+        "feed_since": feed_since,
+        "pager": pager(params, orders),
+        "filters": FACTORY_FILTERS.context(params),
+        "age": age_options(params),
+    })
+
+
+async def dispatch_order(request):
+    if request.method == "POST":
+        return await sync_to_async(views.dispatch_order)(request)
+
+    params = request.GET
+    pending_items, recent_dispatches = await asyncio.gather(
+        _alist(pending_dispatch_items(params)),
+        _alist(Dispatch.objects.with_load().order_by("-created_at")[:RECENT_DISPATCH_LIMIT]),
+    )
+    return await arender(request, "operations/dispatch_order.html", {
+        "header_form": DispatchHeaderForm(),
+        "pending_items": pending_items,
+        "load_info": None,
+        "age": age_options(params),
+        "dispatch_plan": None,
+        "recent_dispatches": recent_dispatches,
+    })
+
+
+async def feed_stream(request, topic):
+    """
+    Server-sent events of one change feed topic ("payments" / "factory").
+    Resumes after the Last-Event-ID header, or ?since=<id> from the page.
+    """
+    if topic not in feed.TOPICS:
+        raise Http404
+    if not isinstance(request, ASGIRequest):
+        # a stream would hold a WSGI worker for as long as the page is open;
+        # 204 tells EventSource not to retry, so the page just doesn't update
+        return HttpResponse(status=204)
+
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.GET.get("since", ""))
+    except ValueError:
+        last_id = None
+    response = StreamingHttpResponse(_events(topic, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: don't buffer the stream
+    return response
+
+
+async def _events(topic, last_id):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + FEED_MAX_AGE
+    sub = feed.get_broker().subscribe([topic], last_id)
+    try:
+        yield "retry: 3000\n\n"
+        while loop.time() < deadline:
+            if sub.lagging:
+                # events were lost: the page reloads instead of patching
+                yield "event: reload\ndata: {}\n\n"
+                return
+            try:
+                event = await sub.aget(FEED_KEEPALIVE)
+            except asyncio.TimeoutError:  # not the builtin TimeoutError before Python 3.11
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['id']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+    finally:
+        sub.close()
@@ -0,0 +1,228 @@
+# operations/feed.py
+"""
+Change feed for the payment clearance and factory status grids.
+
+Saving / deleting an Order or FactoryOrder publishes a row delta (the
+grid columns of that one row) on the topic of its screen once the
+transaction commits. The screens subscribe through server-sent events
+(async_views.feed_stream, ASGI only) and patch the row in place instead of
+reloading the whole grid.
+
+The broker is picked by settings.CHANGE_FEED_BROKER. LocalBroker, the
+default, only reaches subscribers in the same process: fine for tests,
+runserver and a single ASGI worker. Several workers need a shared
+broker (e.g. Redis pub/sub) with the same publish / subscribe methods.
+
+Writes that skip the model signals (queryset.update(), bulk_update) call
+publish_orders() / publish_factory_orders() themselves.
+"""
+import asyncio
+import itertools
+import queue
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import FactoryOrder, Order
+
+PAYMENTS = "payments"
+FACTORY = "factory"
+TOPICS = (PAYMENTS, FACTORY)
+
+HISTORY_SIZE = 500  # events kept for reconnecting clients (Last-Event-ID)
+MAX_PENDING = 1000  # events queued per subscriber before it is told to reload
+
+
+# -------------------------------------------------------------------
+# Broker
+# -------------------------------------------------------------------
+class Subscription:
+    """
+    Events of some topics, in publish order. Created inside a running
+    event loop it is read with `await aget()`, otherwise with `get()`.
+    `lagging` is set when events were dropped (slow reader / old cursor):
+    the client should reload.
+    """
+
+    def __init__(self, broker, topics):
+        self.broker = broker
+        self.topics = set(topics)
+        self.lagging = False
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._queue = asyncio.Queue(MAX_PENDING) if self._loop else queue.Queue(MAX_PENDING)
+
+    def put(self, event):
+        if self._loop is None:
+            self._put(event)
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._put, event)
+            except RuntimeError:  # loop closed: the client is gone
+                self.close()
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except (asyncio.QueueFull, queue.Full):
+            self.lagging = True
+
+    def get(self, timeout=None):
+        """Next event; raises queue.Empty after timeout seconds."""
+        return self._queue.get(timeout=timeout)
+
+    async def aget(self, timeout=None):
+        """Next event; raises asyncio.TimeoutError after timeout seconds."""
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalBroker:
+    """In-process broker. Events are dicts, numbered with an "id"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._ids = itertools.count(1)
+
+    @property
+    def last_id(self):
+        """Id of the latest event (0 before the first); pages hand it to the stream."""
+        with self._lock:
+            return self._history[-1]["id"] if self._history else 0
+
+    def publish(self, topic, event):
+        with self._lock:
+            event = {**event, "id": next(self._ids), "topic": topic}
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if topic in s.topics]
+        for sub in subscribers:
+            sub.put(event)
+        return event
+
+    def subscribe(self, topics, last_id=None):
+        """
+        Subscription to topics. With last_id the events published after it
+        are queued first, if still in the history (else it is lagging).
+        """
+        sub = Subscription(self, topics)
+        with self._lock:
+            if last_id is not None:
+                if self._history and self._history[0]["id"] > last_id + 1:
+                    sub.lagging = True
+                for event in self._history:
+                    if event["id"] > last_id and event["topic"] in sub.topics:
+                        sub.put(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.CHANGE_FEED_BROKER)()
+    return _broker
+
+
+# -------------------------------------------------------------------
+# Row deltas
+# -------------------------------------------------------------------
+def order_delta(order):
+    """
+    The payment grid columns of order. section says which table the row
+    belongs in ("active" / "hold"), None when it left the grids.
+    """
+    if order.is_cancelled:
+        section = None
+    else:
+        section = "hold" if order.on_hold else "active"
+    return {
+        "row": order.pk,
+        "section": section,
+        "fields": {
+            "company": order.company,
+            "location": order.location,
+            "sales_person": order.sales_person,
+            "bill_no": order.bill_no,
+            "payment_cleared": order.payment_cleared,
+        },
+    }
+
+
+def factory_order_delta(fo):
+    return {
+        "row": fo.pk,
+        "section": "orders",
+        "fields": {
+            "company_name": fo.company_name,
+            "location": fo.location,
+            "sales_person": fo.sales_person,
+            # a date, or the posted "YYYY-MM-DD" right after the view saved it
+            "delivery_expected_date": str(fo.delivery_expected_date or "") or None,
+            "remark": fo.remark,
+            "factory_accepted": fo.factory_accepted,
+        },
+    }
+
+
+def _publish_on_commit(topic, events):
+    def send():
+        broker = get_broker()
+        for event in events:
+            broker.publish(topic, event)
+
+    transaction.on_commit(send)
+
+
+def publish_orders(orders):
+    """Publish the current rows of these Orders (after an update())."""
+    _publish_on_commit(PAYMENTS, [order_delta(o) for o in orders])
+
+
+def publish_factory_orders(orders):
+    _publish_on_commit(FACTORY, [factory_order_delta(o) for o in orders])
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _publish_on_commit(PAYMENTS, [{**order_delta(instance), "created": created}])
+
+
+@receiver(post_save, sender=FactoryOrder)
+def factory_order_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _publish_on_commit(FACTORY, [{**factory_order_delta(instance), "created": created}])
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    _publish_on_commit(PAYMENTS, [{"row": instance.pk, "section": None}])
+
+
+@receiver(post_delete, sender=FactoryOrder)
+def factory_order_deleted(sender, instance, **kwargs):
+    _publish_on_commit(FACTORY, [{"row": instance.pk, "section": None}])
@@ -157,7 +157,7 @@ class BatchForm(forms.ModelForm):
 
     class Meta:
         model = Batch
-        fields = ["supervisor", "labour", "category", "production_qty", "remark"]
+        fields = ["supervisor", "labour", "category", "base_qty", "production_qty", "remark"]
 
 class BatchItemForm(forms.ModelForm):
     product = forms.ModelChoiceField(
@@ -201,7 +201,7 @@ class DispatchHeaderForm(forms.ModelForm):
 class MaterialInwardForm(forms.ModelForm):
     class Meta:
         model = MaterialInward
-        fields = ["master_product", "supplier", "inward_date", "bill_no", "remark"]
+        fields = ["master_product", "supplier", "inward_date", "bill_no", "qty", "remark"]
         widgets = {
             "master_product": forms.Select(attrs={"class": "form-control slim"}),
             "supplier": forms.Select(attrs={"class": "form-control slim", "placeholder": "Supplier"}),
@@ -211,6 +211,9 @@ class MaterialInwardForm(forms.ModelForm):
             "bill_no": forms.TextInput(
                 attrs={"class": "form-control slim", "placeholder": "Bill No"}
             ),
+            "qty": forms.NumberInput(
+                attrs={"class": "form-control slim", "step": "0.01", "min": "0", "placeholder": "Qty"}
+            ),
             "remark": forms.Textarea(
                 attrs={
                     "class": "form-control slim",
@@ -223,7 +226,7 @@ class MaterialInwardForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # red-star fields = required
-        for name in ["master_product", "supplier", "inward_date", "bill_no"]:
+        for name in ["master_product", "supplier", "inward_date", "bill_no", "qty"]:
             self.fields[name].required = True
 
         self.fields["master_product"].empty_label = "Select"
@@ -232,13 +235,25 @@ class MaterialInwardForm(forms.ModelForm):
 class MaterialDiscardForm(forms.ModelForm):
     class Meta:
         model = MaterialDiscard
-        fields = ["category", "remark"]
+        fields = ["category", "product", "qty", "remark"]
         widgets = {
             "category": forms.Select(
                 attrs={
                     "class": "form-control",
                 }
             ),
+            "product": forms.Select(
+                attrs={
+                    "class": "form-control",
+                }
+            ),
+            "qty": forms.NumberInput(
+                attrs={
+                    "class": "form-control",
+                    "step": "0.01",
+                    "min": "0",
+                }
+            ),
             "remark": forms.Textarea(
                 attrs={
                     "class": "form-control",
@@ -249,5 +264,20 @@ class MaterialDiscardForm(forms.ModelForm):
         }
         labels = {
             "category": "Category",
+            "product": "Product",
+            "qty": "Qty",
             "remark": "Remark",
-        }
\ No newline at end of file
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # stock comes off the ledger, so new discards need both
+        self.fields["product"].required = True
+        self.fields["product"].empty_label = "Select"
+        self.fields["qty"].required = True
+
+    def clean_qty(self):
+        qty = self.cleaned_data["qty"]
+        if qty is not None and qty <= 0:
+            raise forms.ValidationError("Qty must be more than 0.")
+        return qty
\ No newline at end of file
@@ -0,0 +1,264 @@
+# operations/incentives.py
+"""
+Sales-person incentives, computed in batches per month (IncentivePayout).
+
+An order earns quantity x ProductMaster.incentive of its product (matched
+by name through MasterProduct.objects.ids_by_name, case-insensitive;
+highest active rate wins). It belongs to Order.sales_person, or,
+when that is blank, to the sales person of the Customer with the order's
+company name. Both lookups are built once per run (incentive_rates(),
+customer_sellers()); a month then costs one query for its product names
+and one streamed query over its orders.
+
+recompute(months) rebuilds whole months. Order saves / deletes that
+change what an order earns (split, cancel, qty, product, seller, date)
+only mark the payouts of the old and new (month, seller) stale;
+recompute_stale() redoes just those sellers of just those months. It
+runs from `manage.py compute_incentives` (cron); the payouts screen only
+reads IncentivePayout and shows which rows are stale.
+
+Rates are read at compute time: after changing an incentive rate or a
+customer's sales person, recompute the months it should apply to.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from masters.models import Customer, ProductMaster
+
+from . import order_changes
+from .models import IncentivePayout, MasterProduct, Order
+
+# the Order fields an incentive depends on
+TRACKED_FIELDS = ("sales_person", "company", "product_name", "quantity", "order_created", "is_cancelled")
+ORDER_CHUNK_SIZE = 5000
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+def month_of(ts):
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts)
+    return timezone.localdate(ts).replace(day=1)
+
+
+def next_month(month):
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def _month_start(month):
+    return timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+
+
+# -------------------------------------------------------------------
+# Lookups (one query each, per run)
+# -------------------------------------------------------------------
+def incentive_rates():
+    """
+    {MasterProduct id: incentive per unit} from the active product master
+    records, matched to MasterProduct by name (MasterProduct.objects.ids_by_name).
+    """
+    by_name = dict(
+        ProductMaster.objects.filter(is_active=True, incentive__isnull=False)
+        .values("base_product__name")
+        .annotate(rate=Max("incentive"))
+        .values_list("base_product__name", "rate")
+    )
+    rates = {}
+    for name, pid in MasterProduct.objects.ids_by_name(by_name).items():
+        rates[pid] = max(rates.get(pid, by_name[name]), by_name[name])
+    return rates
+
+
+def customer_sellers():
+    """{company name: sales person's full name} of the customers that have one (lowest id wins)."""
+    sellers = {}
+    customers = Customer.objects.filter(sales_person__isnull=False).order_by("-pk")
+    for company, name in customers.values_list("company_name", "sales_person__full_name"):
+        if name:
+            sellers[company] = name
+    return sellers
+
+
+def _seller(sales_person, company, by_company):
+    return sales_person or by_company.get(company) or ""
+
+
+# -------------------------------------------------------------------
+# Computing
+# -------------------------------------------------------------------
+def month_totals(month, sellers=None, rates=None, by_company=None, chunk_size=ORDER_CHUNK_SIZE):
+    """
+    {seller: [orders, qty, amount, unmatched orders]} over the orders of
+    month, for every seller or only the ones in sellers.
+    """
+    rates = incentive_rates() if rates is None else rates
+    by_company = customer_sellers() if by_company is None else by_company
+    orders = Order.objects.filter(
+        is_cancelled=False,
+        order_created__gte=_month_start(month),
+        order_created__lt=_month_start(next_month(month)),
+    )
+    if sellers is not None:
+        # named sellers by index; blank ones are resolved below and filtered here
+        blank = Q(sales_person__isnull=True) | Q(sales_person="")
+        orders = orders.filter(Q(sales_person__in=[s for s in sellers if s]) | blank)
+
+    # the month's product names, resolved once (same matching as incentive_rates())
+    product_ids = MasterProduct.objects.ids_by_name(
+        orders.order_by().values_list("product_name", flat=True).distinct()
+    )
+
+    totals = defaultdict(lambda: [0, ZERO, ZERO, 0])
+    rows = orders.values_list("sales_person", "company", "product_name", "quantity").iterator(chunk_size=chunk_size)
+    for sales_person, company, product, qty in rows:
+        seller = _seller(sales_person, company, by_company)
+        if sellers is not None and seller not in sellers:
+            continue
+        t = totals[seller]
+        qty = qty or ZERO
+        t[0] += 1
+        t[1] += qty
+        rate = rates.get(product_ids.get(product))
+        if rate is None:
+            t[3] += 1
+        else:
+            t[2] += qty * rate
+    return totals
+
+
+def _save(month, totals, sellers, started):
+    """Replace the payouts of month (of sellers only, if given) with totals."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = IncentivePayout.objects.filter(month=month)
+        if sellers is not None:
+            rows = rows.filter(sales_person__in=sellers)
+        # orders that changed while we were reading stay marked for the next run
+        still_stale = dict(rows.filter(stale_since__gte=started).values_list("sales_person", "stale_since"))
+        rows.delete()
+        IncentivePayout.objects.bulk_create(
+            [
+                IncentivePayout(
+                    month=month,
+                    sales_person=seller,
+                    orders=orders,
+                    quantity=qty,
+                    amount=amount.quantize(CENT),
+                    unmatched_orders=unmatched,
+                    computed_at=now,
+                    stale_since=still_stale.get(seller),
+                )
+                for seller, (orders, qty, amount, unmatched) in totals.items()
+            ]
+            + [
+                IncentivePayout(month=month, sales_person=seller, stale_since=since)
+                for seller, since in still_stale.items()
+                if seller not in totals
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def recompute(months, chunk_size=ORDER_CHUNK_SIZE):
+    """Recompute the payouts of whole months. Returns {month: sellers with orders}."""
+    rates, by_company = incentive_rates(), customer_sellers()
+    done = {}
+    for month in sorted(set(months)):
+        started = timezone.now()
+        totals = month_totals(month, None, rates, by_company, chunk_size)
+        done[month] = _save(month, totals, None, started)
+    return done
+
+
+def recompute_stale(chunk_size=ORDER_CHUNK_SIZE):
+    """Recompute only the stale payouts. Returns {month: sellers recomputed}."""
+    stale = defaultdict(set)
+    for month, seller in IncentivePayout.objects.filter(stale_since__isnull=False).values_list("month", "sales_person"):
+        stale[month].add(seller)
+    if not stale:
+        return {}
+
+    rates, by_company = incentive_rates(), customer_sellers()
+    done = {}
+    for month, sellers in sorted(stale.items()):
+        started = timezone.now()
+        totals = month_totals(month, sellers, rates, by_company, chunk_size)
+        _save(month, totals, sellers, started)
+        done[month] = len(sellers)
+    return done
+
+
+def payouts(month):
+    """
+    The stored payouts of month, biggest first (read only). Rows with
+    stale_since set changed since they were computed; recompute() /
+    recompute_stale() bring them up to date.
+    """
+    return IncentivePayout.objects.filter(
+        Q(orders__gt=0) | Q(stale_since__isnull=False), month=month
+    ).order_by("-amount", "sales_person")
+
+
+# -------------------------------------------------------------------
+# Marking payouts stale on order changes
+# -------------------------------------------------------------------
+def mark_stale(pairs, now=None):
+    """Mark the payouts of [(month, seller), ...] for recompute (rows are created as needed)."""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    now = now or timezone.now()
+    IncentivePayout.objects.bulk_create(
+        [IncentivePayout(month=month, sales_person=seller, stale_since=now) for month, seller in pairs],
+        ignore_conflicts=True,
+    )
+    match = Q()
+    for month, seller in pairs:
+        match |= Q(month=month, sales_person=seller)
+    IncentivePayout.objects.filter(match).update(stale_since=now)
+
+
+def customer_sellers_for(company):
+    """The seller customer_sellers() gives company, with one query."""
+    names = (
+        Customer.objects.filter(company_name=company, sales_person__isnull=False)
+        .exclude(sales_person__full_name="")
+        .order_by("pk")
+        .values_list("sales_person__full_name", flat=True)
+    )
+    return names.first() or ""
+
+
+def _pair(values):
+    if not values or values["order_created"] is None:
+        return None
+    seller = values["sales_person"]
+    if not seller:
+        seller = customer_sellers_for(values["company"])
+    return month_of(values["order_created"]), seller
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not order_changes.tracks(update_fields, TRACKED_FIELDS):
+        return
+    before = order_changes.before_save(instance, TRACKED_FIELDS)
+    after = order_changes.values(instance, TRACKED_FIELDS)
+    if before == after:
+        return
+    mark_stale(p for p in (_pair(before), _pair(after)) if p)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    pair = _pair(order_changes.values(instance, TRACKED_FIELDS))
+    if pair:
+        mark_stale([pair])
@@ -0,0 +1,209 @@
+# operations/loadtest.py
+"""
+Small in-process load generator for the benchmark commands.
+
+Worker threads each drive their own test Client (and so their own
+database connection) through a list of steps, so requests really run
+concurrently against the configured database. Latency is recorded per
+step; "database is locked" errors are counted instead of aborting.
+
+run_asgi_load does the same with coroutines calling the project's ASGI
+application directly, the way an ASGI server would.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, NamedTuple
+from urllib.parse import urlencode
+
+from django.core.asgi import get_asgi_application
+from django.db import OperationalError, connections
+from django.test import Client
+
+
+class Step(NamedTuple):
+    name: str
+    method: str  # "get" / "post"
+    path: str
+    data: object = None  # dict, or callable(worker, round) -> dict
+    follow: bool = False
+
+
+@dataclass
+class LoadResult:
+    label: str
+    workers: int
+    elapsed: float = 0.0
+    latencies: dict = field(default_factory=lambda: defaultdict(list))  # step -> [seconds]
+    lock_errors: Counter = field(default_factory=Counter)  # step -> count
+    other_errors: Counter = field(default_factory=Counter)  # "step: error" -> count
+
+    @property
+    def requests(self):
+        return sum(len(v) for v in self.latencies.values())
+
+    @property
+    def throughput(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def lines(self):
+        """Report lines: one per step plus a total."""
+        out = []
+        for name, values in self.latencies.items():
+            out.append(
+                f"{self.label:<28} {name:<24} n={len(values):<5} "
+                f"p50={percentile(values, 50) * 1000:7.1f}ms p99={percentile(values, 99) * 1000:7.1f}ms "
+                f"locked={self.lock_errors[name]}"
+            )
+        out.append(
+            f"{self.label:<28} {'total':<24} {self.requests} req in {self.elapsed:.2f}s "
+            f"= {self.throughput:.0f} req/s, locked={sum(self.lock_errors.values())}, "
+            f"other errors={sum(self.other_errors.values())}"
+        )
+        for error, count in self.other_errors.most_common(3):
+            out.append(f"    {count} x {error}")
+        return out
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and "locked" in str(exc).lower()
+
+
+def run_load(label, steps, workers=4, rounds=20, setup_client: Callable = None):
+    """
+    Run `rounds` passes over steps in each of `workers` threads.
+    steps is a list of Step, or callable(worker) -> list for workers
+    doing different things (readers / writers).
+    setup_client(client, worker) may log the client in etc.
+    """
+    result = LoadResult(label=label, workers=workers)
+    lock = threading.Lock()
+    start_gate = threading.Barrier(workers)
+
+    def worker(n):
+        client = Client(SERVER_NAME="localhost")
+        try:
+            try:
+                if setup_client:
+                    setup_client(client, n)
+            except Exception:
+                start_gate.abort()  # don't leave the other workers waiting
+                raise
+            start_gate.wait()
+            worker_steps = steps(n) if callable(steps) else steps
+            for r in range(rounds):
+                for step in worker_steps:
+                    data = step.data(n, r) if callable(step.data) else step.data
+                    started = time.perf_counter()
+                    error = None
+                    try:
+                        getattr(client, step.method)(step.path, data, follow=step.follow)
+                    except Exception as exc:  # noqa: BLE001 - counted and reported
+                        error = exc
+                    took = time.perf_counter() - started
+                    with lock:
+                        if error is None:
+                            result.latencies[step.name].append(took)
+                        elif is_lock_error(error):
+                            result.lock_errors[step.name] += 1
+                        else:
+                            result.other_errors[f"{step.name}: {type(error).__name__}: {error}"] += 1
+        finally:
+            connections.close_all()
+
+    # errors are counted; keep django.request from logging a traceback for each
+    request_log = logging.getLogger("django.request")
+    level = request_log.level
+    request_log.setLevel(logging.CRITICAL)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    began = time.perf_counter()
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        request_log.setLevel(level)
+    result.elapsed = time.perf_counter() - began
+    return result
+
+
+def run_asgi_load(label, steps, workers=4, rounds=20):
+    """
+    run_load for the ASGI path: `workers` concurrent coroutines on one
+    event loop, each sending `rounds` passes over steps (GET only) to the
+    ASGI application. Responses with status >= 400 count as errors.
+    """
+    application = get_asgi_application()
+    result = LoadResult(label=label, workers=workers)
+
+    async def call(path, query):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        sent = []
+
+        async def receive():
+            if not sent:
+                sent.append(None)
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Future()  # the client never disconnects
+
+        status = None
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await application(scope, receive, send)
+        return status
+
+    async def worker(n):
+        for r in range(rounds):
+            for step in steps:
+                data = step.data(n, r) if callable(step.data) else step.data
+                started = time.perf_counter()
+                status = await call(step.path, urlencode(data or {}, doseq=True))
+                took = time.perf_counter() - started
+                if status < 400:
+                    result.latencies[step.name].append(took)
+                else:
+                    result.other_errors[f"{step.name}: HTTP {status}"] += 1
+
+    async def main():
+        await asyncio.gather(*(worker(n) for n in range(workers)))
+
+    request_log = logging.getLogger("django.request")
+    level = request_log.level
+    request_log.setLevel(logging.CRITICAL)
+    began = time.perf_counter()
+    try:
+        asyncio.run(main())
+    finally:
+        request_log.setLevel(level)
+        connections.close_all()
+    result.elapsed = time.perf_counter() - began
+    return result
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from operations.loadtest import Step, run_asgi_load, run_load
+from operations.models import DispatchItem, FactoryOrder, Order
+
+TAG = "ASGITEST"
+
+SCREENS = [
+    ("payment_clearance", "/operations/payments/"),
+    ("factory_status", "/operations/factory-status/"),
+    ("dispatch_order", "/operations/dispatch-order/"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the monitor screens (payment clearance, factory status, "
+        "dispatch planning) three ways: sync views with worker threads (WSGI), "
+        "sync views under ASGI and the async views under ASGI. The ASGI runs "
+        "call the project's ASGI application in-process with concurrent "
+        "coroutines. Adds (and removes) --rows orders to have something to show."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent clients.")
+        parser.add_argument("--rounds", type=int, default=20, help="Passes over the screens per client.")
+        parser.add_argument("--rows", type=int, default=500, help="Orders to add for the run.")
+
+    def handle(self, *args, **options):
+        workers, rounds = options["workers"], options["rounds"]
+        sync_steps = [Step(f"GET {name}", "get", path) for name, path in SCREENS]
+        async_steps = [Step(f"GET {name}", "get", f"{path}monitor/") for name, path in SCREENS]
+
+        self._seed(options["rows"])
+        try:
+            with override_settings(ALLOWED_HOSTS=["localhost"]):
+                runs = [
+                    run_load("wsgi, sync views", sync_steps, workers=workers, rounds=rounds),
+                    run_asgi_load("asgi, sync views", sync_steps, workers=workers, rounds=rounds),
+                    run_asgi_load("asgi, async views", async_steps, workers=workers, rounds=rounds),
+                ]
+            for result in runs:
+                for line in result.lines():
+                    self.stdout.write(line)
+        finally:
+            DispatchItem.objects.filter(company_name=TAG).delete()
+            FactoryOrder.objects.filter(company_name=TAG).delete()
+            Order.objects.filter(company=TAG).delete()
+
+    @staticmethod
+    def _seed(rows):
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(
+                company=TAG,
+                city=TAG,
+                sales_person=f"sales {i % 7}",
+                location=TAG,
+                product_name="Benchmark product",
+                quantity=10,
+                on_hold=i % 5 == 0,
+            )
+            for i in range(rows)
+        ])
+        FactoryOrder.objects.bulk_create([
+            FactoryOrder(
+                order_id=o.id,
+                company_name=TAG,
+                location=TAG,
+                sales_person=o.sales_person,
+                order_created=now,
+            )
+            for o in orders[::2]
+        ])
+        DispatchItem.objects.bulk_create([
+            DispatchItem(
+                order_id=o.id,
+                company_name=TAG,
+                location=TAG,
+                product="Benchmark product",
+                available_qty=10,
+                qty=10,
+            )
+            for o in orders[::4]
+        ])
@@ -0,0 +1,60 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from operations.planning import PlanItem, PlanVehicle, plan
+
+
+class Command(BaseCommand):
+    help = "Benchmark the dispatch load planner on synthetic pending items (no database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=3000)
+        parser.add_argument("--vehicles", type=int, default=150)
+        parser.add_argument("--locations", type=int, default=40)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        now = timezone.now()
+
+        locations = [f"LOC-{i:03d}" for i in range(options["locations"])]
+        items = [
+            PlanItem(
+                id=i,
+                location=rnd.choice(locations),
+                qty=Decimal(rnd.choice([20, 40, 60, 100, 200, 400])) * rnd.randint(1, 5),
+                ready_at=now - timedelta(minutes=rnd.randint(0, 60 * 24 * 20)),
+            )
+            for i in range(options["items"])
+        ]
+        vehicles = [
+            PlanVehicle(id=i, number=f"VH-{i:03d}", capacity=Decimal(rnd.choice([2000, 4000, 6000, 9000])))
+            for i in range(options["vehicles"])
+        ]
+
+        timings = []
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            result = plan(items, vehicles)
+            timings.append(time.perf_counter() - start)
+
+        total_qty = sum((it.qty for it in items), Decimal("0"))
+        self.stdout.write(
+            f"items={len(items)} vehicles={len(vehicles)} locations={len(locations)} "
+            f"total_qty={total_qty}"
+        )
+        self.stdout.write(
+            f"loads={len(result.loads)} planned_qty={result.planned_qty} "
+            f"unplaced_items={len(result.unplaced)}"
+        )
+        self.stdout.write(f"utilisation={result.utilisation:.1f}%")
+        self.stdout.write(
+            f"runtime best={min(timings) * 1000:.1f}ms "
+            f"worst={max(timings) * 1000:.1f}ms over {len(timings)} run(s)"
+        )
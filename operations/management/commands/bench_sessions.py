@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from dmor_paints.profiles import cache_settings, message_storage, session_engine
+from operations.loadtest import Step, run_load
+
+BENCH_USER = "bench_sessions"
+
+# sessions/cache/messages, the first one is the current default
+DEFAULT_PROFILES = [
+    "db/locmem/fallback",
+    "db/locmem/session",
+    "cached_db/locmem/cookie",
+    "cached_db/file/cookie",
+    "signed_cookies/locmem/cookie",
+]
+
+STEPS = [
+    Step("GET payment_clearance", "get", "/operations/payments/"),
+    # invalid header: flash error, page rendered right away
+    Step("POST bom calculate", "post", "/operations/bom-production/", {"action": "calculate"}),
+    # flash + redirect: the message is stored between the two requests
+    Step("POST bom clear_draft", "post", "/operations/bom-production/", {"action": "clear_draft"}, follow=True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark session / message backends: concurrent logged-in clients on "
+        "bom_production and payment_clearance, p50/p99 latency and lock errors "
+        "per profile. Writes sessions to the configured database, so run it "
+        "on a scratch copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--rounds", type=int, default=20)
+        parser.add_argument(
+            "--profile",
+            action="append",
+            dest="profiles",
+            help="sessions/cache/messages, e.g. cached_db/file/cookie (repeatable). "
+                 f"Default: {', '.join(DEFAULT_PROFILES)}",
+        )
+        parser.add_argument("--cache-dir", default="/tmp/dmor_bench_cache")
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"] or DEFAULT_PROFILES
+        overrides = {}
+        for profile in profiles:
+            try:
+                sessions, cache, msgs = profile.split("/")
+                overrides[profile] = {
+                    "SESSION_ENGINE": session_engine(sessions),
+                    "CACHES": cache_settings(cache, options["cache_dir"]),
+                    "MESSAGE_STORAGE": message_storage(msgs),
+                }
+            except ValueError as exc:
+                raise CommandError(f"Bad profile {profile!r}: {exc}")
+
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        try:
+            for profile, settings_override in overrides.items():
+                with override_settings(ALLOWED_HOSTS=["localhost"], **settings_override):
+                    result = run_load(
+                        profile,
+                        STEPS,
+                        workers=options["workers"],
+                        rounds=options["rounds"],
+                        setup_client=lambda client, n: client.force_login(user),
+                    )
+                for line in result.lines():
+                    self.stdout.write(line)
+        finally:
+            user.delete()
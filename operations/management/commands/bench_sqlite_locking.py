@@ -0,0 +1,101 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from dmor_paints.profiles import sqlite_options
+from masters.models import Product, ProductBOM
+from operations.loadtest import Step, run_load
+from operations.models import Order
+
+TAG = "LOCKTEST"
+HOLD_ORDERS = 50
+
+# "default" is run with the rollback journal explicitly: WAL sticks to the
+# database file once set, and would otherwise leak into the baseline
+PROFILES = {
+    "default": {"init_command": "PRAGMA journal_mode=DELETE"},
+    "tuned": sqlite_options("tuned", os.environ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "SQLite concurrency benchmark: parallel readers on payment_clearance "
+        "against writers on create_order, payment hold and the BOM save, once "
+        "with SQLite's defaults and once with the tuned profile "
+        "(DMOR_SQLITE=tuned). Reports latency and 'database is locked' errors. "
+        "Adds and removes its own orders and BOM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--rounds", type=int, default=25)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark is for SQLite databases.")
+
+        readers, writers = options["readers"], options["writers"]
+        reader_steps = [Step("GET payment_clearance", "get", "/operations/payments/")]
+        writer_steps = [
+            Step("POST create_order", "post", "/operations/create-order/", _order_data),
+            # read the order, then write it (get_object_or_404 + save)
+            Step("POST payment hold", "post", "/operations/payments/", self._hold_data),
+            # one transaction that reads first and writes after (view is atomic)
+            Step("POST bom save", "post", "/product-bom/", self._bom_data),
+        ]
+
+        db = connections["default"].settings_dict
+        original = db["OPTIONS"]
+        # the hold writer only toggles orders of its own (removed below)
+        self._order_ids = [
+            Order.objects.create(company=TAG, city=TAG, sales_person=TAG).id for _ in range(HOLD_ORDERS)
+        ]
+        self._bom_products = [Product.objects.create(name=f"{TAG} {i}") for i in range(4)]
+        try:
+            for name, profile_options in PROFILES.items():
+                connections.close_all()
+                db["OPTIONS"] = profile_options
+                with override_settings(ALLOWED_HOSTS=["localhost"]):
+                    result = run_load(
+                        name,
+                        lambda n: writer_steps if n < writers else reader_steps,
+                        workers=readers + writers,
+                        rounds=options["rounds"],
+                    )
+                for line in result.lines():
+                    self.stdout.write(line)
+        finally:
+            connections.close_all()
+            db["OPTIONS"] = original
+            Order.objects.filter(company=TAG).delete()
+            ProductBOM.objects.filter(category__in=self._bom_products).delete()
+            Product.objects.filter(id__in=[p.id for p in self._bom_products]).delete()
+
+    def _hold_data(self, worker, round_):
+        order_id = self._order_ids[(worker * 7 + round_) % len(self._order_ids)]
+        return {"order_id": order_id, "action": "hold" if round_ % 2 else "unhold"}
+
+    def _bom_data(self, worker, round_):
+        category, *lines = self._bom_products
+        data = {"category_id": category.id, "per_percent": "100"}
+        for i, p in enumerate(lines):
+            data[f"percent_{p.id}"] = str((worker + round_ + i) % 40 + 10)
+        return data
+
+
+def _order_data(worker, round_):
+    return {
+        "company": TAG,
+        "address": TAG,
+        "city": TAG,
+        "mobile1": "9000000000",
+        "mobile2": "9000000001",
+        "sales_person": f"writer {worker}",
+        "location": TAG,
+        "product_name": "Lock test product",
+        "quantity": "5",
+    }
@@ -0,0 +1,103 @@
+import datetime
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from operations import snapshots, stock
+from operations.models import MasterProduct, StockBalance, StockMovement, StockSnapshot
+
+TAG = "VALBENCH"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark historical stock valuation as the ledger grows: month by "
+        "month it adds movements and a monthly snapshot, then values a mid-month "
+        "day from the nearest snapshot and by replaying the whole ledger. Adds "
+        "(and removes) its own products; run it on a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--months", type=int, default=24)
+        parser.add_argument("--per-month", type=int, default=10000, help="Movements per month.")
+        parser.add_argument("--every", type=int, default=6, help="Measure every N months.")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        first = today.replace(day=1)
+        for _ in range(options["months"]):
+            first = (first - datetime.timedelta(days=1)).replace(day=1)
+        if StockSnapshot.objects.filter(as_of__gte=first).exists():
+            raise CommandError("There are snapshots in the benchmark period; use a scratch database.")
+
+        rng = random.Random(1)
+        products = MasterProduct.objects.bulk_create([
+            MasterProduct(name=f"{TAG} {i}", product_type=("RM", "PK", "FG")[i % 3], purchase_price=Decimal(rng.randint(10, 500)))
+            for i in range(options["products"])
+        ])
+        ids = [p.pk for p in products]
+        self.stdout.write(f"{'months':>6} {'movements':>10} {'snapshot':>10} {'replay':>10}  totals")
+        try:
+            month = first
+            for n in range(1, options["months"] + 1):
+                self._add_month(month, ids, options["per_month"], rng)
+                snapshots.take(snapshots.month_end(month), StockSnapshot.MONTHLY)
+                if n % options["every"] == 0 or n == options["months"]:
+                    self._measure(n, month.replace(day=15), ids)
+                month = snapshots.month_end(month) + datetime.timedelta(days=1)
+        finally:
+            StockSnapshot.objects.filter(as_of__gte=first).delete()
+            StockMovement.objects.filter(product_id__in=ids).delete()
+            StockBalance.objects.filter(pk__in=ids).delete()
+            MasterProduct.objects.filter(pk__in=ids).delete()
+
+    @staticmethod
+    def _add_month(month, ids, count, rng):
+        start = timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+        seconds = (snapshots.closing_time(snapshots.month_end(month)) - start).total_seconds()
+        movements = []
+        deltas = defaultdict(Decimal)
+        for i in range(count):
+            pid = rng.choice(ids)
+            qty = Decimal(rng.randint(1, 100)) * (1 if rng.random() < 0.55 else -1)
+            movements.append(StockMovement(
+                product_id=pid,
+                qty=qty,
+                source="inward" if qty > 0 else "dispatch",
+                source_id=0,
+                created_at=start + datetime.timedelta(seconds=seconds * i / count),
+            ))
+            deltas[pid] += qty
+        with transaction.atomic():
+            StockMovement.objects.bulk_create(movements, batch_size=2000)
+            stock._apply(list(deltas.items()), timezone.now())
+
+    def _measure(self, months, day, ids):
+        started = time.perf_counter()
+        totals = {t: v for t, _, _, v in snapshots.category_totals(snapshots.valuation(day))}
+        from_snapshot = time.perf_counter() - started
+
+        # the same day by summing every movement up to it
+        started = time.perf_counter()
+        replayed = dict(
+            StockMovement.objects.filter(created_at__lt=snapshots.closing_time(day))
+            .values("product_id")
+            .annotate(total=Sum("qty"))
+            .values_list("product_id", "total")
+        )
+        prices = dict(MasterProduct.objects.filter(pk__in=replayed).values_list("pk", "purchase_price"))
+        replay_value = sum((q * prices[pid] for pid, q in replayed.items()), Decimal("0"))
+        replay = time.perf_counter() - started
+
+        movements = StockMovement.objects.filter(product_id__in=ids).count()
+        match = "match" if sum(totals.values(), Decimal("0")) == replay_value else "DIFFER"
+        self.stdout.write(
+            f"{months:>6} {movements:>10} {from_snapshot * 1000:>8.1f}ms {replay * 1000:>8.1f}ms  {match}"
+        )
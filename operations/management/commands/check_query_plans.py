@@ -0,0 +1,89 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from operations.queries import screen_queries
+
+# request params every screen is checked with (params a screen does not
+# know are ignored by it, duplicates are skipped)
+PARAM_SETS = [
+    {},
+    {"company": "x"},
+    {"city": "x"},
+    {"location": "x"},
+    {"sales_person": "x"},
+    {"payment": "yes"},
+    {"hold": "yes"},
+    {"accepted": "no"},
+    {"date_from": "2025-01-01", "date_to": "2025-01-31"},
+    {"sort": "age"},
+    {"sort": "-age"},
+    {"min_age_days": "3"},
+]
+
+# SQLite: "SCAN operations_order" is a full table scan, "SCAN ... USING INDEX" is not
+SQLITE_FULL_SCAN_RE = re.compile(r"^SCAN (\S+)$")
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the list queries of the operation screens and fail when one "
+        "of them falls back to a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print every plan, not only the failing ones.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            explain = self._explain_sqlite
+        elif connection.vendor == "postgresql":
+            explain = self._explain_postgresql
+        else:
+            raise CommandError(f"Query plan check not supported on {connection.vendor}.")
+
+        seen = set()
+        failures = 0
+        for params in PARAM_SETS:
+            for screen, qs in screen_queries(params):
+                sql, sql_params = qs.query.sql_with_params()
+                if sql in seen:
+                    continue
+                seen.add(sql)
+
+                lines, full_scans = explain(sql, sql_params)
+                label = f"{screen} {params or ''}".strip()
+                if full_scans:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}: {', '.join(full_scans)}"))
+                else:
+                    self.stdout.write(f"ok         {label}")
+                if full_scans or options["verbose_plans"]:
+                    for line in lines:
+                        self.stdout.write(f"    {line}")
+
+        if failures:
+            raise CommandError(f"{failures} screen query(ies) use a full table scan.")
+        self.stdout.write(self.style.SUCCESS(f"{len(seen)} screen queries use indexes."))
+
+    def _explain_sqlite(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            lines = [row[-1] for row in cursor.fetchall()]
+        full_scans = [m.group(1) for m in map(SQLITE_FULL_SCAN_RE.match, lines) if m]
+        return lines, full_scans
+
+    def _explain_postgresql(self, sql, params):
+        # tiny tables are always cheaper to seq scan, so ask whether the
+        # planner *can* avoid it rather than whether it wants to
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}", params)
+            lines = [row[0] for row in cursor.fetchall()]
+        full_scans = [line.strip() for line in lines if "Seq Scan on" in line]
+        return lines, full_scans
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from operations import alerts
+from operations.models import StockAlert
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare on-hand stock with the min stock levels of the product "
+        "masters and update the low stock alerts. Only products with stock "
+        "movements since the last run are checked, unless --full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Check every product.")
+        parser.add_argument("--list", action="store_true", help="Print the products under their min level.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        run = alerts.check(full=options["full"])
+        took = (time.perf_counter() - started) * 1000
+
+        if run is None:
+            self.stdout.write(f"No stock movements since the last check ({took:.0f} ms).")
+        else:
+            self.stdout.write(
+                f"Checked {run.checked} product(s){' (full)' if run.full else ''} in {took:.0f} ms: "
+                f"{run.raised} new alert(s), {run.cleared} cleared."
+            )
+        self.stdout.write(f"{StockAlert.objects.count()} product(s) under their min stock level.")
+
+        if options["list"]:
+            for alert in StockAlert.objects.select_related("product").order_by("product__name"):
+                self.stdout.write(f"  {alert.product}: {alert.on_hand} < {alert.min_level}")
@@ -0,0 +1,67 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from operations import incentives
+from operations.models import IncentivePayout
+
+
+def _month(value):
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"{value!r} is not a month like 2025-01.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the sales-person incentive payouts. Without options only the "
+        "payouts marked stale by changed orders (split, cancel, ...) are redone; "
+        "--month / --from / --to recompute whole months, e.g. after changing "
+        "incentive rates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="Recompute this month (YYYY-MM).")
+        parser.add_argument("--from", dest="start", help="Recompute from this month (YYYY-MM) ...")
+        parser.add_argument("--to", dest="end", help="... up to this month (default: this month).")
+        parser.add_argument("--list", action="store_true", help="Print the payouts of the months computed.")
+
+    def handle(self, *args, **options):
+        months = []
+        if options["month"]:
+            months = [_month(options["month"])]
+        elif options["start"]:
+            month = _month(options["start"])
+            end = _month(options["end"]) if options["end"] else timezone.localdate().replace(day=1)
+            if end < month:
+                raise CommandError("--to is before --from.")
+            while month <= end:
+                months.append(month)
+                month = incentives.next_month(month)
+        elif options["end"]:
+            raise CommandError("--to needs --from.")
+
+        started = time.perf_counter()
+        if months:
+            done = incentives.recompute(months)
+            for month, sellers in done.items():
+                self.stdout.write(f"{month:%Y-%m}: {sellers} sales person(s)")
+        else:
+            done = incentives.recompute_stale()
+            for month, sellers in done.items():
+                self.stdout.write(f"{month:%Y-%m}: {sellers} stale payout(s) recomputed")
+            if not done:
+                self.stdout.write("No stale payouts.")
+        self.stdout.write(f"Done in {time.perf_counter() - started:.2f}s.")
+
+        if options["list"]:
+            for payout in IncentivePayout.objects.filter(month__in=done, orders__gt=0).order_by("month", "-amount"):
+                self.stdout.write(
+                    f"{payout.month:%Y-%m} {payout.sales_person or '(unassigned)':<30} "
+                    f"{payout.orders:>6} order(s) qty {payout.quantity:>12,.2f}  "
+                    f"incentive {payout.amount:>12,.2f}"
+                    + (f"  ({payout.unmatched_orders} without rate)" if payout.unmatched_orders else "")
+                )
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operations.models import MasterProduct
+from operations.pricing import IMPORT_CHUNK_SIZE, import_price_list, read_price_list
+
+
+class Command(BaseCommand):
+    help = "Import a CSV (or XLSX) price list keyed on MasterProduct.code."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file with code / selling_price / purchase_price columns.")
+        parser.add_argument(
+            "--type",
+            choices=[t for t, _ in MasterProduct.PRODUCT_TYPES],
+            help="Only update products of this type.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without saving.",
+        )
+
+    def handle(self, *args, **options):
+        products = MasterProduct.objects.all()
+        if options["type"]:
+            products = products.filter(product_type=options["type"])
+
+        try:
+            with open(options["path"], "rb") as fh:
+                rows = read_price_list(fh, options["path"])
+                result = import_price_list(
+                    rows, products, chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+                )
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for line, message in result.errors:
+            self.stdout.write(self.style.WARNING(f"line {line}: {message}"))
+        if result.unknown_codes:
+            self.stdout.write(
+                self.style.WARNING(f"{len(result.unknown_codes)} unknown code(s): {', '.join(result.unknown_codes[:20])}")
+            )
+
+        prefix = "Would update" if options["dry_run"] else "Updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {result.updated} product(s) from {result.rows} row(s); "
+            f"{result.unchanged} unchanged, {len(result.errors)} error(s)."
+        ))
@@ -0,0 +1,95 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from operations.loadtest import Step, run_load
+from operations.models import Dispatch, DispatchItem, Order, Vehicle
+
+TAG = "LOADTEST"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the create_order and dispatch_order POSTs with a growing "
+        "number of concurrent workers and report throughput per worker count. "
+        "Creates (and removes) its own orders, pending items and vehicle; run "
+        "it on a scratch database, e.g. DMOR_DB=postgres against a local server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", default="1,2,4,8", help="Comma separated worker counts.")
+        parser.add_argument("--rounds", type=int, default=20, help="Requests per step and worker.")
+
+    def handle(self, *args, **options):
+        try:
+            worker_counts = [int(w) for w in options["workers"].split(",")]
+        except ValueError:
+            raise CommandError("--workers takes a comma separated list of numbers.")
+        rounds = options["rounds"]
+
+        self.stdout.write(f"database: {connection.vendor} {connection.settings_dict['NAME']}")
+        vehicle = Vehicle.objects.create(number=f"{TAG}-{os.getpid()}", capacity_qty=0)
+        try:
+            baseline = None
+            for workers in worker_counts:
+                item_ids = self._pending_items(workers * rounds)
+                steps = [
+                    Step("POST create_order", "post", "/operations/create-order/", self._order_data),
+                    Step(
+                        "POST dispatch_order",
+                        "post",
+                        "/operations/dispatch-order/",
+                        lambda n, r, item_ids=item_ids: {
+                            "action": "create_dispatch",
+                            "vehicle": vehicle.id,
+                            "remark": TAG,
+                            # every request dispatches a line of its own
+                            "selected_items": [item_ids[n * rounds + r]],
+                        },
+                    ),
+                ]
+                with override_settings(ALLOWED_HOSTS=["localhost"]):
+                    result = run_load(f"{workers} worker(s)", steps, workers=workers, rounds=rounds)
+
+                baseline = baseline or result.throughput
+                for line in result.lines():
+                    self.stdout.write(line)
+                if baseline:
+                    self.stdout.write(f"    scaling vs first run: x{result.throughput / baseline:.2f}")
+        finally:
+            Dispatch.objects.filter(vehicle=vehicle).delete()  # cascades to the items
+            DispatchItem.objects.filter(company_name=TAG).delete()
+            Order.objects.filter(company=TAG).delete()
+            vehicle.delete()
+
+    @staticmethod
+    def _order_data(worker, round_):
+        return {
+            "company": TAG,
+            "address": "Load test",
+            "city": "Load test",
+            "mobile1": "9000000000",
+            "mobile2": "9000000001",
+            "sales_person": f"worker {worker}",
+            "location": "Load test",
+            "product_name": "Load test product",
+            "quantity": "10",
+            "price": "100",
+            "total_price": "1000",
+        }
+
+    @staticmethod
+    def _pending_items(count):
+        return [item.pk for item in DispatchItem.objects.bulk_create([
+            DispatchItem(
+                order_id=0,
+                company_name=TAG,
+                location=TAG,
+                product="Load test product",
+                available_qty=10,
+                qty=10,
+            )
+            for _ in range(count)
+        ])]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from operations.requirements import explode_active_batches
+
+
+class Command(BaseCommand):
+    help = "Daily material requirement report: raw material needed by all ACTIVE batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--per-batch",
+            action="store_true",
+            help="Also list the requirement of every batch.",
+        )
+
+    def handle(self, *args, **options):
+        per_batch, totals = explode_active_batches()
+
+        if options["per_batch"]:
+            for batch_id, reqs in per_batch.items():
+                self.stdout.write(f"Batch {batch_id}")
+                for r in reqs:
+                    self.stdout.write(f"    {r.name:<40} {r.qty:>12}")
+
+        self.stdout.write(f"Requirement for {len(per_batch)} active batch(es)")
+        for r in totals:
+            flag = "" if r.master_product_id else "  (no matching MasterProduct)"
+            self.stdout.write(f"{r.name:<44} {r.qty:>12}{flag}")
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operations import sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the sales rollups from the existing orders, a chunk of order "
+        "days at a time (grouped in SQL), "
+        "and fix the rows that differ. Use it once after deploying the "
+        "rollups, and after bulk order imports. Run it while nobody edits orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report differences; exit 1 when there are any.")
+        parser.add_argument("--chunk-days", type=int, default=sales.REBUILD_CHUNK_DAYS, help="Order days per chunk.")
+
+    def handle(self, *args, **options):
+        drift = sales.rebuild_rollups(options["chunk_days"], dry_run=options["check"])
+        for (day, dimension, key), (was, now) in sorted(drift.items())[:50]:
+            self.stdout.write(f"{day} {dimension:<12} {key[:30]:<30} {self._text(was):>24} -> {self._text(now)}")
+        if len(drift) > 50:
+            self.stdout.write(f"... and {len(drift) - 50} more")
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{len(drift)} rollup row(s) differ from the orders.")
+            self.stdout.write("Rollups match the orders.")
+        else:
+            self.stdout.write(f"{len(drift)} rollup row(s) fixed.")
+
+    @staticmethod
+    def _text(totals):
+        if totals is None:
+            return "-"
+        orders, qty, revenue = totals
+        return f"{orders} / {qty} / {revenue}"
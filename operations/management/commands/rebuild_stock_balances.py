@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operations import stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stock balances from the stock movement ledger in one "
+        "streamed pass and fix the ones that drifted. Run it while nothing "
+        "is posting stock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report drift; exit 1 when there is any.")
+        parser.add_argument("--chunk-size", type=int, default=stock.REBUILD_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        drift = stock.rebuild_balances(options["chunk_size"], dry_run=options["check"])
+        for pid, (was, now) in sorted(drift.items())[:50]:
+            self.stdout.write(f"product {pid:<8} {was if was is not None else '-':>14} -> {now}")
+        if len(drift) > 50:
+            self.stdout.write(f"... and {len(drift) - 50} more")
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{len(drift)} balance(s) differ from the ledger.")
+            self.stdout.write("Balances match the ledger.")
+        else:
+            self.stdout.write(f"{len(drift)} balance(s) fixed.")
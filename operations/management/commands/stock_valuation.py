@@ -0,0 +1,59 @@
+import csv
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from operations import snapshots
+from operations.models import MasterProduct
+
+TYPE_NAMES = dict(MasterProduct.PRODUCT_TYPES)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stock valuation at the close of a day (default: yesterday): qty from "
+        "the nearest snapshot plus movements, times the purchase price or the "
+        "product master's raw material cost. Prints a total per product type; "
+        "--detail streams one CSV line per product first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Day to value (YYYY-MM-DD).")
+        parser.add_argument("--price", choices=snapshots.PRICE_SOURCES, default="purchase")
+        parser.add_argument("--detail", action="store_true", help="CSV line per product.")
+
+    def handle(self, *args, **options):
+        if options["date"]:
+            try:
+                day = datetime.date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must look like 2025-01-31.")
+        else:
+            day = timezone.localdate() - datetime.timedelta(days=1)
+
+        rows = snapshots.valuation(day, options["price"])
+        if options["detail"]:
+            rows = self._write_detail(rows)
+
+        grand_qty = grand_value = 0
+        totals = []
+        for product_type, products, qty, value in snapshots.category_totals(rows):
+            totals.append(
+                f"{TYPE_NAMES.get(product_type, product_type):<16} {products:>7} product(s) "
+                f"qty {qty:>14,.2f}  value {value:>16,.2f}"
+            )
+            grand_qty += qty
+            grand_value += value
+        # after the detail lines, so the CSV part stays one block
+        self.stdout.write(f"Stock valuation at the close of {day} ({options['price']} price)")
+        for line in totals:
+            self.stdout.write(line)
+        self.stdout.write(f"{'Total':<16} {'':>18} qty {grand_qty:>14,.2f}  value {grand_value:>16,.2f}")
+
+    def _write_detail(self, rows):
+        writer = csv.writer(self.stdout)
+        writer.writerow(["type", "product_id", "product", "qty", "price", "value"])
+        for row in rows:
+            writer.writerow(row)
+            yield row
@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from operations import snapshots
+from operations.models import StockSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the closing stock of every product for a day that has ended: "
+        "yesterday by default, or the end of last month with --period monthly. "
+        "Run it nightly (and monthly) from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Day to snapshot (YYYY-MM-DD).")
+        parser.add_argument(
+            "--period",
+            choices=[StockSnapshot.DAILY, StockSnapshot.MONTHLY],
+            default=StockSnapshot.DAILY,
+        )
+        parser.add_argument(
+            "--prune-daily",
+            type=int,
+            metavar="DAYS",
+            help="Also delete daily snapshots older than DAYS (monthly ones are kept).",
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options["date"]:
+            try:
+                day = datetime.date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must look like 2025-01-31.")
+        elif options["period"] == StockSnapshot.MONTHLY:
+            day = today.replace(day=1) - datetime.timedelta(days=1)
+        else:
+            day = today - datetime.timedelta(days=1)
+        if options["period"] == StockSnapshot.MONTHLY:
+            day = snapshots.month_end(day)
+
+        try:
+            snapshot, lines = snapshots.take(day, options["period"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"{snapshot}: {lines} product(s) with stock.")
+
+        if options["prune_daily"] is not None:
+            pruned = snapshots.prune_daily(options["prune_daily"], today)
+            self.stdout.write(f"Deleted {pruned} old daily snapshot(s).")
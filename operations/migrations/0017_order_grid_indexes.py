@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0016_alter_batchitem_product_alter_batchitem_qty'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factoryorder',
+            index=models.Index(fields=['-order_created', '-id'], name='factory_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factoryorder',
+            index=models.Index(fields=['company_name', '-order_created', '-id'], name='factory_company_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factoryorder',
+            index=models.Index(fields=['location', '-order_created', '-id'], name='factory_location_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factoryorder',
+            index=models.Index(fields=['sales_person', '-order_created', '-id'], name='factory_sales_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_cancelled', 'on_hold', '-order_created', '-id'], name='order_cancel_hold_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_cancelled', '-order_created', '-id'], name='order_cancel_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['company', '-order_created', '-id'], name='order_company_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['city', '-order_created', '-id'], name='order_city_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['sales_person', '-order_created', '-id'], name='order_sales_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0017_order_grid_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_cancel_hold_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_cancel_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='dispatchitem',
+            index=models.Index(condition=models.Q(('dispatch__isnull', True)), fields=['order_id'], name='dispatchitem_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispatchitem',
+            index=models.Index(condition=models.Q(('dispatch__isnull', True)), fields=['ready_at', 'id'], name='dispatchitem_pending_ready_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['on_hold', '-order_created', '-id'], name='order_open_hold_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['-order_created', '-id'], name='order_open_created_idx'),
+        ),
+    ]
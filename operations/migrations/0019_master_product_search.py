@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from masters import search
+
+
+def forwards(apps, schema_editor):
+    if search.SEARCH_TABLE in schema_editor.connection.introspection.table_names():
+        search.populate(
+            "master_product",
+            apps.get_model("operations", "MasterProduct"),
+            code_field="code",
+            using=schema_editor.connection,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0013_product_search'),
+        ('operations', '0018_partial_grid_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
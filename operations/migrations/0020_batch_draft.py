@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:40
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0013_product_search'),
+        ('operations', '0019_master_product_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('labour', models.CharField(blank=True, default='', max_length=200)),
+                ('base_qty', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('production_qty', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('remark', models.TextField(blank=True)),
+                ('calculated', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='masters.product')),
+                ('owner', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='batch_draft', to=settings.AUTH_USER_MODEL)),
+                ('supervisor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='masters.employee')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BatchDraftItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('draft', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='operations.batchdraft')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='operations.masterproduct')),
+            ],
+            options={
+                'ordering': ['id'],
+                'constraints': [models.UniqueConstraint(fields=('draft', 'product'), name='batchdraftitem_unique_product')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:54
+
+import django.db.models.deletion
+import django.utils.timezone
+import operations.models
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0020_batch_draft'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_balance', serialize=False, to='operations.masterproduct')),
+                ('on_hand', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='materialdiscard',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='discards', to='operations.masterproduct'),
+        ),
+        migrations.AddField(
+            model_name='materialdiscard',
+            name='qty',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, validators=[operations.models.validate_non_negative]),
+        ),
+        migrations.AddField(
+            model_name='materialinward',
+            name='qty',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, validators=[operations.models.validate_non_negative]),
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('source', models.CharField(choices=[('inward', 'Material inward'), ('batch', 'Batch consumption'), ('discard', 'Material discard'), ('dispatch', 'Dispatch'), ('return', 'Material return')], max_length=10)),
+                ('source_id', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='operations.masterproduct')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at', 'id'], name='stockmove_product_idx'), models.Index(fields=['source', 'source_id'], name='stockmove_source_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0021_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_alert', serialize=False, to='operations.masterproduct')),
+                ('min_level', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('on_hand', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('raised_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockCheck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ran_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('full', models.BooleanField(default=False)),
+                ('checked', models.IntegerField(default=0)),
+                ('raised', models.IntegerField(default=0)),
+                ('cleared', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
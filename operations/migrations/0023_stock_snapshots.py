@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0022_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('daily', 'Daily'), ('monthly', 'Monthly')], max_length=10)),
+                ('as_of', models.DateField()),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockSnapshotLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_at'], name='stockmove_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['as_of'], name='stocksnapshot_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('period', 'as_of'), name='stocksnapshot_period_day_uniq'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotline',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='operations.masterproduct'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotline',
+            name='snapshot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='operations.stocksnapshot'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshotline',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'product'), name='stocksnapshotline_uniq'),
+        ),
+    ]
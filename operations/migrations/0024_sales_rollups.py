@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:02
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0023_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(choices=[('all', 'All orders'), ('product', 'Product'), ('city', 'City'), ('sales_person', 'Sales person')], max_length=12)),
+                ('key', models.CharField(blank=True, max_length=200)),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'day', 'key'), name='salesrollup_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:10
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0024_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncentivePayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month.')),
+                ('sales_person', models.CharField(blank=True, max_length=200)),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('unmatched_orders', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('stale_since', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('stale_since__isnull', False)), fields=['month'], name='incentivepayout_stale_idx')],
+                'constraints': [models.UniqueConstraint(fields=('month', 'sales_person'), name='incentivepayout_uniq')],
+            },
+        ),
+    ]
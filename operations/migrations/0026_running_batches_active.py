@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def running_to_active(apps, schema_editor):
+    # the batch screen used to save started batches as "RUNNING" (not a status choice)
+    Batch = apps.get_model("operations", "Batch")
+    Batch.objects.filter(status="RUNNING").update(status="ACTIVE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("operations", "0025_incentive_payouts"),
+    ]
+
+    operations = [
+        migrations.RunPython(running_to_active, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0026_running_batches_active'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='masterproduct',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='masterproduct_lname_idx'),
+        ),
+    ]
@@ -1,12 +1,17 @@
 # operations/models.py
 
 from decimal import Decimal
+from django.conf import settings
 from django.db import models
+from django.db.models import Sum, Value
+from django.db.models.functions import Coalesce, Lower
 from django.core.validators import RegexValidator, MinValueValidator
 from django.forms import ValidationError
 from django.utils import timezone
 from masters.models import Employee, Product
 
+from .elapsed import elapsed_text
+
 # -------------------------------------------------------------------
 # Common validators
 # -------------------------------------------------------------------
@@ -128,26 +133,35 @@ class Order(models.Model):
     is_split = models.BooleanField(default=False)
     is_cancelled = models.BooleanField(default=False)
 
+    class Meta:
+        # keyset pages of the order grids: filter, then (order_created, id) newest first.
+        # The grids never show cancelled orders, so those are left out of the
+        # (partial) indexes altogether.
+        indexes = [
+            models.Index(
+                fields=["on_hold", "-order_created", "-id"],
+                name="order_open_hold_created_idx",
+                condition=models.Q(is_cancelled=False),
+            ),
+            models.Index(
+                fields=["-order_created", "-id"],
+                name="order_open_created_idx",
+                condition=models.Q(is_cancelled=False),
+            ),
+            models.Index(fields=["company", "-order_created", "-id"], name="order_company_created_idx"),
+            models.Index(fields=["city", "-order_created", "-id"], name="order_city_created_idx"),
+            models.Index(fields=["sales_person", "-order_created", "-id"], name="order_sales_created_idx"),
+        ]
+
     # -----------------------------------------------------------------
     # Helpers
     # -----------------------------------------------------------------
     def time_span(self):
         """
         Live 'time span since order_created', e.g. '2 Days 5 Hours 12 Minutes'.
-        Safe with timezone-aware datetimes.
+        Uses the `age` annotation when the queryset has one (see operations.elapsed).
         """
-        if not self.order_created:
-            return ""
-        now = timezone.now()
-        delta = now - timezone.localtime(self.order_created)
-
-        days = delta.days
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
-
-        if days:
-            return f"{days} Days {hours} Hours {minutes} Minutes"
-        return f"{hours} Hours {minutes} Minutes"
+        return elapsed_text(self, "order_created", always_days=False)
 
     def __str__(self):
         return f"{self.company or ''} - {self.product_name or ''}"
@@ -167,14 +181,17 @@ class FactoryOrder(models.Model):
     remark = models.CharField(max_length=255, null=True, blank=True)
     factory_accepted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-order_created", "-id"], name="factory_created_idx"),
+            models.Index(fields=["company_name", "-order_created", "-id"], name="factory_company_created_idx"),
+            models.Index(fields=["location", "-order_created", "-id"], name="factory_location_created_idx"),
+            models.Index(fields=["sales_person", "-order_created", "-id"], name="factory_sales_created_idx"),
+        ]
+
     def time_span(self):
         """Return a string like '14 Days 5 Hours 48 Minutes'."""
-        delta = timezone.now() - timezone.localtime(self.order_created)
-
-        days = delta.days
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
-        return f"{days} Days {hours} Hours {minutes} Minutes"
+        return elapsed_text(self, "order_created")
 
     def __str__(self):
         return f"{self.order_id} - {self.company_name}"
@@ -243,6 +260,63 @@ class BatchItem(models.Model):
     def __str__(self):
         return f"{self.product} ({self.qty})"
 
+
+class BatchDraft(models.Model):
+    """
+    A batch being prepared on the BOM production screen. Lives in the DB
+    (one per user, or per session for anonymous use) until Start Batch
+    turns it into a Batch.
+    """
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="batch_draft",
+        null=True,
+        blank=True,
+    )
+
+    # header, as last entered
+    supervisor = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, blank=True)
+    labour = models.CharField(max_length=200, blank=True, default="")
+    category = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    base_qty = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    production_qty = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    remark = models.TextField(blank=True)
+
+    calculated = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    HEADER_FIELDS = ["supervisor", "labour", "category", "base_qty", "production_qty", "remark"]
+
+    def header_initial(self):
+        """Initial data for BatchForm."""
+        return {
+            "supervisor": self.supervisor_id,
+            "labour": self.labour,
+            "category": self.category_id,
+            "base_qty": self.base_qty,
+            "production_qty": self.production_qty,
+            "remark": self.remark,
+        }
+
+    def __str__(self):
+        return f"Batch draft {self.id}"
+
+
+class BatchDraftItem(models.Model):
+    draft = models.ForeignKey(BatchDraft, related_name="items", on_delete=models.CASCADE)
+    product = models.ForeignKey("MasterProduct", on_delete=models.CASCADE, related_name="+")
+    qty = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(fields=["draft", "product"], name="batchdraftitem_unique_product"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} ({self.qty})"
+
 # -------------------------------------------------------------------
 # Dispatch / Logistics models
 # -------------------------------------------------------------------
@@ -260,22 +334,44 @@ class Vehicle(models.Model):
         return self.number
 
 
+def load_percent(qty, capacity):
+    """Load of qty on a vehicle of the given capacity, in percent."""
+    if not capacity:
+        return 0
+    return float(qty or 0) / float(capacity) * 100
+
+
+class DispatchQuerySet(models.QuerySet):
+    def with_load(self):
+        """
+        Dispatches with their vehicle and summed item qty (load_qty) fetched
+        in the same query, so total_qty()/load_percentage() need no queries.
+        """
+        return self.select_related("vehicle").annotate(
+            load_qty=Coalesce(
+                Sum("items__qty"),
+                Value(Decimal("0")),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+
 class Dispatch(models.Model):
     vehicle = models.ForeignKey(Vehicle, on_delete=models.PROTECT)
     remark = models.TextField(blank=True)
 
     created_at = models.DateTimeField(default=timezone.now)
 
+    objects = DispatchQuerySet.as_manager()
+
     def total_qty(self):
-        total = Decimal("0")
-        for item in self.items.all():
-            total += item.qty
-        return total
+        # annotated by Dispatch.objects.with_load()
+        if hasattr(self, "load_qty"):
+            return self.load_qty
+        return self.items.aggregate(total=Sum("qty"))["total"] or Decimal("0")
 
     def load_percentage(self):
-        if not self.vehicle.capacity_qty:
-            return 0
-        return float(self.total_qty()) / float(self.vehicle.capacity_qty) * 100
+        return load_percent(self.total_qty(), self.vehicle.capacity_qty)
 
     def __str__(self):
         return f"Dispatch {self.id} - {self.vehicle.number}"
@@ -319,16 +415,22 @@ class DispatchItem(models.Model):
         Delay between 'ready_at' and now, shown like
         '25 Days 18 Hours 15 Minutes'.
         """
-        end = timezone.now()
-        delta = end - timezone.localtime(self.ready_at)
-
-        days = delta.days
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
-
-        if days:
-            return f"{days} Days {hours} Hours {minutes} Minutes"
-        return f"{hours} Hours {minutes} Minutes"
+        return elapsed_text(self, "ready_at", always_days=False)
+
+    class Meta:
+        # the dispatch screen only lists pending lines (no dispatch yet)
+        indexes = [
+            models.Index(
+                fields=["order_id"],
+                name="dispatchitem_pending_idx",
+                condition=models.Q(dispatch__isnull=True),
+            ),
+            models.Index(
+                fields=["ready_at", "id"],
+                name="dispatchitem_pending_ready_idx",
+                condition=models.Q(dispatch__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.order_id} - {self.company_name}"
@@ -337,6 +439,29 @@ class DispatchItem(models.Model):
 # -------------------------------------------------------------------
 # Raw Material Inward models
 # -------------------------------------------------------------------
+class MasterProductQuerySet(models.QuerySet):
+    def ids_by_name(self, names):
+        """
+        {name: MasterProduct id} for the names that match a product. The one
+        place text product names (BOM lines, order / dispatch / return lines)
+        are resolved: case-insensitive, raw material first, then lowest id.
+        """
+        names = {name for name in names if name}
+        if not names:
+            return {}
+        best = {}
+        candidates = (
+            self.annotate(lname=Lower("name"))
+            .filter(lname__in={name.lower() for name in names})
+            .order_by("id")
+            .values_list("lname", "id", "product_type")
+        )
+        for lname, pk, product_type in candidates:
+            if lname not in best or (product_type == "RM" and best[lname][1] != "RM"):
+                best[lname] = (pk, product_type)
+        return {name: best[name.lower()][0] for name in names if name.lower() in best}
+
+
 class MasterProduct(models.Model):
     PRODUCT_TYPES = [
         ("FG", "Finished Goods"),
@@ -367,6 +492,14 @@ class MasterProduct(models.Model):
         validators=[validate_non_negative],
     )
 
+    objects = MasterProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # name lookups (ids_by_name: dispatches, stock alerts, ...) are case-insensitive
+            models.Index(Lower("name"), name="masterproduct_lname_idx"),
+        ]
+
     def __str__(self):
         return f"{self.code} - {self.name}" if self.code else self.name
 
@@ -385,6 +518,12 @@ class MaterialInward(models.Model):
 
     inward_date = models.DateField(default=timezone.now)
     bill_no = models.CharField(max_length=50)
+    qty = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        validators=[validate_non_negative],
+    )
 
     remark = models.TextField(blank=True)
 
@@ -407,6 +546,16 @@ class MaterialDiscard(models.Model):
         max_length=20,
         choices=CATEGORY_CHOICES,
     )
+    # empty on discards logged before the stock ledger
+    product = models.ForeignKey(
+        MasterProduct, on_delete=models.PROTECT, null=True, blank=True, related_name="discards"
+    )
+    qty = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        validators=[validate_non_negative],
+    )
     remark = models.TextField(blank=True)
 
     created_at = models.DateTimeField(default=timezone.now)
@@ -429,11 +578,199 @@ class MaterialReturn(models.Model):
     returned_at = models.DateTimeField(default=timezone.now)
 
     def time_span(self):
-        delta = timezone.now() - self.returned_at
-        days = delta.days
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
-        return f"{days} Days {hours} Hours {minutes} Minutes"
+        return elapsed_text(self, "returned_at")
+
+    def __str__(self):
+        return f"Return {self.order_id} - {self.company_name}"
+
+
+# -------------------------------------------------------------------
+# Stock ledger (see operations/stock.py)
+# -------------------------------------------------------------------
+
+class StockMovement(models.Model):
+    """
+    One line of the stock ledger: qty in (+) or out (-) of a product,
+    posted by the document in source / source_id. Append-only: a change
+    to the document is posted as a new correcting line.
+    """
+    SOURCE_CHOICES = [
+        ("inward", "Material inward"),
+        ("batch", "Batch consumption"),
+        ("discard", "Material discard"),
+        ("dispatch", "Dispatch"),
+        ("return", "Material return"),
+    ]
+
+    product = models.ForeignKey(MasterProduct, on_delete=models.PROTECT, related_name="stock_movements")
+    qty = models.DecimalField(max_digits=12, decimal_places=2)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    source_id = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "created_at", "id"], name="stockmove_product_idx"),
+            models.Index(fields=["source", "source_id"], name="stockmove_source_idx"),
+            # movements between two dates (snapshots.py)
+            models.Index(fields=["created_at"], name="stockmove_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stock movements are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Stock movements are append-only.")
+
+    def __str__(self):
+        return f"{self.product} {self.qty:+} ({self.source} #{self.source_id})"
+
+
+class StockBalance(models.Model):
+    """On-hand qty of a product = the sum of its movements, kept by stock.post()."""
+    product = models.OneToOneField(
+        MasterProduct, on_delete=models.CASCADE, primary_key=True, related_name="stock_balance"
+    )
+    on_hand = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.product}: {self.on_hand}"
+
+
+class StockSnapshot(models.Model):
+    """
+    Closing stock of every product at the end of as_of (lines; products
+    without a line had none). See operations/snapshots.py.
+    """
+    DAILY = "daily"
+    MONTHLY = "monthly"
+    PERIOD_CHOICES = [(DAILY, "Daily"), (MONTHLY, "Monthly")]
+
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    as_of = models.DateField()
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "as_of"], name="stocksnapshot_period_day_uniq"),
+        ]
+        indexes = [models.Index(fields=["as_of"], name="stocksnapshot_day_idx")]
+
+    def __str__(self):
+        return f"{self.get_period_display()} stock {self.as_of}"
+
+
+class StockSnapshotLine(models.Model):
+    snapshot = models.ForeignKey(StockSnapshot, on_delete=models.CASCADE, related_name="lines")
+    product = models.ForeignKey(MasterProduct, on_delete=models.CASCADE, related_name="+")
+    qty = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "product"], name="stocksnapshotline_uniq"),
+        ]
+
+
+class StockAlert(models.Model):
+    """
+    A product under its min stock level (ProductMaster.min_stock_level).
+    There is a row exactly while the product is short; kept by alerts.check().
+    """
+    product = models.OneToOneField(
+        MasterProduct, on_delete=models.CASCADE, primary_key=True, related_name="stock_alert"
+    )
+    min_level = models.DecimalField(max_digits=10, decimal_places=2)
+    on_hand = models.DecimalField(max_digits=14, decimal_places=2)
+    raised_at = models.DateTimeField(default=timezone.now)
+    checked_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def shortfall(self):
+        return self.min_level - self.on_hand
+
+    def __str__(self):
+        return f"{self.product}: {self.on_hand} < {self.min_level}"
+
+
+class StockCheck(models.Model):
+    """One alerts.check() run. The next run starts after last_movement_id."""
+    ran_at = models.DateTimeField(default=timezone.now)
+    last_movement_id = models.BigIntegerField(default=0)
+    full = models.BooleanField(default=False)
+    checked = models.IntegerField(default=0)
+    raised = models.IntegerField(default=0)
+    cleared = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Stock check {self.ran_at:%Y-%m-%d %H:%M} (+{self.raised} / -{self.cleared})"
+
+
+# -------------------------------------------------------------------
+# Sales rollups (see operations/sales.py)
+# -------------------------------------------------------------------
+
+class SalesRollup(models.Model):
+    """
+    Orders, quantity and revenue of the non-cancelled orders created on
+    one day, per product / city / sales person (key) or overall
+    (dimension "all", empty key). Kept by sales.py as orders change.
+    """
+    ALL = "all"
+    DIMENSION_CHOICES = [
+        (ALL, "All orders"),
+        ("product", "Product"),
+        ("city", "City"),
+        ("sales_person", "Sales person"),
+    ]
+
+    day = models.DateField()
+    dimension = models.CharField(max_length=12, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=200, blank=True)
+    orders = models.IntegerField(default=0)
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        constraints = [
+            # also serves the report's dimension + day range reads
+            models.UniqueConstraint(fields=["dimension", "day", "key"], name="salesrollup_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension} {self.key}: {self.orders} order(s), {self.revenue}"
+
+
+class IncentivePayout(models.Model):
+    """
+    Incentive a sales person earned in a month: order qty x the product's
+    ProductMaster.incentive, over the month's non-cancelled orders. Written
+    by incentives.py; stale_since is set when an order of the month
+    changed after it was computed.
+    """
+    month = models.DateField(help_text="First day of the month.")
+    sales_person = models.CharField(max_length=200, blank=True)
+    orders = models.IntegerField(default=0)
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    # orders whose product has no incentive rate (not in amount)
+    unmatched_orders = models.IntegerField(default=0)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    stale_since = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["month", "sales_person"], name="incentivepayout_uniq"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["month"],
+                name="incentivepayout_stale_idx",
+                condition=models.Q(stale_since__isnull=False),
+            ),
+        ]
 
     def __str__(self):
-        return f"Return {self.order_id} - {self.company_name}"
\ No newline at end of file
+        return f"{self.month:%Y-%m} {self.sales_person or '(unassigned)'}: {self.amount}"
@@ -0,0 +1,49 @@
+# operations/order_changes.py
+"""
+What an Order looked like before it was saved.
+
+The sales rollups (sales.py) and the incentive payouts (incentives.py)
+both turn an order save into "take out what the order counted as before,
+add what it counts as now". One pre_save receiver here reads the stored
+values of the fields either of them depends on, once per save; their
+post_save receivers take them from before_save().
+"""
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .models import Order
+
+TRACKED_FIELDS = (
+    "order_created",
+    "is_cancelled",
+    "quantity",
+    "total_price",
+    "product_name",
+    "city",
+    "sales_person",
+    "company",
+)
+
+
+def tracks(update_fields, fields=TRACKED_FIELDS):
+    """Does a save with these update_fields touch any of fields?"""
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+def values(order, fields=TRACKED_FIELDS):
+    return {field: getattr(order, field) for field in fields}
+
+
+def before_save(order, fields=TRACKED_FIELDS):
+    """The stored values of fields at the last save (None for a new order)."""
+    stored = order.__dict__.get("_stored_values")
+    return {field: stored[field] for field in fields} if stored else None
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stored_values = None
+    if raw or not tracks(update_fields):
+        return
+    if not instance._state.adding and instance.pk is not None:
+        instance._stored_values = Order.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS).first()
@@ -0,0 +1,198 @@
+# operations/paging.py
+"""
+Keyset (cursor) pagination and server-side filters for the order grids.
+
+Pages are ordered on (<timestamp>, id), newest first by default, and the
+next page starts after the last row of the current one:
+
+    WHERE ts < :ts OR (ts = :ts AND id < :id)   ORDER BY ts DESC, id DESC
+
+so every page costs the same, however deep. The composite indexes on
+Order / FactoryOrder cover these filter + order combinations.
+"""
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime, time
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import urlencode
+
+PAGE_SIZE = 50
+
+
+# -------------------------------------------------------------------
+# Cursors
+# -------------------------------------------------------------------
+def encode_cursor(ts, pk):
+    raw = f"{ts.isoformat() if ts else ''}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(timestamp or None, pk), or None for a missing/broken cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts_raw, pk_raw = raw.split("|", 1)
+        ts = parse_datetime(ts_raw) if ts_raw else None
+        if ts_raw and ts is None:
+            return None
+        return ts, int(pk_raw)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class KeysetPage:
+    rows: list
+    next_cursor: str | None
+    is_first: bool
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def keyset_queryset(qs, cursor=None, ts_field="order_created", descending=True):
+    """
+    qs ordered by (ts_field, id) and restricted to the rows after cursor.
+    Rows with a NULL timestamp come last (newest first) or first (oldest first).
+    """
+    if descending:
+        qs = qs.order_by(F(ts_field).desc(nulls_last=True), F("id").desc())
+    else:
+        qs = qs.order_by(F(ts_field).asc(nulls_first=True), F("id").asc())
+
+    key = decode_cursor(cursor)
+    if key:
+        ts, pk = key
+        null_ts = Q(**{f"{ts_field}__isnull": True})
+        if descending:
+            if ts is None:
+                after = null_ts & Q(id__lt=pk)
+            else:
+                after = (
+                    Q(**{f"{ts_field}__lt": ts})
+                    | Q(**{ts_field: ts, "id__lt": pk})
+                    | null_ts
+                )
+        else:
+            if ts is None:
+                after = (null_ts & Q(id__gt=pk)) | Q(**{f"{ts_field}__isnull": False})
+            else:
+                after = Q(**{f"{ts_field}__gt": ts}) | Q(**{ts_field: ts, "id__gt": pk})
+        qs = qs.filter(after)
+    return qs
+
+
+def keyset_page(qs, cursor=None, ts_field="order_created", descending=True, size=PAGE_SIZE):
+    """One page (KeysetPage) of qs, see keyset_queryset()."""
+    qs = keyset_queryset(qs, cursor, ts_field, descending)
+    return _page(list(qs[: size + 1]), cursor, ts_field, size)
+
+
+async def akeyset_page(qs, cursor=None, ts_field="order_created", descending=True, size=PAGE_SIZE):
+    """keyset_page() for async views."""
+    qs = keyset_queryset(qs, cursor, ts_field, descending)
+    return _page([row async for row in qs[: size + 1]], cursor, ts_field, size)
+
+
+def _page(rows, cursor, ts_field, size):
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, ts_field), last.pk)
+
+    return KeysetPage(rows=rows, next_cursor=next_cursor, is_first=decode_cursor(cursor) is None)
+
+
+def pager(params, page, cursor_param="cursor"):
+    """Query strings for the Next / First links of a page (other params kept)."""
+    others = {k: v for k, v in params.items() if k != cursor_param}
+    return {
+        "page": page,
+        "first_query": urlencode(others),
+        "next_query": urlencode({**others, cursor_param: page.next_cursor}) if page.has_next else "",
+    }
+
+
+# -------------------------------------------------------------------
+# Filters
+# -------------------------------------------------------------------
+def _param_date(params, name):
+    """The date in params[name], or None when it is missing or not a real date (2025-13-45)."""
+    try:
+        return parse_date(params.get(name) or "")
+    except ValueError:
+        return None
+
+
+@dataclass
+class GridFilters:
+    """
+    Filters of one grid, read from request.GET:
+    - text:  [(param, model field, label)]  exact match
+    - flags: [(param, boolean field, label)] "yes" / "no"
+    - date_field: timestamp for date_from / date_to (inclusive days)
+    """
+    text: list = field(default_factory=list)
+    flags: list = field(default_factory=list)
+    date_field: str = "order_created"
+
+    def apply(self, qs, params):
+        for param, model_field, _ in self.text:
+            value = (params.get(param) or "").strip()
+            if value:
+                qs = qs.filter(**{model_field: value})
+
+        for param, model_field, _ in self.flags:
+            value = params.get(param)
+            if value in ("yes", "no"):
+                qs = qs.filter(**{model_field: value == "yes"})
+
+        date_from = _param_date(params, "date_from")
+        if date_from:
+            start = timezone.make_aware(datetime.combine(date_from, time.min))
+            qs = qs.filter(**{f"{self.date_field}__gte": start})
+        date_to = _param_date(params, "date_to")
+        if date_to:
+            end = timezone.make_aware(datetime.combine(date_to, time.max))
+            qs = qs.filter(**{f"{self.date_field}__lte": end})
+        return qs
+
+    def context(self, params):
+        """Current values, to re-populate the filter bar."""
+        return {
+            "text": [(param, label, params.get(param, "")) for param, _, label in self.text],
+            "flags": [(param, label, params.get(param, "")) for param, _, label in self.flags],
+            "date_from": params.get("date_from", ""),
+            "date_to": params.get("date_to", ""),
+            "date_errors": [
+                f"{label} date '{params.get(param)}' is not a valid date; ignored."
+                for param, label in (("date_from", "From"), ("date_to", "To"))
+                if params.get(param) and _param_date(params, param) is None
+            ],
+        }
+
+
+ORDER_TEXT_FILTERS = [
+    ("company", "company", "Company"),
+    ("city", "city", "City"),
+    ("sales_person", "sales_person", "Sales Person"),
+]
+
+FACTORY_TEXT_FILTERS = [
+    ("company", "company_name", "Company"),
+    ("location", "location", "Location"),
+    ("sales_person", "sales_person", "Sales Person"),
+]
@@ -0,0 +1,132 @@
+# operations/planning.py
+"""
+Dispatch planning: pack pending DispatchItem lines into vehicles.
+
+First-fit-decreasing bin packing, one location per vehicle:
+
+- locations are served in order of their oldest waiting line (ready_at),
+  so the oldest loads get vehicles first when there are not enough
+- inside a location, lines are taken by ready day (oldest first) and,
+  within the same day, largest qty first (the "decreasing" of FFD)
+- each line goes into the first open vehicle of its location that still
+  has room; otherwise a new vehicle is opened: the smallest free one that
+  takes the rest of the location, else the largest free one
+- every vehicle is used for one trip; lines that fit nowhere stay unplaced
+
+Works on plain PlanItem/PlanVehicle tuples so it can be benchmarked
+without a database; plan_pending() feeds it from the DB.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import NamedTuple
+
+from .models import DispatchItem, Vehicle, load_percent
+
+
+class PlanItem(NamedTuple):
+    id: int
+    location: str
+    qty: Decimal
+    ready_at: object  # datetime
+
+
+class PlanVehicle(NamedTuple):
+    id: int
+    number: str
+    capacity: Decimal
+
+
+@dataclass
+class PlannedLoad:
+    vehicle: PlanVehicle
+    location: str
+    item_ids: list = field(default_factory=list)
+    qty: Decimal = Decimal("0")
+
+    @property
+    def free(self):
+        return self.vehicle.capacity - self.qty
+
+    @property
+    def percent(self):
+        return load_percent(self.qty, self.vehicle.capacity)
+
+
+@dataclass
+class DispatchPlan:
+    loads: list
+    unplaced: list  # PlanItem
+
+    @property
+    def planned_qty(self):
+        return sum((load.qty for load in self.loads), Decimal("0"))
+
+    @property
+    def utilisation(self):
+        """Loaded qty over the capacity of the vehicles used, in percent."""
+        capacity = sum((load.vehicle.capacity for load in self.loads), Decimal("0"))
+        return load_percent(self.planned_qty, capacity)
+
+
+def plan(items, vehicles):
+    """Pack items (PlanItem) into vehicles (PlanVehicle). Returns a DispatchPlan."""
+    by_location = defaultdict(list)
+    for it in items:
+        if it.qty > 0:
+            by_location[it.location].append(it)
+
+    # free vehicles sorted by capacity (for best-size lookups with bisect)
+    free = sorted((v for v in vehicles if v.capacity > 0), key=lambda v: v.capacity)
+    free_caps = [v.capacity for v in free]
+
+    def take_vehicle(needed):
+        if not free:
+            return None
+        i = bisect_left(free_caps, needed)
+        if i == len(free):
+            i = len(free) - 1  # nothing takes it all: use the largest
+        free_caps.pop(i)
+        return free.pop(i)
+
+    loads = []
+    unplaced = []
+
+    locations = sorted(by_location, key=lambda loc: min(it.ready_at for it in by_location[loc]))
+    for location in locations:
+        lines = sorted(by_location[location], key=lambda it: (it.ready_at.date(), -it.qty))
+        remaining = sum((it.qty for it in lines), Decimal("0"))
+        open_loads = []
+
+        for it in lines:
+            needed = remaining  # this line + the ones after it
+            remaining -= it.qty
+
+            target = next((load for load in open_loads if load.free >= it.qty), None)
+
+            if target is None and free and it.qty <= free_caps[-1]:
+                # needed >= it.qty, so whichever vehicle comes back takes this line
+                target = PlannedLoad(vehicle=take_vehicle(needed), location=location)
+                open_loads.append(target)
+                loads.append(target)
+
+            if target is None:
+                unplaced.append(it)
+                continue
+
+            target.item_ids.append(it.id)
+            target.qty += it.qty
+
+    return DispatchPlan(loads=loads, unplaced=unplaced)
+
+
+def plan_pending():
+    """Plan all pending (not yet dispatched) items over all vehicles."""
+    items = [
+        PlanItem(*row)
+        for row in DispatchItem.objects.filter(dispatch__isnull=True)
+        .values_list("id", "location", "qty", "ready_at")
+    ]
+    vehicles = [PlanVehicle(*row) for row in Vehicle.objects.values_list("id", "number", "capacity_qty")]
+    return plan(items, vehicles)
@@ -0,0 +1,249 @@
+# operations/pricing.py
+"""
+Bulk price updates for MasterProduct.
+
+Prices are parsed and validated up front, compared with what is stored,
+and only the rows that really changed are written, with one bulk_update.
+Errors are collected per product instead of stopping (or being ignored).
+
+Price lists (CSV, or XLSX when openpyxl is installed) are keyed on
+MasterProduct.code and applied chunk by chunk, so a list of a few
+thousand SKUs costs a handful of queries; the export streams rows out
+the same way.
+"""
+import csv
+import io
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .models import MasterProduct
+
+PRICE_FIELDS = ("selling_price", "purchase_price")
+PRICE_LABELS = {"selling_price": "Selling rate", "purchase_price": "Purchase rate"}
+PRICE_FIELD_RE = re.compile(r"^(selling_price|purchase_price)_(\d+)$")
+PRICE_PLACES = Decimal("0.01")
+# DecimalField(max_digits=10, decimal_places=2)
+MAX_PRICE = Decimal("99999999.99")
+UPDATE_BATCH_SIZE = 500
+
+
+def parse_price(raw):
+    """Decimal price (2 places) from user input; ValueError with a readable message."""
+    try:
+        value = Decimal(str(raw).strip().replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"'{raw}' is not a number")
+    if not value.is_finite():
+        raise ValueError(f"'{raw}' is not a number")
+    if value < 0:
+        raise ValueError("cannot be negative")
+    # before quantize(), which fails on huge values ("1e30")
+    if value > MAX_PRICE:
+        raise ValueError(f"cannot be more than {MAX_PRICE}")
+    value = value.quantize(PRICE_PLACES)
+    if value > MAX_PRICE:  # 99999999.995 rounds up
+        raise ValueError(f"cannot be more than {MAX_PRICE}")
+    return value
+
+
+def parse_posted_prices(data):
+    """
+    Read selling_price_<id> / purchase_price_<id> fields (blank = keep).
+
+    Returns (prices, errors, raw):
+    - prices: {product_id: {field: Decimal}}
+    - errors: {product_id: ["Selling rate: ..."]}
+    - raw:    {product_id: {field: posted text}} of the invalid fields, to re-show them
+    """
+    prices, errors, raw = {}, {}, {}
+    for key, value in data.items():
+        m = PRICE_FIELD_RE.match(key)
+        if not m or value is None or str(value).strip() == "":
+            continue
+        field, product_id = m.group(1), int(m.group(2))
+        try:
+            prices.setdefault(product_id, {})[field] = parse_price(value)
+        except ValueError as exc:
+            errors.setdefault(product_id, []).append(f"{PRICE_LABELS[field]}: {exc}")
+            raw.setdefault(product_id, {})[field] = value
+    return prices, errors, raw
+
+
+def changed_products(queryset, prices):
+    """
+    Products of queryset whose posted prices differ from the stored ones,
+    with the new prices set. Returns (changed, missing_ids).
+    """
+    products = queryset.filter(id__in=prices).only("id", *PRICE_FIELDS)
+    found = set()
+    changed = []
+    for p in products:
+        found.add(p.id)
+        dirty = False
+        for field, value in prices[p.id].items():
+            if getattr(p, field) != value:
+                setattr(p, field, value)
+                dirty = True
+        if dirty:
+            changed.append(p)
+    return changed, sorted(set(prices) - found)
+
+
+def save_prices(products):
+    """Write the price fields of products; one bulk_update (batched)."""
+    if products:
+        MasterProduct.objects.bulk_update(products, list(PRICE_FIELDS), batch_size=UPDATE_BATCH_SIZE)
+    return len(products)
+
+
+# -------------------------------------------------------------------
+# Price lists (import / export)
+# -------------------------------------------------------------------
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_HEADER = ["code", "name", "product_type", "selling_price", "purchase_price"]
+
+# accepted spellings of the price list columns
+HEADER_ALIASES = {
+    "code": "code",
+    "product_code": "code",
+    "selling_price": "selling_price",
+    "selling_rate": "selling_price",
+    "purchase_price": "purchase_price",
+    "purchase_rate": "purchase_price",
+}
+
+
+@dataclass
+class PriceImportResult:
+    rows: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    unknown_codes: list = field(default_factory=list)
+    errors: list = field(default_factory=list)  # (line, message)
+
+
+def _header_key(name):
+    return HEADER_ALIASES.get(re.sub(r"[\s\-]+", "_", str(name or "").strip().lower()))
+
+
+def _rows_from_table(rows):
+    """(line, {code, selling_price, purchase_price}) from header + value rows."""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("The price list is empty.")
+    columns = [_header_key(h) for h in header]
+    if "code" not in columns or not {"selling_price", "purchase_price"} & set(columns):
+        raise ValueError("The price list needs a code column and a selling and/or purchase price column.")
+
+    def body():
+        for line, values in enumerate(rows, start=2):
+            row = {key: value for key, value in zip(columns, values) if key}
+            if any(v not in (None, "") for v in row.values()):
+                yield line, row
+
+    return body()
+
+
+def read_price_list(fileobj, filename=""):
+    """
+    Rows of a CSV or XLSX price list, read as a stream.
+    fileobj is a binary file; raises ValueError for an unreadable list.
+    """
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("XLSX price lists need openpyxl; upload a CSV instead.")
+        sheet = load_workbook(fileobj, read_only=True, data_only=True).active
+        return _rows_from_table(sheet.iter_rows(values_only=True))
+
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    return _rows_from_table(csv.reader(text))
+
+
+def _code_index(queryset):
+    """code -> [ids], built once per import."""
+    index = defaultdict(list)
+    for code, product_id in queryset.exclude(code="").values_list("code", "id").iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        index[code.strip()].append(product_id)
+    return index
+
+
+def import_price_list(rows, queryset=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """
+    Apply price list rows (from read_price_list) to the products of
+    queryset (all MasterProducts by default). Blank prices keep the
+    stored value. Returns a PriceImportResult; nothing is saved on dry_run.
+    """
+    queryset = MasterProduct.objects.all() if queryset is None else queryset
+    result = PriceImportResult()
+    rows = iter(rows)
+
+    with transaction.atomic():
+        index = _code_index(queryset)
+
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            prices = {}
+            for line, row in chunk:
+                result.rows += 1
+                code = str(row.get("code") or "").strip()
+                ids = index.get(code)
+                if not code:
+                    result.errors.append((line, "missing code"))
+                    continue
+                if not ids:
+                    result.unknown_codes.append(code)
+                    continue
+                if len(ids) > 1:
+                    result.errors.append((line, f"code {code} matches {len(ids)} products"))
+                    continue
+
+                parsed = {}
+                try:
+                    for name in PRICE_FIELDS:
+                        value = row.get(name)
+                        if value not in (None, ""):
+                            parsed[name] = parse_price(value)
+                except ValueError as exc:
+                    result.errors.append((line, f"{code}: {PRICE_LABELS[name]} {exc}"))
+                    continue
+                if parsed:
+                    # a code listed twice: the later row wins
+                    prices.setdefault(ids[0], {}).update(parsed)
+
+            changed, _ = changed_products(queryset, prices)
+            result.updated += save_prices(changed)
+            result.unchanged += len(prices) - len(changed)
+
+        if dry_run:
+            transaction.set_rollback(True)
+    return result
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: hands each formatted line back."""
+
+    def write(self, value):
+        return value
+
+
+def export_price_list(queryset):
+    """CSV lines (header first) of the products in queryset, streamed in chunks."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    rows = queryset.order_by("product_type", "code", "id").values_list(*EXPORT_HEADER)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow(row)
@@ -0,0 +1,77 @@
+# operations/queries.py
+"""
+The list queries behind the operation screens.
+
+Views build their grids from these, and `manage.py check_query_plans`
+runs EXPLAIN on the very same querysets, so an index that stops being
+used shows up there before it shows up as a slow screen.
+"""
+from .elapsed import with_age
+from .models import DispatchItem, FactoryOrder, Order
+from .paging import (
+    FACTORY_TEXT_FILTERS,
+    ORDER_TEXT_FILTERS,
+    PAGE_SIZE,
+    GridFilters,
+    keyset_queryset,
+)
+
+PAYMENT_FILTERS = GridFilters(
+    text=ORDER_TEXT_FILTERS,
+    flags=[("payment", "payment_cleared", "Payment Cleared")],
+)
+SPLIT_FILTERS = GridFilters(
+    text=ORDER_TEXT_FILTERS,
+    flags=[
+        ("payment", "payment_cleared", "Payment Cleared"),
+        ("hold", "on_hold", "On Hold"),
+    ],
+)
+FACTORY_FILTERS = GridFilters(
+    text=FACTORY_TEXT_FILTERS,
+    flags=[("accepted", "factory_accepted", "Factory Accepted")],
+)
+
+
+def open_orders():
+    """Orders the grids work on: everything not cancelled."""
+    return Order.objects.filter(is_cancelled=False)
+
+
+def payment_orders(params, on_hold):
+    return PAYMENT_FILTERS.apply(open_orders().filter(on_hold=on_hold), params)
+
+
+def split_orders(params, now=None):
+    return with_age(SPLIT_FILTERS.apply(open_orders(), params), "order_created", params, now)
+
+
+def factory_orders(params, now=None):
+    return with_age(
+        FACTORY_FILTERS.apply(FactoryOrder.objects.all(), params), "order_created", params, now
+    )
+
+
+def pending_dispatch_items(params, now=None):
+    return with_age(
+        DispatchItem.objects.filter(dispatch__isnull=True).order_by("order_id"),
+        "ready_at",
+        params,
+        now,
+    )
+
+
+def screen_queries(params):
+    """
+    (screen, queryset) for every grid, exactly as the views run them for
+    the given request params (first page).
+    """
+    descending = params.get("sort") != "-age"
+    page = slice(0, PAGE_SIZE + 1)
+    return [
+        ("payment_clearance active", keyset_queryset(payment_orders(params, False))[page]),
+        ("payment_clearance on hold", keyset_queryset(payment_orders(params, True))[page]),
+        ("split_order", keyset_queryset(split_orders(params), descending=descending)[page]),
+        ("factory_status", keyset_queryset(factory_orders(params), descending=descending)[page]),
+        ("dispatch_order pending", pending_dispatch_items(params)),
+    ]
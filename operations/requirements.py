@@ -0,0 +1,187 @@
+# operations/requirements.py
+"""
+BOM explosion: raw-material requirements for production batches.
+
+A category's BOM (masters.ProductBOM / ProductBOMItem) gives a percent per
+BOM product against the BOM's "Per %". Raw materials are stocked as
+MasterProduct rows, matched to BOM products by name (case-insensitive,
+RM first).
+
+    required qty = production_qty * line percent / per_percent
+
+The per-category line ratios are cached and dropped whenever the BOM of that
+category is saved (or any MasterProduct changes, since that can change the
+name matching). Dropping only reaches the other worker processes through a
+shared cache (DMOR_CACHE=file); with the per-process locmem cache the
+entries expire after a few minutes instead, so other workers serve an old
+BOM for at most that long.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from masters.models import ProductBOM, ProductBOMItem
+from masters.signals import bom_saved
+
+from .models import Batch, MasterProduct
+
+CACHE_PREFIX = "bom_explosion"
+CACHE_TIMEOUT = 60 * 60 * 24        # shared cache: invalidation reaches every worker
+LOCAL_CACHE_TIMEOUT = 5 * 60        # per-process cache: bounds how stale other workers get
+QTY_PLACES = Decimal("0.01")
+HUNDRED = Decimal("100")
+
+
+@dataclass
+class Requirement:
+    master_product_id: int | None   # None when no MasterProduct matches the BOM line
+    name: str
+    qty: Decimal
+
+
+# -------------------------------------------------------------------
+# Cache
+# -------------------------------------------------------------------
+def _timeout():
+    backend = settings.CACHES["default"]["BACKEND"]
+    return LOCAL_CACHE_TIMEOUT if backend.endswith("LocMemCache") else CACHE_TIMEOUT
+
+
+def _version():
+    return cache.get_or_set(f"{CACHE_PREFIX}:version", 1, None)
+
+
+def _key(category_id, version):
+    return f"{CACHE_PREFIX}:{version}:{category_id}"
+
+
+def invalidate(category_id):
+    cache.delete(_key(category_id, _version()))
+
+
+def invalidate_all():
+    try:
+        cache.incr(f"{CACHE_PREFIX}:version")
+    except ValueError:
+        cache.set(f"{CACHE_PREFIX}:version", 2, None)
+
+
+@receiver(bom_saved)
+def _on_bom_saved(sender, category_id, **kwargs):
+    invalidate(category_id)
+
+
+@receiver([post_save, post_delete], sender=ProductBOM)
+def _on_bom_changed(sender, instance, **kwargs):
+    invalidate(instance.category_id)
+
+
+@receiver([post_save, post_delete], sender=ProductBOMItem)
+def _on_bom_item_changed(sender, instance, **kwargs):
+    # bom_id -> category_id needs a lookup; dropping everything is simpler
+    # and this path is only hit by single-row edits (admin/shell)
+    invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=MasterProduct)
+def _on_master_product_changed(sender, **kwargs):
+    invalidate_all()
+
+
+# -------------------------------------------------------------------
+# Ratios
+# -------------------------------------------------------------------
+def _load_ratios(category_ids):
+    """
+    Build {category_id: [(master_product_id, name, ratio), ...]} for the
+    given categories with two queries (BOM lines + MasterProduct matching).
+    """
+    lines = (
+        ProductBOMItem.objects
+        .filter(bom__category_id__in=category_ids, bom__is_active=True, percent__gt=0)
+        .order_by("sequence", "id")
+        .values_list("bom__category_id", "bom__per_percent", "product__name", "percent")
+    )
+    lines = list(lines)
+
+    ids = MasterProduct.objects.ids_by_name(name for _, _, name, _ in lines)
+
+    ratios = {cid: [] for cid in category_ids}
+    for category_id, per_percent, name, percent in lines:
+        basis = per_percent or HUNDRED
+        ratios[category_id].append((ids.get(name), name, percent / basis))
+    return ratios
+
+
+def get_ratios(category_ids):
+    """Cached per-category ratios; only missing categories hit the database."""
+    category_ids = list({cid for cid in category_ids if cid})
+    if not category_ids:
+        return {}
+
+    version = _version()
+    keys = {_key(cid, version): cid for cid in category_ids}
+    cached = cache.get_many(list(keys))
+    result = {keys[k]: v for k, v in cached.items()}
+
+    missing = [cid for cid in category_ids if cid not in result]
+    if missing:
+        loaded = _load_ratios(missing)
+        cache.set_many({_key(cid, version): v for cid, v in loaded.items()}, _timeout())
+        result.update(loaded)
+    return result
+
+
+# -------------------------------------------------------------------
+# Explosion
+# -------------------------------------------------------------------
+def _explode(ratios, production_qty):
+    qty = Decimal(production_qty or 0)
+    return [
+        Requirement(mp_id, name, (qty * ratio).quantize(QTY_PLACES))
+        for mp_id, name, ratio in ratios
+    ]
+
+
+def explode(category_id, production_qty):
+    """Raw-material requirements for one batch of production_qty of category."""
+    ratios = get_ratios([category_id]).get(category_id, [])
+    return _explode(ratios, production_qty)
+
+
+def explode_active_batches():
+    """
+    Explode every ACTIVE batch at once (daily material requirement report).
+
+    Returns (per_batch, totals):
+    - per_batch: {batch_id: [Requirement, ...]}
+    - totals: [Requirement, ...] summed per MasterProduct, largest first
+    """
+    batches = list(
+        Batch.objects.filter(status="ACTIVE", category__isnull=False)
+        .values_list("id", "category_id", "production_qty")
+    )
+    ratios = get_ratios(cid for _, cid, _ in batches)
+
+    per_batch = {}
+    summed = defaultdict(Decimal)
+    names = {}
+    for batch_id, category_id, production_qty in batches:
+        reqs = _explode(ratios.get(category_id, []), production_qty)
+        per_batch[batch_id] = reqs
+        for r in reqs:
+            key = r.master_product_id or r.name
+            summed[key] += r.qty
+            names[key] = r.name
+
+    totals = [
+        Requirement(key if isinstance(key, int) else None, names[key], qty)
+        for key, qty in summed.items()
+    ]
+    totals.sort(key=lambda r: r.qty, reverse=True)
+    return per_batch, totals
@@ -0,0 +1,241 @@
+# operations/sales.py
+"""
+Sales rollups: orders / quantity / revenue (total_price) of the
+non-cancelled orders per order day, overall and per product name, city
+and sales person (SalesRollup). The sales report reads only these rows,
+never the orders table.
+
+Every Order save / delete adds its difference to the rollups in the
+same transaction (receivers below): a new order adds its line, a cancel
+takes it out again, a split moves quantity / revenue between the two
+orders. The values an order counted with are read back before the save
+(order_changes.py), so any edit of a counted field (product, city, ...)
+is moved over too.
+
+Queryset update() / bulk_create() on those fields bypass the receivers;
+rebuild_rollups() (`manage.py rebuild_sales_rollups`) recomputes
+everything from the orders.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import order_changes
+from .models import Order, SalesRollup
+
+ALL = SalesRollup.ALL
+# dimension -> Order field
+DIMENSIONS = {"product": "product_name", "city": "city", "sales_person": "sales_person"}
+# the Order fields a rollup line depends on
+TRACKED_FIELDS = ("order_created", "is_cancelled", "quantity", "total_price", *DIMENSIONS.values())
+
+REBUILD_CHUNK_DAYS = 31
+TOP_N = 20
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+def _amount(value):
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _day(ts):
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts)
+    return timezone.localdate(ts)
+
+
+def _lines(values, sign=1):
+    """[((day, dimension, key), (orders, qty, revenue))] an order counts with; values: its TRACKED_FIELDS."""
+    if not values or values["is_cancelled"] or values["order_created"] is None:
+        return []
+    day = _day(values["order_created"])
+    delta = (sign, sign * _amount(values["quantity"]), sign * _amount(values["total_price"]))
+    return [((day, ALL, ""), delta)] + [
+        ((day, dimension, values[field] or ""), delta) for dimension, field in DIMENSIONS.items()
+    ]
+
+
+def _add(totals, lines):
+    for key, (orders, qty, revenue) in lines:
+        o, q, r = totals.get(key, (0, ZERO, ZERO))
+        totals[key] = (o + orders, q + qty, r + revenue)
+    return totals
+
+
+# -------------------------------------------------------------------
+# Keeping the rollups
+# -------------------------------------------------------------------
+def _apply(deltas):
+    """Add {(day, dimension, key): (orders, qty, revenue)} to the rollups: one INSERT, one UPDATE."""
+    deltas = {key: d for key, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+
+    SalesRollup.objects.bulk_create(
+        [SalesRollup(day=day, dimension=dimension, key=key) for day, dimension, key in deltas],
+        ignore_conflicts=True,
+    )
+    match = Q()
+    for day, dimension, key in deltas:
+        match |= Q(day=day, dimension=dimension, key=key)
+    # lock in id order so concurrent orders can't deadlock (no-op on SQLite)
+    ids = {
+        (day, dimension, key): pk
+        for pk, day, dimension, key in SalesRollup.objects.select_for_update()
+        .filter(match)
+        .order_by("pk")
+        .values_list("pk", "day", "dimension", "key")
+    }
+
+    def delta(i, output_field):
+        return Case(*[When(pk=ids[key], then=Value(d[i])) for key, d in deltas.items()], output_field=output_field)
+
+    rows = SalesRollup.objects.filter(pk__in=ids.values())
+    rows.update(
+        orders=F("orders") + delta(0, IntegerField()),
+        quantity=F("quantity") + delta(1, DecimalField(max_digits=14, decimal_places=2)),
+        revenue=F("revenue") + delta(2, DecimalField(max_digits=16, decimal_places=2)),
+    )
+    rows.filter(orders__lte=0).delete()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not order_changes.tracks(update_fields, TRACKED_FIELDS):
+        return
+    before = order_changes.before_save(instance, TRACKED_FIELDS)
+    deltas = _add(_add({}, _lines(before, -1)), _lines(order_changes.values(instance, TRACKED_FIELDS)))
+    with transaction.atomic():
+        _apply(deltas)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        _apply(_add({}, _lines(order_changes.values(instance, TRACKED_FIELDS), -1)))
+
+
+# -------------------------------------------------------------------
+# Report (rollups only)
+# -------------------------------------------------------------------
+def _rows(dimension, start, end):
+    return SalesRollup.objects.filter(dimension=dimension, day__gte=start, day__lte=end)
+
+
+def totals(start, end):
+    """{"orders", "quantity", "revenue"} of the days start..end (inclusive)."""
+    return _rows(ALL, start, end).aggregate(
+        orders=Coalesce(Sum("orders"), 0),
+        quantity=Coalesce(Sum("quantity"), Value(ZERO)),
+        revenue=Coalesce(Sum("revenue"), Value(ZERO)),
+    )
+
+
+def daily(start, end):
+    """One row per day with orders: day, orders, quantity, revenue."""
+    return _rows(ALL, start, end).order_by("day").values("day", "orders", "quantity", "revenue")
+
+
+def top(dimension, start, end, limit=TOP_N):
+    """The keys of a dimension with the most revenue over start..end."""
+    return (
+        _rows(dimension, start, end)
+        .values("key")
+        .annotate(orders=Sum("orders"), quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .order_by("-revenue", "key")[:limit]
+    )
+
+
+# -------------------------------------------------------------------
+# Rebuild
+# -------------------------------------------------------------------
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def order_totals(start, end):
+    """{(day, dimension, key): (orders, qty, revenue)} of the orders of the days start..end, grouped in SQL."""
+    counted = Order.objects.filter(
+        is_cancelled=False,
+        order_created__gte=_day_start(start),
+        order_created__lt=_day_start(end + datetime.timedelta(days=1)),
+    ).annotate(order_day=TruncDate("order_created"))
+
+    result = {}
+    for dimension, field in [(ALL, None), *DIMENSIONS.items()]:
+        groups = (
+            counted.values_list("order_day", *([field] if field else []))
+            .annotate(orders=Count("pk"), qty=Sum("quantity"), revenue=Sum("total_price"))
+            .order_by()
+        )
+        for day, *key, orders, qty, revenue in groups:
+            # NULL and "" are the same (empty) key
+            _add(result, [((day, dimension, (key[0] if key else "") or ""), (orders, _amount(qty), _amount(revenue)))])
+    return result
+
+
+def _drift(expected, current):
+    """{key: (was, now)} where the rollups (current: {key: (pk, totals)}) differ from expected."""
+    drift = {}
+    for key in set(expected) | set(current):
+        was = current[key][1] if key in current else None
+        now = expected.get(key)
+        if was != now:
+            drift[key] = (was, now)
+    return drift
+
+
+def _fix(drift, current):
+    def row(key, pk=None):
+        orders, qty, revenue = drift[key][1]
+        day, dimension, name = key
+        return SalesRollup(pk=pk, day=day, dimension=dimension, key=name, orders=orders, quantity=qty, revenue=revenue)
+
+    SalesRollup.objects.bulk_update(
+        [row(key, current[key][0]) for key, (was, now) in drift.items() if was is not None and now is not None],
+        ["orders", "quantity", "revenue"],
+        batch_size=1000,
+    )
+    SalesRollup.objects.bulk_create([row(key) for key, (was, now) in drift.items() if was is None], batch_size=1000)
+    gone = [current[key][0] for key, (was, now) in drift.items() if now is None]
+    for i in range(0, len(gone), 500):
+        SalesRollup.objects.filter(pk__in=gone[i:i + 500]).delete()
+
+
+def rebuild_rollups(chunk_days=REBUILD_CHUNK_DAYS, dry_run=False):
+    """
+    Recompute the rollups from the orders, chunk_days of order days at a
+    time (one transaction each). Returns {(day, dimension, key): (was, now)}
+    for the rows that were wrong (fixed unless dry_run); was / now are
+    (orders, qty, revenue) or None. Run it while nobody edits orders.
+    """
+    orders = Order.objects.filter(is_cancelled=False).aggregate(first=Min("order_created"), last=Max("order_created"))
+    rollups = SalesRollup.objects.aggregate(first=Min("day"), last=Max("day"))
+    days = [_day(ts) for ts in orders.values() if ts] + [day for day in rollups.values() if day]
+    if not days:
+        return {}
+
+    drift = {}
+    start, last = min(days), max(days)
+    while start <= last:
+        end = min(start + datetime.timedelta(days=chunk_days - 1), last)
+        with transaction.atomic():
+            current = {
+                (day, dimension, key): (pk, (orders, qty, revenue))
+                for pk, day, dimension, key, orders, qty, revenue in SalesRollup.objects.filter(
+                    day__gte=start, day__lte=end
+                ).values_list("pk", "day", "dimension", "key", "orders", "quantity", "revenue")
+            }
+            chunk = _drift(order_totals(start, end), current)
+            if not dry_run:
+                _fix(chunk, current)
+        drift.update(chunk)
+        start = end + datetime.timedelta(days=1)
+    return drift
@@ -0,0 +1,194 @@
+# operations/snapshots.py
+"""
+Closing stock snapshots and historical stock / valuation.
+
+take() stores the closing qty of every product for a day that has ended
+(StockSnapshot + lines, daily or monthly). balances_at(day) answers the
+stock at the close of any day from the nearest anchor plus the movements
+in between, so its cost depends on the distance to the nearest anchor,
+not on the length of the history:
+- the closest snapshot on or before the day, plus later movements,
+- the closest snapshot after the day, minus the movements in between,
+- the current balances (StockBalance), minus the movements since.
+
+valuation() streams qty x price per product, grouped by product type;
+category_totals() folds that into one total per type.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from masters.models import ProductMaster
+
+from .models import MasterProduct, StockBalance, StockMovement, StockSnapshot, StockSnapshotLine
+from .stock import ZERO
+
+LINE_BATCH_SIZE = 2000
+PRICE_SOURCES = ("purchase", "rm_cost")
+
+
+def closing_time(day):
+    """First moment after day (local time): movements before it count for the day."""
+    return timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+
+
+def month_end(day):
+    return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+
+
+# -------------------------------------------------------------------
+# Historical balances
+# -------------------------------------------------------------------
+def _movement_totals(start, end, product_ids):
+    qs = StockMovement.objects.filter(created_at__gte=start)
+    if end is not None:
+        qs = qs.filter(created_at__lt=end)
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=product_ids)
+    return qs.values("product_id").annotate(total=Sum("qty")).values_list("product_id", "total")
+
+
+def _snapshot_lines(snapshot, product_ids):
+    qs = snapshot.lines.all()
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=product_ids)
+    return qs.values_list("product_id", "qty").iterator(chunk_size=LINE_BATCH_SIZE)
+
+
+def nearest_anchor(day, today=None, exclude=None):
+    """
+    ("before" | "after", snapshot) or ("now", None): where balances_at(day)
+    starts, the one fewest days away. exclude: a snapshot id not to use.
+    """
+    today = today or timezone.localdate()
+    options = [((today - day).days, "now", None)]
+    snapshots = StockSnapshot.objects.exclude(pk=exclude)
+    before = snapshots.filter(as_of__lte=day).order_by("-as_of", "period").first()
+    if before:
+        options.append(((day - before.as_of).days, "before", before))
+    after = snapshots.filter(as_of__gt=day).order_by("as_of", "period").first()
+    if after:
+        options.append(((after.as_of - day).days, "after", after))
+    _, kind, snapshot = min(options, key=lambda o: o[0])
+    return kind, snapshot
+
+
+def balances_at(day, product_ids=None, exclude=None):
+    """{product_id: qty} at the close of day (products with stock only)."""
+    if product_ids is not None:
+        product_ids = list(product_ids)
+    cutoff = closing_time(day)
+    kind, snapshot = nearest_anchor(day, exclude=exclude)
+
+    qty = defaultdict(Decimal)
+    if kind == "now":
+        balances = StockBalance.objects.all()
+        if product_ids is not None:
+            balances = balances.filter(pk__in=product_ids)
+        for pid, on_hand in balances.values_list("pk", "on_hand").iterator(chunk_size=LINE_BATCH_SIZE):
+            qty[pid] += on_hand
+        for pid, total in _movement_totals(cutoff, None, product_ids):
+            qty[pid] -= total
+    else:
+        for pid, line_qty in _snapshot_lines(snapshot, product_ids):
+            qty[pid] += line_qty
+        if kind == "before":
+            deltas, sign = _movement_totals(closing_time(snapshot.as_of), cutoff, product_ids), 1
+        else:
+            deltas, sign = _movement_totals(cutoff, closing_time(snapshot.as_of), product_ids), -1
+        for pid, total in deltas:
+            qty[pid] += sign * total
+    return {pid: q for pid, q in qty.items() if q}
+
+
+# -------------------------------------------------------------------
+# Taking snapshots
+# -------------------------------------------------------------------
+def take(day, period=StockSnapshot.DAILY):
+    """Store (or replace) the closing stock of day. Only for days that have ended."""
+    if day >= timezone.localdate():
+        raise ValueError(f"{day} has not ended yet; snapshots are taken of closed days.")
+    existing = StockSnapshot.objects.filter(period=period, as_of=day).first()
+    # worked out afresh, not from the snapshot being replaced
+    balances = balances_at(day, exclude=existing.pk if existing else None)
+    with transaction.atomic():
+        snapshot, created = StockSnapshot.objects.get_or_create(period=period, as_of=day)
+        if not created:
+            snapshot.lines.all().delete()
+            snapshot.taken_at = timezone.now()
+            snapshot.save(update_fields=["taken_at"])
+        StockSnapshotLine.objects.bulk_create(
+            (StockSnapshotLine(snapshot=snapshot, product_id=pid, qty=q) for pid, q in balances.items()),
+            batch_size=LINE_BATCH_SIZE,
+        )
+    return snapshot, len(balances)
+
+
+def prune_daily(keep_days, today=None):
+    """Drop daily snapshots older than keep_days (monthly ones stay)."""
+    today = today or timezone.localdate()
+    old = StockSnapshot.objects.filter(
+        period=StockSnapshot.DAILY, as_of__lt=today - datetime.timedelta(days=keep_days)
+    )
+    return old.delete()[1].get(StockSnapshot._meta.label, 0)
+
+
+# -------------------------------------------------------------------
+# Valuation
+# -------------------------------------------------------------------
+def _prices(price):
+    if price == "purchase":
+        return None  # MasterProduct.purchase_price, read with the products
+    # {MasterProduct id: raw material cost} of the product master of the
+    # same name, matched like the rest of the stock code (highest wins)
+    by_name = dict(
+        ProductMaster.objects.filter(is_active=True, raw_material_cost__isnull=False)
+        .values("base_product__name")
+        .annotate(cost=Max("raw_material_cost"))
+        .values_list("base_product__name", "cost")
+    )
+    costs = {}
+    for name, pid in MasterProduct.objects.ids_by_name(by_name).items():
+        costs[pid] = max(costs.get(pid, by_name[name]), by_name[name])
+    return costs
+
+
+def valuation(day, price="purchase", chunk_size=LINE_BATCH_SIZE):
+    """
+    Yield (product_type, product_id, name, qty, unit price, value) for every
+    product with stock at the close of day, ordered by type and name.
+    """
+    if price not in PRICE_SOURCES:
+        raise ValueError(f"price must be one of {', '.join(PRICE_SOURCES)}")
+    qty = balances_at(day)
+    prices = _prices(price)
+    products = (
+        MasterProduct.objects.order_by("product_type", "name", "pk")
+        .values_list("product_type", "pk", "name", "purchase_price")
+        .iterator(chunk_size=chunk_size)
+    )
+    for product_type, pid, name, purchase_price in products:
+        q = qty.get(pid)
+        if not q:
+            continue
+        unit = purchase_price if prices is None else prices.get(pid) or ZERO
+        yield product_type, pid, name, q, unit, q * unit
+
+
+def category_totals(rows):
+    """Fold valuation() rows into (product_type, products, qty, value), one per type as it completes."""
+    current, products, qty, value = None, 0, ZERO, ZERO
+    for product_type, _, _, q, _, v in rows:
+        if product_type != current:
+            if current is not None:
+                yield current, products, qty, value
+            current, products, qty, value = product_type, 0, ZERO, ZERO
+        products += 1
+        qty += q
+        value += v
+    if current is not None:
+        yield current, products, qty, value
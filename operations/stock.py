@@ -0,0 +1,231 @@
+# operations/stock.py
+"""
+Stock ledger.
+
+Every document that moves stock posts StockMovement lines (+ in, - out)
+and adds them to StockBalance in the same transaction, so the on-hand qty
+of a product is one primary key lookup (on_hand()).
+
+Who posts:
+- MaterialInward (+qty), MaterialDiscard (-qty), MaterialReturn
+  (+returned_qty): the post_save / post_delete receivers below. An edited
+  document posts the difference, a deleted one posts its reversal.
+- Batch start (-qty of every BatchItem, raw material used): post_batch().
+- Dispatch (-qty of every DispatchItem): post_dispatch().
+
+Dispatch items and returns name their product as text (the order's
+product name). Those are matched to MasterProduct by name, the same way
+the BOM explosion does (MasterProduct.objects.ids_by_name); lines with
+an unknown name post nothing and are handed back to the caller.
+
+rebuild_balances() recomputes StockBalance from the ledger.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Batch,
+    Dispatch,
+    MasterProduct,
+    MaterialDiscard,
+    MaterialInward,
+    MaterialReturn,
+    StockBalance,
+    StockMovement,
+)
+
+REBUILD_CHUNK_SIZE = 5000
+ZERO = Decimal("0.00")
+
+
+def _qty(value):
+    return Decimal(str(value or 0))
+
+
+# -------------------------------------------------------------------
+# Posting
+# -------------------------------------------------------------------
+def post(lines, source, source_id, now=None):
+    """
+    Append the movements [(product_id, qty), ...] of one document and add
+    them to the balances. Returns the new StockMovements.
+    """
+    lines = [(pid, _qty(qty)) for pid, qty in lines if qty]
+    if not lines:
+        return []
+    now = now or timezone.now()
+    with transaction.atomic():
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(product_id=pid, qty=qty, source=source, source_id=source_id, created_at=now)
+            for pid, qty in lines
+        ])
+        _apply(lines, now)
+    return movements
+
+
+def _apply(lines, now):
+    """Add the lines to StockBalance: one INSERT for new products, one UPDATE."""
+    deltas = defaultdict(Decimal)
+    for pid, qty in lines:
+        deltas[pid] += qty
+    deltas = {pid: d for pid, d in deltas.items() if d}
+    if not deltas:
+        return
+
+    StockBalance.objects.bulk_create(
+        [StockBalance(product_id=pid, updated_at=now) for pid in deltas], ignore_conflicts=True
+    )
+    # lock in product order so concurrent posts can't deadlock (no-op on SQLite)
+    list(StockBalance.objects.select_for_update().filter(pk__in=deltas).order_by("pk").values_list("pk"))
+    StockBalance.objects.filter(pk__in=deltas).update(
+        on_hand=F("on_hand") + Case(
+            *[When(pk=pid, then=Value(d)) for pid, d in deltas.items()],
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+        updated_at=now,
+    )
+
+
+def sync_document(source, source_id, target):
+    """
+    Post whatever makes the movements of a document add up to target
+    ({product_id: qty}); {} reverses everything it posted so far.
+    """
+    posted = dict(
+        StockMovement.objects.filter(source=source, source_id=source_id)
+        .values("product_id")
+        .annotate(total=Sum("qty"))
+        .values_list("product_id", "total")
+    )
+    return post(
+        [(pid, _qty(target.get(pid)) - _qty(posted.get(pid))) for pid in set(target) | set(posted)],
+        source,
+        source_id,
+    )
+
+
+def post_batch(batch):
+    """Raw material used by a started batch: -qty per BatchItem."""
+    target = defaultdict(Decimal)
+    for pid, qty in batch.items.filter(product__isnull=False).values_list("product_id", "qty"):
+        target[pid] -= qty
+    return sync_document("batch", batch.pk, target)
+
+
+def post_dispatch(dispatch):
+    """
+    Goods leaving with a dispatch: -qty per item. Returns the product
+    names that matched no MasterProduct (nothing posted for those).
+    """
+    items = list(dispatch.items.values_list("product", "qty"))
+    ids = MasterProduct.objects.ids_by_name(name for name, _ in items)
+    target = defaultdict(Decimal)
+    for name, qty in items:
+        if name in ids:
+            target[ids[name]] -= qty
+    sync_document("dispatch", dispatch.pk, target)
+    return sorted({name for name, _ in items if name not in ids})
+
+
+@receiver(post_save, sender=MaterialInward)
+def inward_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_document("inward", instance.pk, {instance.master_product_id: _qty(instance.qty)})
+
+
+@receiver(post_save, sender=MaterialDiscard)
+def discard_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        target = {instance.product_id: -_qty(instance.qty)} if instance.product_id else {}
+        sync_document("discard", instance.pk, target)
+
+
+@receiver(post_save, sender=MaterialReturn)
+def return_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pid = MasterProduct.objects.ids_by_name([instance.product]).get(instance.product)
+        sync_document("return", instance.pk, {pid: _qty(instance.returned_qty)} if pid else {})
+
+
+_DOCUMENT_SOURCES = {
+    MaterialInward: "inward",
+    MaterialDiscard: "discard",
+    MaterialReturn: "return",
+    Batch: "batch",
+    Dispatch: "dispatch",
+}
+
+
+@receiver(post_delete)
+def document_deleted(sender, instance, **kwargs):
+    source = _DOCUMENT_SOURCES.get(sender)
+    if source:
+        sync_document(source, instance.pk, {})
+
+
+# -------------------------------------------------------------------
+# Lookups
+# -------------------------------------------------------------------
+def on_hand(product_id):
+    return StockBalance.objects.filter(pk=product_id).values_list("on_hand", flat=True).first() or ZERO
+
+
+def on_hand_many(product_ids):
+    """{product_id: on hand} for the ids, 0 for products without movements."""
+    product_ids = list(product_ids)
+    found = dict(StockBalance.objects.filter(pk__in=product_ids).values_list("pk", "on_hand"))
+    return {pid: found.get(pid, ZERO) for pid in product_ids}
+
+
+# -------------------------------------------------------------------
+# Rebuild
+# -------------------------------------------------------------------
+def ledger_totals(chunk_size=REBUILD_CHUNK_SIZE):
+    """{product_id: sum of movements}, from one streamed pass over the ledger in product order."""
+    rows = (
+        StockMovement.objects.order_by("product_id")
+        .values_list("product_id", "qty")
+        .iterator(chunk_size=chunk_size)
+    )
+    return {
+        pid: sum((qty for _, qty in group), ZERO)
+        for pid, group in groupby(rows, key=itemgetter(0))
+    }
+
+
+def rebuild_balances(chunk_size=REBUILD_CHUNK_SIZE, dry_run=False):
+    """
+    Recompute StockBalance from the ledger. Returns {product_id: (was, now)}
+    for the balances that were wrong (and are fixed unless dry_run).
+    Run it while nothing is posting.
+    """
+    totals = ledger_totals(chunk_size)
+    now = timezone.now()
+    with transaction.atomic():
+        current = dict(StockBalance.objects.values_list("pk", "on_hand"))
+        drift = {
+            pid: (current.get(pid), totals.get(pid, ZERO))
+            for pid in set(totals) | set(current)
+            if current.get(pid) != totals.get(pid, ZERO)
+        }
+        if dry_run or not drift:
+            return drift
+
+        StockBalance.objects.bulk_update(
+            [StockBalance(pk=pid, on_hand=new, updated_at=now) for pid, (old, new) in drift.items() if old is not None],
+            ["on_hand", "updated_at"],
+            batch_size=1000,
+        )
+        StockBalance.objects.bulk_create(
+            [StockBalance(pk=pid, on_hand=new, updated_at=now) for pid, (old, new) in drift.items() if old is None],
+            batch_size=1000,
+        )
+    return drift
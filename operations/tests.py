@@ -1,3 +1,1029 @@
-from django.test import TestCase
+import datetime
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from masters.models import Customer, Employee, Product, ProductBOM, ProductBOMItem, ProductMaster
+
+from . import alerts, async_views, feed, incentives, planning, requirements, sales, snapshots, stock, views
+from .elapsed import with_age
+from .models import (
+    Batch, BatchDraftItem, Dispatch, DispatchItem, IncentivePayout, MasterProduct, MaterialInward, MaterialReturn,
+    FactoryOrder, Order, StockAlert, StockBalance, StockCheck, StockMovement, StockSnapshot, Supplier, Vehicle,
+)
+from .paging import PAGE_SIZE, decode_cursor, encode_cursor, keyset_page, pager
+from .pricing import import_price_list, parse_posted_prices, parse_price, read_price_list
+from .queries import payment_orders, screen_queries
+from .requirements import explode, explode_active_batches
+
+
+def make_order(**fields):
+    values = {
+        "company": "Acme Traders",
+        "city": "Pune",
+        "sales_person": "Ravi",
+        "product_name": "Enamel White",
+        "quantity": Decimal("10"),
+        "price": Decimal("100"),
+        "total_price": Decimal("1000"),
+    }
+    values.update(fields)
+    return Order.objects.create(**values)
+
+
+class AgeFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        cls.new = make_order(order_created=cls.now - timedelta(hours=5))
+        cls.old = make_order(order_created=cls.now - timedelta(days=40))
+
+    def ages(self, **params):
+        return set(with_age(Order.objects.all(), "order_created", params, self.now))
+
+    def test_min_and_max_age_days(self):
+        self.assertEqual(self.ages(min_age_days="30"), {self.old})
+        self.assertEqual(self.ages(max_age_days="1"), {self.new})
+        self.assertEqual(self.ages(min_age_days="0.1", max_age_days="50"), {self.new, self.old})
+
+    def test_out_of_range_and_broken_values_do_not_crash(self):
+        # huge values are capped; inf / nan / negative / text are ignored
+        self.assertEqual(self.ages(min_age_days="1e10"), set())
+        self.assertEqual(self.ages(max_age_days="1e308"), {self.new, self.old})
+        for bad in ("inf", "-inf", "nan", "-3", "abc", ""):
+            with self.subTest(value=bad):
+                self.assertEqual(self.ages(min_age_days=bad, max_age_days=bad), {self.new, self.old})
+
+    def test_split_grid_with_huge_age_filter(self):
+        for value in ("1e10", "inf", "1e308"):
+            with self.subTest(value=value):
+                response = self.client.get(reverse("split_order"), {"min_age_days": value, "sort": "-age"})
+                self.assertEqual(response.status_code, 200)
+
+
+class KeysetPagingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        # ties on the timestamp and NULL timestamps must not lose or repeat rows
+        cls.orders = [make_order(order_created=now - timedelta(hours=i // 3)) for i in range(10)]
+        cls.orders += [make_order(order_created=None) for _ in range(2)]
+
+    def walk(self, size, descending=True):
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Order.objects.all(), cursor, descending=descending, size=size)
+            self.assertEqual(page.is_first, cursor is None)
+            seen += [o.pk for o in page]
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once_in_order(self):
+        newest_first = sorted(
+            (o for o in self.orders if o.order_created), key=lambda o: (o.order_created, o.pk), reverse=True
+        ) + sorted((o for o in self.orders if not o.order_created), key=lambda o: o.pk, reverse=True)
+
+        for size in (1, 4, 5, 12, 50):
+            with self.subTest(size=size):
+                self.assertEqual(self.walk(size), [o.pk for o in newest_first])
+                self.assertEqual(self.walk(size, descending=False), [o.pk for o in reversed(newest_first)])
+
+    def test_cursor_round_trip_and_broken_cursors(self):
+        ts = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(ts, 42)), (ts, 42))
+        self.assertEqual(decode_cursor(encode_cursor(None, 7)), (None, 7))
+        for broken in ("", "not-base64!", encode_cursor(ts, 1)[:-3], "eHx5"):
+            with self.subTest(cursor=broken):
+                self.assertIsNone(decode_cursor(broken))
+                page = keyset_page(Order.objects.all(), broken, size=5)
+                self.assertTrue(page.is_first)
+                self.assertEqual(len(page), 5)
+
+    def test_grid_pages_and_filters(self):
+        url = reverse("split_order")
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.context["orders"]), 12)
+
+        response = self.client.get(url, {"date_from": "2025-13-45", "date_to": "yesterday"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["orders"]), 12)
+        self.assertEqual(len(response.context["filters"]["date_errors"]), 2)
+        self.assertContains(response, "is not a valid date; ignored.")
+
+    def test_split_post_does_not_read_a_page(self):
+        order = self.orders[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("split_order"), {"selected_orders": [order.pk], "action": "cancel"}
+            )
+
+        self.assertRedirects(response, reverse("split_order"), fetch_redirect_response=False)
+        self.assertFalse([q["sql"] for q in queries if f"LIMIT {PAGE_SIZE + 1}" in q["sql"]])
+        order.refresh_from_db()
+        self.assertTrue(order.is_cancelled)
+
+
+class BulkPriceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.white = MasterProduct.objects.create(name="Enamel White", code="EW1", selling_price=Decimal("100.00"))
+        cls.black = MasterProduct.objects.create(name="Enamel Black", code="EB1", selling_price=Decimal("110.00"))
+        cls.resin = MasterProduct.objects.create(name="Resin", code="RS1", product_type="RM")
+
+    def test_parse_price(self):
+        self.assertEqual(parse_price("1,234.567"), Decimal("1234.57"))
+        self.assertEqual(parse_price(" 0 "), Decimal("0.00"))
+        self.assertEqual(parse_price("99999999.99"), Decimal("99999999.99"))
+        for bad in ("abc", "NaN", "inf", "-1", "1e30", "99999999.995", "100000000"):
+            with self.subTest(raw=bad):
+                with self.assertRaises(ValueError):
+                    parse_price(bad)
+
+    def test_parse_posted_prices(self):
+        prices, errors, raw = parse_posted_prices({
+            f"selling_price_{self.white.id}": "120",
+            f"purchase_price_{self.white.id}": "",
+            f"selling_price_{self.black.id}": "1e30",
+            "q": "enamel",
+        })
+
+        self.assertEqual(prices, {self.white.id: {"selling_price": Decimal("120.00")}})
+        self.assertEqual(list(errors), [self.black.id])
+        self.assertTrue(errors[self.black.id][0].startswith("Selling rate: "))
+        self.assertEqual(raw, {self.black.id: {"selling_price": "1e30"}})
+
+    def test_update_products_saves_changed_rows(self):
+        response = self.client.post(
+            reverse("update_products") + "?type=FG",
+            {f"selling_price_{self.white.id}": "125", f"selling_price_{self.black.id}": "110.00"},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.white.refresh_from_db()
+        self.assertEqual(self.white.selling_price, Decimal("125.00"))
+
+    def test_update_products_reshows_invalid_prices(self):
+        response = self.client.post(
+            reverse("update_products") + "?type=FG",
+            {f"selling_price_{self.white.id}": "125", f"selling_price_{self.black.id}": "1e30"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        shown = {p.id: p for p in response.context["products"]}
+        self.assertEqual(shown[self.black.id].selling_input, "1e30")
+        self.assertTrue(shown[self.black.id].row_errors)
+        self.black.refresh_from_db()
+        self.assertEqual(self.black.selling_price, Decimal("110.00"))
+
+
+class PriceListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.white = MasterProduct.objects.create(name="Enamel White", code="EW1", selling_price=Decimal("100.00"))
+        cls.black = MasterProduct.objects.create(name="Enamel Black", code="EB1", selling_price=Decimal("110.00"))
+        cls.resin = MasterProduct.objects.create(
+            name="Resin", code="RS1", product_type="RM", purchase_price=Decimal("80.00")
+        )
+
+    def rows(self, text):
+        return read_price_list(io.BytesIO(text.encode()), "prices.csv")
+
+    def test_import_applies_valid_rows_and_reports_the_rest(self):
+        result = import_price_list(self.rows(
+            "Product Code,Selling Rate,Purchase Rate\n"
+            "EW1,120,\n"            # changed
+            "EB1,110.00,\n"         # unchanged
+            "RS1,,1e30\n"           # out of range
+            "XX9,10,10\n"           # unknown
+            ",5,5\n"                # no code
+            ",,\n"                  # blank, skipped
+        ))
+
+        self.assertEqual((result.rows, result.updated, result.unchanged), (5, 1, 1))
+        self.assertEqual(result.unknown_codes, ["XX9"])
+        self.assertEqual([line for line, _ in result.errors], [4, 6])
+        self.assertIn("RS1: Purchase rate", result.errors[0][1])
+        self.white.refresh_from_db()
+        self.resin.refresh_from_db()
+        self.assertEqual(self.white.selling_price, Decimal("120.00"))
+        self.assertEqual(self.resin.purchase_price, Decimal("80.00"))
+
+    def test_dry_run_and_queryset_limit(self):
+        result = import_price_list(self.rows("code,selling_price\nEW1,130\n"), dry_run=True)
+        self.assertEqual(result.updated, 1)
+        self.white.refresh_from_db()
+        self.assertEqual(self.white.selling_price, Decimal("100.00"))
+
+        result = import_price_list(
+            self.rows("code,purchase_price\nRS1,90\n"), MasterProduct.objects.filter(product_type="FG")
+        )
+        self.assertEqual(result.unknown_codes, ["RS1"])
+
+    def test_unreadable_lists(self):
+        for text in ("", "name,selling_price\nEW1,1\n", "code,name\nEW1,x\n"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    self.rows(text)
+
+    def test_upload_and_export(self):
+        upload = io.BytesIO(b"code,selling_price\nEW1,140\nEB1,1e30\n")
+        upload.name = "prices.csv"
+        response = self.client.post(reverse("import_product_prices"), {"type": "FG", "price_file": upload})
+
+        self.assertEqual(response.status_code, 302)
+        self.white.refresh_from_db()
+        self.assertEqual(self.white.selling_price, Decimal("140.00"))
+
+        response = self.client.get(reverse("export_product_prices"), {"type": "FG"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "code,name,product_type,selling_price,purchase_price")
+        self.assertEqual(sorted(lines[1:]), ["EB1,Enamel Black,FG,110.00,0.00", "EW1,Enamel White,FG,140.00,0.00"])
+
+
+class StockLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.supplier = Supplier.objects.create(name="Asian Chemicals")
+        cls.resin = MasterProduct.objects.create(name="Resin", code="RS1", product_type="RM")
+        cls.solvent = MasterProduct.objects.create(name="Solvent", code="SV1", product_type="RM")
+
+    def inward(self, product, qty):
+        return MaterialInward.objects.create(master_product=product, supplier=self.supplier, bill_no="B1", qty=qty)
+
+    def assertBalancesMatchLedger(self):
+        self.assertEqual(stock.rebuild_balances(dry_run=True), {})
+
+    def test_inward_edit_and_delete_post_the_difference(self):
+        doc = self.inward(self.resin, Decimal("100"))
+        self.inward(self.resin, Decimal("20"))
+        self.assertEqual(stock.on_hand(self.resin.id), Decimal("120"))
+
+        doc.qty = Decimal("60")
+        doc.save()
+        self.assertEqual(stock.on_hand(self.resin.id), Decimal("80"))
+
+        # moved to another product: out of one, into the other
+        doc.master_product = self.solvent
+        doc.save()
+        self.assertEqual(stock.on_hand_many([self.resin.id, self.solvent.id]), {
+            self.resin.id: Decimal("20"), self.solvent.id: Decimal("60"),
+        })
+
+        doc.save()  # unchanged: nothing posted
+        self.assertEqual(StockMovement.objects.filter(source="inward", source_id=doc.pk).count(), 4)
+
+        doc.delete()
+        self.assertEqual(stock.on_hand(self.solvent.id), Decimal("0"))
+        self.assertBalancesMatchLedger()
+
+    def test_return_resolves_product_name(self):
+        MaterialReturn.objects.create(
+            order_id=1, company_name="Acme", location="Pune", product="resin",
+            dispatched_qty=Decimal("10"), returned_qty=Decimal("4"),
+        )
+        unknown = MaterialReturn.objects.create(
+            order_id=2, company_name="Acme", location="Pune", product="No Such Thing",
+            dispatched_qty=Decimal("10"), returned_qty=Decimal("4"),
+        )
+
+        self.assertEqual(stock.on_hand(self.resin.id), Decimal("4"))
+        self.assertFalse(StockMovement.objects.filter(source="return", source_id=unknown.pk).exists())
+
+    def test_ids_by_name_prefers_raw_material(self):
+        finished = MasterProduct.objects.create(name="Solvent", code="SV0", product_type="FG")
+
+        ids = MasterProduct.objects.ids_by_name(["SOLVENT", "resin", "", "Missing"])
+
+        self.assertEqual(ids, {"SOLVENT": self.solvent.id, "resin": self.resin.id})
+        self.assertNotEqual(ids["SOLVENT"], finished.id)
+
+    def test_rebuild_balances_finds_and_fixes_drift(self):
+        self.inward(self.resin, Decimal("50"))
+        self.inward(self.solvent, Decimal("30"))
+        # writes that bypass the ledger
+        StockBalance.objects.filter(pk=self.resin.id).update(on_hand=Decimal("999"))
+        StockBalance.objects.filter(pk=self.solvent.id).delete()
+
+        drift = stock.rebuild_balances(dry_run=True)
+        self.assertEqual(drift, {
+            self.resin.id: (Decimal("999"), Decimal("50")),
+            self.solvent.id: (None, Decimal("30")),
+        })
+        self.assertEqual(stock.on_hand(self.resin.id), Decimal("999"))
+
+        self.assertEqual(stock.rebuild_balances(), drift)
+        self.assertEqual(stock.on_hand_many([self.resin.id, self.solvent.id]), {
+            self.resin.id: Decimal("50"), self.solvent.id: Decimal("30"),
+        })
+        self.assertBalancesMatchLedger()
+
+
+class StockSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.resin = MasterProduct.objects.create(
+            name="Resin", code="RS1", product_type="RM", purchase_price=Decimal("100.00")
+        )
+        cls.white = MasterProduct.objects.create(name="ENAMEL WHITE", code="EW1", purchase_price=Decimal("300.00"))
+        ProductMaster.objects.create(base_product=Product.objects.create(name="Resin"), raw_material_cost=Decimal("90"))
+        ProductMaster.objects.create(
+            base_product=Product.objects.create(name="Enamel White"), raw_material_cost=Decimal("250")
+        )
+        cls.today = timezone.localdate()
+        cls.days = [cls.today - timedelta(days=n) for n in (10, 8, 6, 4, 2)]
+        # one movement per product per day, at noon
+        for i, day in enumerate(cls.days):
+            noon = timezone.make_aware(datetime.datetime.combine(day, datetime.time(12)))
+            stock.post([(cls.resin.id, 10 * (i + 1)), (cls.white.id, -i)], "inward", i + 1, now=noon)
+
+    def expected(self, day):
+        totals = {}
+        for pid, qty, created in StockMovement.objects.values_list("product_id", "qty", "created_at"):
+            if created < snapshots.closing_time(day):
+                totals[pid] = totals.get(pid, Decimal("0")) + qty
+        return {pid: q for pid, q in totals.items() if q}
+
+    def test_balances_from_every_anchor(self):
+        snapshots.take(self.days[1])
+        snapshots.take(self.days[3])
+
+        for n in range(12):
+            day = self.today - timedelta(days=n)
+            with self.subTest(day=day, anchor=snapshots.nearest_anchor(day)[0]):
+                self.assertEqual(snapshots.balances_at(day), self.expected(day))
+        self.assertEqual(
+            {snapshots.nearest_anchor(d)[0] for d in (self.days[0], self.days[2], self.today)},
+            {"before", "after", "now"},
+        )
+
+    def test_take_replaces_a_snapshot_and_only_for_closed_days(self):
+        snapshot, lines = snapshots.take(self.days[2])
+        self.assertEqual(lines, 2)
+        self.assertEqual(dict(snapshot.lines.values_list("product_id", "qty")), self.expected(self.days[2]))
+
+        # a late movement for that day: retaking works it out afresh, not from itself
+        late = timezone.make_aware(datetime.datetime.combine(self.days[2], datetime.time(18)))
+        stock.post([(self.resin.id, 5)], "inward", 99, now=late)
+        again, _ = snapshots.take(self.days[2])
+        self.assertEqual(again.pk, snapshot.pk)
+        self.assertEqual(dict(again.lines.values_list("product_id", "qty")), self.expected(self.days[2]))
+
+        with self.assertRaises(ValueError):
+            snapshots.take(self.today)
+
+    def test_prune_keeps_monthly(self):
+        snapshots.take(self.days[0])
+        snapshots.take(self.days[0], StockSnapshot.MONTHLY)
+        snapshots.take(self.days[4])
+
+        self.assertEqual(snapshots.prune_daily(5, self.today), 1)
+        self.assertEqual(
+            sorted(StockSnapshot.objects.values_list("period", "as_of")),
+            [(StockSnapshot.DAILY, self.days[4]), (StockSnapshot.MONTHLY, self.days[0])],
+        )
+
+    def test_valuation_and_category_totals(self):
+        day = self.days[2]  # resin 60, enamel white -3
+        rows = list(snapshots.valuation(day))
+        self.assertEqual(
+            [(t, name, q, unit, v) for t, _, name, q, unit, v in rows],
+            [
+                ("FG", "ENAMEL WHITE", Decimal("-3"), Decimal("300.00"), Decimal("-900")),
+                ("RM", "Resin", Decimal("60"), Decimal("100.00"), Decimal("6000")),
+            ],
+        )
+
+        # raw material cost, matched to the product in any case
+        rows = list(snapshots.valuation(day, price="rm_cost"))
+        self.assertEqual([unit for *_, unit, _ in rows], [Decimal("250"), Decimal("90")])
+        self.assertEqual(
+            list(snapshots.category_totals(rows)),
+            [("FG", 1, Decimal("-3"), Decimal("-750")), ("RM", 1, Decimal("60"), Decimal("5400"))],
+        )
+        with self.assertRaises(ValueError):
+            list(snapshots.valuation(day, price="list"))
+
+
+class StartBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = Employee.objects.create(full_name="Suresh Patil")
+        cls.category = Product.objects.create(name="Enamel White")
+        bom = ProductBOM.objects.create(category=cls.category, per_percent=Decimal("100"))
+        ProductBOMItem.objects.create(bom=bom, product=Product.objects.create(name="Resin"), percent=Decimal("40"))
+        cls.resin = MasterProduct.objects.create(name="Resin", code="RS1", product_type="RM")
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, action, **extra):
+        data = {
+            "action": action,
+            "supervisor": self.supervisor.id,
+            "labour": "Team A",
+            "category": self.category.id,
+            "base_qty": "100",
+            "production_qty": "200",
+        }
+        data.update(extra)
+        return self.client.post(reverse("bom_production"), data)
+
+    def test_started_batch_is_active_and_uses_stock(self):
+        self.post("calculate")
+        response = self.post("start_batch")
+
+        self.assertRedirects(response, reverse("bom_production"), fetch_redirect_response=False)
+        batch = Batch.objects.get()
+        self.assertEqual(batch.status, "ACTIVE")
+        self.assertEqual(list(batch.items.values_list("product_id", "qty")), [(self.resin.id, Decimal("80.00"))])
+        self.assertEqual(stock.on_hand(self.resin.id), Decimal("-80.00"))
+
+        per_batch, totals = explode_active_batches()
+        self.assertEqual(list(per_batch), [batch.id])
+        self.assertEqual([(r.master_product_id, r.qty) for r in totals], [(self.resin.id, Decimal("80.00"))])
+
+    def test_add_item_checks_the_qty(self):
+        self.post("calculate")
+        item = {"product": self.resin.id}
+
+        for qty in ("1e30", "1e20", "NaN", "Infinity", "abc", "0", "-5", "1.234"):
+            with self.subTest(qty=qty):
+                response = self.post("add_item", qty=qty, **item)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(BatchDraftItem.objects.values_list("qty", flat=True)), [Decimal("80.00")])
+
+        self.post("add_item", qty="99999900", **item)
+        response = self.post("add_item", qty="50", **item)
+        self.assertEqual(list(BatchDraftItem.objects.values_list("qty", flat=True)), [Decimal("99999980.00")])
+        messages = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertIn("Qty of RS1 - Resin would exceed 99999999.99.", messages)
+
+        self.assertEqual(self.client.get(reverse("bom_production")).status_code, 200)
+
+    def test_start_without_items_is_refused(self):
+        response = self.post("start_batch")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Batch.objects.exists())
+
+
+class StockAlertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.supplier = Supplier.objects.create(name="Asian Chemicals")
+        cls.resin = MasterProduct.objects.create(name="Resin", code="RS1", product_type="RM")
+        cls.solvent = MasterProduct.objects.create(name="Solvent", code="SV1", product_type="RM")
+        for name in ("Resin", "Solvent"):
+            ProductMaster.objects.create(base_product=Product.objects.create(name=name), min_stock_level=Decimal("50"))
+
+    def inward(self, product, qty):
+        MaterialInward.objects.create(master_product=product, supplier=self.supplier, bill_no="B1", qty=qty)
+
+    def test_level_change_raises_alerts_right_away(self):
+        self.assertEqual(alerts.alert_count(), 2)
+        self.assertEqual(alerts.below_min(), {
+            self.resin.id: (Decimal("50.00"), Decimal("0")), self.solvent.id: (Decimal("50.00"), Decimal("0")),
+        })
+
+    def test_levels_match_product_names_in_any_case(self):
+        thinner = MasterProduct.objects.create(name="THINNER", code="TH1", product_type="RM")
+        ProductMaster.objects.create(base_product=Product.objects.create(name="Thinner"), min_stock_level=Decimal("10"))
+
+        self.assertTrue(StockAlert.objects.filter(pk=thinner.id).exists())
+        self.inward(thinner, Decimal("15"))
+        alerts.check(full=True)
+        self.assertFalse(StockAlert.objects.filter(pk=thinner.id).exists())
+
+    def test_check_only_looks_at_moved_products(self):
+        first = alerts.check()
+        self.assertTrue(first.full)
+        self.assertIsNone(alerts.check())  # nothing moved
+
+        self.inward(self.resin, Decimal("80"))
+        run = alerts.check()
+
+        self.assertEqual((run.full, run.checked, run.raised, run.cleared), (False, 1, 0, 1))
+        self.assertEqual(list(StockAlert.objects.values_list("pk", flat=True)), [self.solvent.id])
+
+    def test_screens_do_not_run_the_check(self):
+        for url in (reverse("operation_dashboard"), reverse("stock_alerts")):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(StockCheck.objects.exists())
+        self.assertContains(response, "Solvent")
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.day = timezone.now() - timedelta(days=2)
+
+    def assertRollupsMatchOrders(self):
+        self.assertEqual(sales.rebuild_rollups(dry_run=True), {})
+
+    def test_order_changes_keep_rollups_exact(self):
+        a = make_order(order_created=self.day)
+        b = make_order(order_created=self.day, city="Mumbai", quantity=Decimal("5"), total_price=Decimal("512.50"))
+        self.assertRollupsMatchOrders()
+        day = timezone.localdate(self.day)
+        self.assertEqual(sales.totals(day, day), {"orders": 2, "quantity": Decimal("15"), "revenue": Decimal("1512.5")})
+
+        # split: quantity moves between the two orders
+        a.quantity, a.total_price, a.is_split = Decimal("6"), Decimal("600"), True
+        a.save()
+        make_order(order_created=self.day, quantity=Decimal("4"), total_price=Decimal("400"))
+        self.assertRollupsMatchOrders()
+
+        # edits of counted fields, including the day
+        b.product_name, b.sales_person = "Enamel Black", ""
+        b.save()
+        b.order_created = self.day - timedelta(days=3)
+        b.save()
+        self.assertRollupsMatchOrders()
+
+        # fields the rollups do not count are not tracked
+        a.remark = "checked"
+        a.save(update_fields=["remark"])
+
+        a.is_cancelled = True
+        a.save()
+        b.delete()
+        self.assertRollupsMatchOrders()
+        self.assertEqual(sales.totals(day, day)["orders"], 1)
+        self.assertEqual(
+            [(r["key"], r["orders"]) for r in sales.top("city", day, day)], [("Pune", 1)]
+        )
+
+    def test_bulk_writes_are_found_and_fixed_by_rebuild(self):
+        make_order(order_created=self.day)
+        Order.objects.bulk_create([Order(order_created=self.day, product_name="Primer", quantity=2, total_price=50)])
+        Order.objects.filter(product_name="Enamel White").update(city="Nagpur")
+
+        drift = sales.rebuild_rollups(dry_run=True)
+        day = timezone.localdate(self.day)
+        self.assertEqual(drift[(day, "city", "Nagpur")], (None, (1, Decimal("10.00"), Decimal("1000.00"))))
+        self.assertEqual(drift[(day, "city", "Pune")][1], None)
+
+        self.assertEqual(sales.rebuild_rollups(), drift)
+        self.assertRollupsMatchOrders()
+
+    def test_report_reads_rollups(self):
+        make_order(order_created=self.day)
+        response = self.client.get(reverse("sales_report"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"]["orders"], 1)
+
+
+class IncentiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ProductMaster.objects.create(base_product=Product.objects.create(name="Enamel White"), incentive=Decimal("2"))
+        ProductMaster.objects.create(base_product=Product.objects.create(name="Primer"), incentive=Decimal("0.5"))
+        MasterProduct.objects.create(name="Enamel White", code="EW1")
+        MasterProduct.objects.create(name="PRIMER", code="PR1")
+        kiran = Employee.objects.create(full_name="Kiran Rao")
+        Customer.objects.create(company_name="Acme Traders", sales_person=kiran)
+        cls.sep = datetime.date(2026, 9, 1)
+        cls.oct = datetime.date(2026, 10, 1)
+
+    def at(self, month, day):
+        return timezone.make_aware(datetime.datetime.combine(month.replace(day=day), datetime.time(10)))
+
+    def payout_rows(self):
+        return sorted(
+            IncentivePayout.objects.filter(orders__gt=0).values_list(
+                "month", "sales_person", "orders", "quantity", "amount", "unmatched_orders"
+            )
+        )
+
+    def test_stale_recompute_matches_full_recompute(self):
+        ravi = make_order(order_created=self.at(self.sep, 10))
+        blank = make_order(order_created=self.at(self.sep, 12), sales_person="", product_name="Primer")
+        other = make_order(order_created=self.at(self.oct, 3), sales_person="Meena", product_name="Unknown Paint")
+        gone = make_order(order_created=self.at(self.oct, 5))
+        incentives.recompute([self.sep, self.oct])
+        self.assertEqual(
+            [row[:3] + row[4:] for row in self.payout_rows()],
+            [
+                (self.sep, "Kiran Rao", 1, Decimal("5.00"), 0),  # customer's sales person
+                (self.sep, "Ravi", 1, Decimal("20.00"), 0),
+                (self.oct, "Meena", 1, Decimal("0.00"), 1),
+                (self.oct, "Ravi", 1, Decimal("20.00"), 0),
+            ],
+        )
+
+        # split, cancel, reassign, move to another month, delete
+        ravi.quantity = Decimal("4")
+        ravi.save()
+        make_order(order_created=self.at(self.sep, 10), quantity=Decimal("6"))
+        blank.sales_person = "Meena"
+        blank.save()
+        other.is_cancelled = True
+        other.save()
+        ravi.order_created = self.at(self.oct, 1)
+        ravi.save()
+        gone.delete()
+
+        self.assertTrue(IncentivePayout.objects.filter(stale_since__isnull=False).exists())
+        incentives.recompute_stale()
+        self.assertFalse(IncentivePayout.objects.filter(stale_since__isnull=False).exists())
+        incremental = self.payout_rows()
+
+        incentives.recompute([self.sep, self.oct])
+        self.assertEqual(incremental, self.payout_rows())
+        self.assertEqual(
+            [row[:2] + row[4:5] for row in incremental],
+            [
+                (self.sep, "Meena", Decimal("5.00")),
+                (self.sep, "Ravi", Decimal("12.00")),
+                (self.oct, "Ravi", Decimal("8.00")),
+            ],
+        )
+
+    def test_product_names_match_case_insensitively(self):
+        make_order(order_created=self.at(self.sep, 10), product_name="enamel white")
+        make_order(order_created=self.at(self.sep, 11), product_name="Primer", quantity=Decimal("4"))
+        incentives.recompute([self.sep])
+
+        payout = IncentivePayout.objects.get(month=self.sep, sales_person="Ravi")
+        self.assertEqual((payout.amount, payout.unmatched_orders), (Decimal("22.00"), 0))
+
+    def test_untracked_edit_marks_nothing(self):
+        order = make_order(order_created=self.at(self.sep, 10))
+        incentives.recompute([self.sep])
+
+        order.remark = "called back"
+        order.save()
+
+        self.assertFalse(IncentivePayout.objects.filter(stale_since__isnull=False).exists())
+
+    def test_payouts_screen_only_reads(self):
+        make_order(order_created=self.at(self.sep, 10))
+        url = reverse("incentive_payouts")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"month": "2026-09"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q["sql"] for q in queries if not q["sql"].startswith("SELECT")])
+        self.assertEqual([(p.sales_person, p.orders) for p in response.context["rows"]], [("Ravi", 0)])
+        self.assertEqual(response.context["stale"], 1)
+
+        self.client.post(url + "?month=2026-09")
+        response = self.client.get(url, {"month": "2026-09"})
+        self.assertEqual([(p.sales_person, p.orders) for p in response.context["rows"]], [("Ravi", 1)])
+        self.assertEqual(response.context["stale"], 0)
+
+
+class BomExplosionCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Product.objects.create(name="Enamel White")
+        cls.resin = Product.objects.create(name="Resin")
+        cls.bom = ProductBOM.objects.create(category=cls.category, per_percent=Decimal("100"))
+        ProductBOMItem.objects.create(bom=cls.bom, product=cls.resin, percent=Decimal("40"))
+        cls.master_resin = MasterProduct.objects.create(name="Resin", code="RS1", product_type="RM")
+
+    def setUp(self):
+        cache.clear()
+
+    def needed(self):
+        return [(r.master_product_id, r.qty) for r in explode(self.category.id, Decimal("200"))]
+
+    def test_cached_until_the_grid_is_saved(self):
+        self.assertEqual(self.needed(), [(self.master_resin.id, Decimal("80.00"))])
+        with self.assertNumQueries(0):
+            self.needed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("product_bom_master"), {
+                "category_id": self.category.id,
+                "per_percent": "100",
+                f"percent_{self.resin.id}": "25",
+                f"seq_{self.resin.id}": "1",
+            })
+
+        self.assertEqual(self.needed(), [(self.master_resin.id, Decimal("50.00"))])
+
+    def test_timeout_follows_the_cache_backend(self):
+        local = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        shared = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp"}}
+        with override_settings(CACHES=local):
+            self.assertEqual(requirements._timeout(), requirements.LOCAL_CACHE_TIMEOUT)
+        with override_settings(CACHES=shared):
+            self.assertEqual(requirements._timeout(), requirements.CACHE_TIMEOUT)
+
+
+class ChangeFeedTests(TestCase):
+    def publishing(self, queries):
+        """queries, but a change is published while the grid is loaded."""
+        def wrapped(*args, **kwargs):
+            self.published.append(feed.get_broker().publish(feed.PAYMENTS, {"row": 0}))
+            return queries(*args, **kwargs)
+        self.published = []
+        return wrapped
+
+    def test_async_page_cursor_is_read_before_the_grid_queries(self):
+        with mock.patch.object(async_views, "payment_orders", self.publishing(async_views.payment_orders)):
+            response = self.client.get(reverse("payment_clearance_monitor"))
+
+        self.assertLess(response.context["feed_since"], self.published[0]["id"])
+
+    def test_page_cursor_is_read_before_the_grid_queries(self):
+        with mock.patch.object(views, "payment_orders", self.publishing(views.payment_orders)):
+            response = self.client.get(reverse("payment_clearance"))
+
+        self.assertLess(response.context["feed_since"], self.published[0]["id"])
+
+    def test_stream_keeps_alive_after_a_timeout(self):
+        async def read():
+            events = async_views._events(feed.PAYMENTS, None)
+            try:
+                received = [await anext(events), await anext(events)]
+                feed.get_broker().publish(feed.PAYMENTS, {"row": 1})
+                received.append(await anext(events))
+            finally:
+                await events.aclose()
+            return received
+
+        with mock.patch.object(async_views, "FEED_KEEPALIVE", 0.01):
+            retry, keep_alive, event = async_to_sync(read)()
+
+        self.assertEqual((retry, keep_alive), ("retry: 3000\n\n", ": keep-alive\n\n"))
+        self.assertIn('"row": 1', event)
+
+
+class DispatchAssignTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(number="MH12 AB 1234", capacity_qty=Decimal("1000"))
+        cls.other = Dispatch.objects.create(vehicle=cls.vehicle)
+        cls.pending = cls.item(order_id=1)
+        cls.taken = cls.item(order_id=2, dispatch=cls.other)
+
+    @classmethod
+    def item(cls, **fields):
+        return DispatchItem.objects.create(
+            company_name="Acme Traders", location="Pune", product="Enamel White",
+            available_qty=Decimal("10"), qty=Decimal("10"), **fields,
+        )
+
+    def create_dispatch(self, *ids):
+        return self.client.post(reverse("dispatch_order"), {
+            "action": "create_dispatch",
+            "vehicle": self.vehicle.id,
+            "selected_items": [str(i) for i in ids],
+        })
+
+    def messages(self, response):
+        return [str(m) for m in get_messages(response.wsgi_request)]
+
+    def test_item_of_another_dispatch_is_rejected_and_left_alone(self):
+        response = self.create_dispatch(self.taken.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Dispatch.objects.count(), 1)
+        self.taken.refresh_from_db()
+        self.assertEqual((self.taken.dispatch_id, self.taken.dispatch_date), (self.other.id, None))
+        self.assertEqual(self.messages(response), ["Nothing was dispatched: 1 already assigned to another dispatch."])
+
+    def test_missing_ids_are_reported_as_not_found(self):
+        response = self.create_dispatch(999999)
+
+        self.assertEqual(Dispatch.objects.count(), 1)
+        self.assertEqual(self.messages(response), ["Nothing was dispatched: 1 not found."])
+
+    def test_pending_items_are_assigned_and_the_rest_reported(self):
+        response = self.create_dispatch(self.pending.id, self.taken.id, 999999)
+
+        self.assertRedirects(response, reverse("dispatch_order"), fetch_redirect_response=False)
+        dispatch = Dispatch.objects.latest("id")
+        self.assertEqual(list(dispatch.items.all()), [self.pending])
+        self.taken.refresh_from_db()
+        self.assertEqual(self.taken.dispatch_id, self.other.id)
+        self.assertIn(
+            "2 of 3 selected item(s) were skipped: 1 already assigned to another dispatch, 1 not found.",
+            self.messages(response),
+        )
+
+
+class DispatchLoadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(number="MH12 AB 1234", capacity_qty=Decimal("100"))
+        cls.loaded = Dispatch.objects.create(vehicle=cls.vehicle)
+        cls.empty = Dispatch.objects.create(vehicle=cls.vehicle)
+        for qty in ("30", "20"):
+            cls.item(qty, dispatch=cls.loaded)
+        cls.pending = [cls.item("15"), cls.item("25")]
+
+    @classmethod
+    def item(cls, qty, **fields):
+        return DispatchItem.objects.create(
+            order_id=1, company_name="Acme Traders", location="Pune", product="Enamel White",
+            available_qty=Decimal(qty), qty=Decimal(qty), **fields,
+        )
+
+    def test_load_is_summed_in_the_same_query(self):
+        with self.assertNumQueries(1):
+            loads = {d.id: (d.total_qty(), d.load_percentage()) for d in Dispatch.objects.with_load()}
+
+        self.assertEqual(loads, {self.loaded.id: (Decimal("50"), 50.0), self.empty.id: (Decimal("0"), 0.0)})
+
+    def test_estimate_load_sums_the_selected_pending_items(self):
+        assigned = self.loaded.items.first()
+        response = self.client.post(reverse("dispatch_order"), {
+            "action": "estimate_load",
+            "vehicle": self.vehicle.id,
+            "selected_items": [it.id for it in self.pending] + [assigned.id],
+        })
+
+        load_info = response.context["load_info"]
+        self.assertEqual((load_info["total_qty"], load_info["percent"]), (Decimal("40"), 40.0))
+
+    def test_recent_dispatches_cost_the_same_queries_for_more_rows(self):
+        def page_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("dispatch_order"))
+            return len(queries)
+
+        before = page_queries()
+        for _ in range(5):
+            self.item("10", dispatch=Dispatch.objects.create(vehicle=self.vehicle))
+
+        self.assertEqual(page_queries(), before)
+
+
+class DispatchPlanningTests(TestCase):
+    day1 = datetime.datetime(2026, 1, 5, 9, tzinfo=datetime.timezone.utc)
+    day2 = day1 + timedelta(days=1)
+
+    def item(self, pk, location, qty, ready_at=None):
+        return planning.PlanItem(pk, location, Decimal(qty), ready_at or self.day1)
+
+    def vehicles(self, *capacities):
+        return [planning.PlanVehicle(i, f"V{cap}", Decimal(cap)) for i, cap in enumerate(capacities, 1)]
+
+    def loads(self, result):
+        return [(load.vehicle.number, load.location, load.item_ids, load.qty) for load in result.loads]
+
+    def test_one_location_per_vehicle_smallest_vehicle_that_takes_it_all(self):
+        items = [
+            self.item(1, "Pune", "20"), self.item(2, "Pune", "40"), self.item(3, "Pune", "30"),
+            self.item(4, "Nashik", "25", self.day2),
+        ]
+        result = planning.plan(items, self.vehicles("30", "100", "50"))
+
+        self.assertEqual(self.loads(result), [
+            ("V100", "Pune", [2, 3, 1], Decimal("90")),
+            ("V30", "Nashik", [4], Decimal("25")),
+        ])
+        self.assertEqual(result.unplaced, [])
+        self.assertEqual(result.planned_qty, Decimal("115"))
+        self.assertAlmostEqual(result.utilisation, 115 / 130 * 100)
+
+    def test_older_days_go_first_and_the_rest_stays_unplaced(self):
+        old, big = self.item(1, "Pune", "10"), self.item(2, "Pune", "50", self.day2)
+        result = planning.plan([big, old], self.vehicles("55"))
+
+        self.assertEqual(self.loads(result), [("V55", "Pune", [1], Decimal("10"))])
+        self.assertEqual(result.unplaced, [big])
+
+    def test_lines_no_vehicle_can_take_are_unplaced(self):
+        too_big = self.item(1, "Pune", "500")
+        result = planning.plan([too_big, self.item(2, "Pune", "0")], self.vehicles("100", "0"))
+
+        self.assertEqual((result.loads, result.unplaced), ([], [too_big]))
+        self.assertEqual(result.utilisation, 0)
+
+    def test_auto_plan_covers_pending_items_only(self):
+        vehicle = Vehicle.objects.create(number="MH12 AB 1234", capacity_qty=Decimal("100"))
+        fields = {"order_id": 1, "company_name": "Acme Traders", "location": "Pune", "product": "Enamel White"}
+        pending = DispatchItem.objects.create(available_qty=Decimal("40"), qty=Decimal("40"), **fields)
+        DispatchItem.objects.create(
+            dispatch=Dispatch.objects.create(vehicle=vehicle), available_qty=Decimal("30"), qty=Decimal("30"), **fields
+        )
+
+        response = self.client.post(reverse("dispatch_order"), {"action": "auto_plan"})
+
+        self.assertEqual(
+            self.loads(response.context["dispatch_plan"]), [("MH12 AB 1234", "Pune", [pending.id], Decimal("40"))]
+        )
+
+
+class GridQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.acme = [make_order(order_created=now - timedelta(days=i)) for i in range(3)]
+        cls.beta = make_order(company="Beta Paints", order_created=now)
+        cls.held = make_order(on_hold=True, order_created=now)
+        make_order(is_cancelled=True, order_created=now)
+
+    def ids(self, qs):
+        return {o.pk for o in qs}
+
+    def test_open_grids_leave_out_cancelled_orders(self):
+        self.assertEqual(self.ids(payment_orders({}, False)), self.ids([*self.acme, self.beta]))
+        self.assertEqual(self.ids(payment_orders({}, True)), {self.held.pk})
+
+    def test_pager_keeps_the_filters(self):
+        params = QueryDict("company=Acme+Traders&hold_cursor=abc")
+        page = keyset_page(payment_orders(params, False), None, size=2)
+        links = pager(params, page, "hold_cursor")
+
+        self.assertEqual([o.pk for o in page], [self.acme[0].pk, self.acme[1].pk])
+        self.assertEqual(links["first_query"], "company=Acme+Traders")
+        next_params = QueryDict(links["next_query"])
+        self.assertEqual(next_params["company"], "Acme Traders")
+        rest = keyset_page(payment_orders(next_params, False), next_params["hold_cursor"], size=2)
+        self.assertEqual(([o.pk for o in rest], rest.has_next), ([self.acme[2].pk], False))
+
+    def test_screen_queries_are_the_view_queries(self):
+        screens = dict(screen_queries({"company": "Beta Paints"}))
+
+        self.assertEqual(list(screens["payment_clearance active"]), [self.beta])
+        self.assertEqual(list(screens["payment_clearance on hold"]), [])
+        response = self.client.get(reverse("payment_clearance"), {"company": "Beta Paints"})
+        self.assertEqual([o.pk for o in response.context["orders_active"]], [self.beta.pk])
+
+    def test_screen_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command("check_query_plans", stdout=out)
+
+        self.assertNotIn("FULL SCAN", out.getvalue())
+        self.assertIn("screen queries use indexes.", out.getvalue())
+
+    def test_a_full_table_scan_fails_the_check(self):
+        with mock.patch(
+            "operations.management.commands.check_query_plans.screen_queries",
+            return_value=[("every order", Order.objects.all())],
+        ), self.assertRaisesMessage(CommandError, "1 screen query(ies) use a full table scan."):
+            call_command("check_query_plans", stdout=io.StringIO())
+
+
+class AsyncMonitorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.active = [make_order(order_created=now - timedelta(hours=i)) for i in range(3)]
+        cls.held = make_order(on_hold=True, order_created=now)
+        for i in range(2):
+            FactoryOrder.objects.create(
+                order_id=i + 1, company_name="Acme Traders", location="Pune", sales_person="Ravi", order_created=now
+            )
+        cls.vehicle = Vehicle.objects.create(number="MH12 AB 1234", capacity_qty=Decimal("100"))
+        cls.pending = DispatchItem.objects.create(
+            order_id=1, company_name="Acme Traders", location="Pune", product="Enamel White",
+            available_qty=Decimal("10"), qty=Decimal("10"),
+        )
+
+    def test_payment_monitor_shows_what_the_normal_view_shows(self):
+        normal = self.client.get(reverse("payment_clearance"), {"company": "Acme Traders"})
+        monitor = self.client.get(reverse("payment_clearance_monitor"), {"company": "Acme Traders"})
+
+        self.assertEqual(monitor.status_code, 200)
+        for key in ("orders_active", "orders_on_hold"):
+            self.assertEqual([o.pk for o in monitor.context[key]], [o.pk for o in normal.context[key]])
+        self.assertEqual(monitor.context["counts"], {"active": 3, "hold": 1})
+
+    def test_factory_and_dispatch_monitors(self):
+        factory = self.client.get(reverse("factory_status_monitor"))
+        dispatch = self.client.get(reverse("dispatch_order_monitor"))
+
+        self.assertEqual((len(factory.context["orders"]), factory.context["counts"]), (2, {"orders": 2}))
+        self.assertEqual([it.pk for it in dispatch.context["pending_items"]], [self.pending.pk])
+
+    def test_posts_go_to_the_normal_view(self):
+        order = self.active[0]
+        response = self.client.post(reverse("payment_clearance_monitor"), {"order_id": order.pk, "action": "hold"})
+
+        self.assertRedirects(response, reverse("payment_clearance"), fetch_redirect_response=False)
+        order.refresh_from_db()
+        self.assertTrue(order.on_hold)
+
+    def test_feed_stream_needs_asgi_and_a_known_topic(self):
+        self.assertEqual(self.client.get(reverse("feed_stream", args=[feed.PAYMENTS])).status_code, 204)
+        self.assertEqual(self.client.get(reverse("feed_stream", args=["orders"])).status_code, 404)
+
+    async def test_monitor_under_asgi(self):
+        response = await self.async_client.get(reverse("factory_status_monitor"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["counts"], {"orders": 2})
@@ -1,16 +1,28 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path("", views.operation_dashboard, name="operation_dashboard"),
     path("create-order/", views.create_order, name="create_order"),
     path("payments/", views.payment_clearance, name="payment_clearance"),
+    path("payments/action/", views.payment_action, name="payment_action"),
+    path("payments/action/batch/", views.payment_action_batch, name="payment_action_batch"),
     path("factory-status/", views.factory_status, name="factory_status"),
     path("bom-production/", views.bom_production, name="bom_production"),
     path("dispatch-order/", views.dispatch_order, name="dispatch_order"),
+    # async (ASGI) versions of the screens the floor monitors poll
+    path("payments/monitor/", async_views.payment_clearance, name="payment_clearance_monitor"),
+    path("factory-status/monitor/", async_views.factory_status, name="factory_status_monitor"),
+    path("dispatch-order/monitor/", async_views.dispatch_order, name="dispatch_order_monitor"),
+    path("feed/<slug:topic>/", async_views.feed_stream, name="feed_stream"),
     path("material-inward/", views.material_inward, name="material_inward"),
     path("split-order/", views.split_or_cancel_order, name="split_order"),
     path("material-discard/", views.material_discard, name="material_discard"),
     path("material-inward-back/", views.material_inward_back, name="material_inward_back"),
+    path("stock-alerts/", views.stock_alerts, name="stock_alerts"),
+    path("sales/", views.sales_report, name="sales_report"),
+    path("incentives/", views.incentive_payouts, name="incentive_payouts"),
     path("update-products/", views.update_products, name="update_products"),
+    path("update-products/import/", views.import_product_prices, name="import_product_prices"),
+    path("update-products/export/", views.export_product_prices, name="export_product_prices"),
 ]
\ No newline at end of file
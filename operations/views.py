@@ -1,15 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.core.paginator import Paginator
+from django.views.decorators.http import require_POST
 from .forms import OrderForm, BatchForm, BatchItemForm, DispatchHeaderForm, MaterialInwardForm, MaterialDiscardForm
-from .models import Order, FactoryOrder, Batch, BatchItem, Dispatch, DispatchItem, Vehicle, MaterialReturn, MasterProduct
-from django.db.models import Q
+from .models import Order, FactoryOrder, Batch, BatchItem, BatchDraft, BatchDraftItem, Dispatch, DispatchItem, Vehicle, MaterialReturn, MasterProduct, SalesRollup, StockAlert, StockCheck, load_percent
+from django.db.models import F, Q, Sum
 from django.utils import timezone
 from django.contrib import messages
 from django.db import transaction
 from django.urls import reverse 
 from decimal import Decimal, InvalidOperation
+from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date
 
 # IMPORTANT: import BOM from masters
 from masters.models import ProductBOM, ProductBOMItem
+from masters import search
+from .requirements import explode
+from . import alerts, feed, incentives, sales, stock
+from .planning import plan_pending
+from .pricing import parse_posted_prices, changed_products, save_prices, read_price_list, import_price_list, export_price_list
+from .elapsed import with_age, age_options
+from .paging import keyset_page, pager
+from .queries import (
+    PAYMENT_FILTERS, SPLIT_FILTERS, FACTORY_FILTERS,
+    open_orders, payment_orders, split_orders, factory_orders, pending_dispatch_items,
+)
 
 def operation_dashboard(request):
     tiles = [
@@ -23,11 +40,15 @@ def operation_dashboard(request):
         {"title": "ADMIN-MATERIAL DISCARD",     "icon": "img/admin_material_discard.png",    "url": reverse("material_discard")},
         {"title": "PM-RETURN INWORD",           "icon": "img/pm_return_inword.png",          "url": reverse("material_inward_back")},
         {"title": "UPDATE PRODUCT",             "icon": "img/update_product.png",            "url": reverse("update_products")},
+        {"title": "LOW STOCK",                  "icon": "img/master_product.png",            "url": reverse("stock_alerts"),
+         "badge": alerts.alert_count()},
+        {"title": "SALES REPORT",               "icon": "img/master_customer.png",           "url": reverse("sales_report")},
+        {"title": "INCENTIVES",                 "icon": "img/master_employee.png",           "url": reverse("incentive_payouts")},
     ]
 
     context = {
         "row1": tiles[:6],   # first 7
-        "row2": tiles[6:],   # last 3 (here 3+1 = 4)
+        "row2": tiles[6:],   # the rest
     }
     return render(request, "operations/dashboard.html", context)
 
@@ -35,7 +56,8 @@ def create_order(request):
     if request.method == "POST":
         form = OrderForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():  # order + its sales rollups
+                form.save()
             # after saving, go back to dashboard (or to a "success" page)
             return redirect("operation_dashboard")
     else:
@@ -52,38 +74,118 @@ def payment_clearance(request):
     if request.method == "POST":
         order_id = request.POST.get("order_id")
         action = request.POST.get("action")  # e.g. "clear", "hold", "unhold"
-        order = get_object_or_404(Order, pk=order_id)
-
-        if action == "clear":
-            order.payment_cleared = True
-            order.on_hold = False
-        elif action == "hold":
-            order.on_hold = True
-        elif action == "unhold":
-            order.on_hold = False
-
-        order.save()
+        if action in PAYMENT_ACTIONS and order_id and order_id.isdigit():
+            _payment_update([int(order_id)], action)
         return redirect("payment_clearance")  # or your url name
 
+    # the feed cursor comes first: a change committed while the lists are
+    # loaded is then sent again on the feed instead of being missed
+    feed_since = feed.get_broker().last_id
+
     # ---------- HERE IS THE IMPORTANT PART ----------
-    orders_active = (
-        Order.objects
-        .filter(on_hold=False, is_cancelled=False)
-        .order_by("-order_created")
-    )
-    orders_on_hold = (
-        Order.objects
-        .filter(on_hold=True, is_cancelled=False)
-        .order_by("-order_created")
-    )
+    # both lists are filtered the same way and paged independently
+    orders_active = keyset_page(payment_orders(request.GET, False), request.GET.get("active_cursor"))
+    orders_on_hold = keyset_page(payment_orders(request.GET, True), request.GET.get("hold_cursor"))
     # ------------------------------------------------
 
     context = {
         "orders_active": orders_active,
         "orders_on_hold": orders_on_hold,
+        "active_pager": pager(request.GET, orders_active, "active_cursor"),
+        "hold_pager": pager(request.GET, orders_on_hold, "hold_cursor"),
+        "filters": PAYMENT_FILTERS.context(request.GET),
+        "feed_since": feed_since,
     }
     return render(request, "operations/payment_clearance.html", context)
 
+# action -> the fields it sets. "cancel_hold" is what the on-hold table sends.
+PAYMENT_ACTIONS = {
+    "clear": {"payment_cleared": True, "on_hold": False},
+    "hold": {"on_hold": True},
+    "unhold": {"on_hold": False},
+    "cancel_hold": {"on_hold": False},
+}
+PAYMENT_BATCH_LIMIT = 500
+
+
+def _payment_update(ids, action):
+    """
+    One UPDATE of the payment flags of the open orders in ids (no load /
+    save per order). Returns the updated orders, which also go out on
+    the change feed since update() sends no signals.
+    """
+    with transaction.atomic():
+        qs = open_orders().filter(pk__in=ids)
+        if not qs.update(**PAYMENT_ACTIONS[action]):
+            return []
+        orders = list(qs.order_by("-order_created", "-id"))
+        feed.publish_orders(orders)
+    return orders
+
+
+def _payment_rows(request, orders):
+    rows = []
+    for order in orders:
+        section = "hold" if order.on_hold else "active"
+        rows.append({
+            "row": order.pk,
+            "section": section,
+            "payment_cleared": order.payment_cleared,
+            "html": render_to_string(
+                "operations/includes/payment_row.html",
+                {"order": order, "section": section},
+                request=request,
+            ),
+        })
+    return rows
+
+
+def _payment_action_error(action):
+    if action not in PAYMENT_ACTIONS:
+        return JsonResponse({"error": f"action must be one of {', '.join(PAYMENT_ACTIONS)}"}, status=400)
+    return None
+
+
+@require_POST
+def payment_action(request):
+    """
+    JSON version of the row buttons: order_id + action. Answers with the
+    re-rendered row ({"row", "section", "payment_cleared", "html"}).
+    """
+    action = request.POST.get("action")
+    order_id = request.POST.get("order_id", "")
+    error = _payment_action_error(action)
+    if error:
+        return error
+    if not order_id.isdigit():
+        return JsonResponse({"error": "order_id is required"}, status=400)
+
+    orders = _payment_update([int(order_id)], action)
+    if not orders:
+        return JsonResponse({"error": "No such open order."}, status=404)
+    return JsonResponse(_payment_rows(request, orders)[0])
+
+
+@require_POST
+def payment_action_batch(request):
+    """
+    One action on all selected orders (order_id repeated), one UPDATE.
+    Answers {"updated": n, "rows": [...]} like payment_action.
+    """
+    action = request.POST.get("action")
+    error = _payment_action_error(action)
+    if error:
+        return error
+    ids = {int(v) for v in request.POST.getlist("order_id") if v.isdigit()}
+    if not ids:
+        return JsonResponse({"error": "Select at least one order."}, status=400)
+    if len(ids) > PAYMENT_BATCH_LIMIT:
+        return JsonResponse({"error": f"At most {PAYMENT_BATCH_LIMIT} orders at a time."}, status=400)
+
+    orders = _payment_update(ids, action)
+    return JsonResponse({"updated": len(orders), "rows": _payment_rows(request, orders)})
+
+
 def factory_status(request):
     if request.method == "POST":
         order_id = request.POST.get("order_id")
@@ -101,53 +203,73 @@ def factory_status(request):
         order.save()
         return redirect("factory_status")
 
-    orders = FactoryOrder.objects.all().order_by("-order_id")
-    return render(request, "operations/factory_status.html", {"orders": orders})
-
-DRAFT_KEY = "bom_draft"
-
-def _draft_get(request):
-    return request.session.get(DRAFT_KEY, {
-        "header": {
-            "supervisor": "",
-            "labour": "",
-            "category_id": "",
-            "base_qty": "",
-            "production_qty": "",
-            "remark": "",
-        },
-        "items": [],  # list of {"product_id": int, "product_name": str, "qty": float}
-        "show_after_calculate": False,
+    feed_since = feed.get_broker().last_id  # before the query, see payment_clearance
+    orders = keyset_page(
+        factory_orders(request.GET),
+        request.GET.get("cursor"),
+        descending=request.GET.get("sort") != "-age",
+    )
+    return render(request, "operations/factory_status.html", {
+        "orders": orders,
+        "pager": pager(request.GET, orders),
+        "filters": FACTORY_FILTERS.context(request.GET),
+        "age": age_options(request.GET),
+        "feed_since": feed_since,
     })
 
+DRAFT_KEY = "bom_draft_id"
+LEGACY_DRAFT_KEY = "bom_draft"  # whole draft dict, before BatchDraft
+DRAFT_QTY_MAX = Decimal("99999999.99")  # BatchDraftItem.qty / BatchItem.qty: max_digits=10, decimal_places=2
 
-def _draft_save(request, draft):
-    request.session[DRAFT_KEY] = draft
-    request.session.modified = True
+
+def _draft_get(request, create=False):
+    """
+    The BatchDraft of this user (any device), or of this session when not
+    logged in. Only the draft id is kept in the session, written once.
+    """
+    user = request.user if request.user.is_authenticated else None
+    if user:
+        draft = BatchDraft.objects.filter(owner=user).first()
+    else:
+        draft_id = request.session.get(DRAFT_KEY)
+        draft = BatchDraft.objects.filter(id=draft_id, owner__isnull=True).first() if draft_id else None
+
+    legacy = request.session.pop(LEGACY_DRAFT_KEY, None)
+    if draft is None and (create or (legacy and legacy.get("items"))):
+        draft = BatchDraft.objects.create(owner=user)
+        if not user:
+            request.session[DRAFT_KEY] = draft.id
+        if legacy:
+            _draft_import_legacy(draft, legacy)
+    return draft
+
+
+def _draft_import_legacy(draft, legacy):
+    """Carry over the items of a session draft saved before BatchDraft existed."""
+    qty = {}
+    for it in legacy.get("items", []):
+        try:
+            qty[int(it["product_id"])] = Decimal(str(it["qty"]))
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            continue
+    known = set(MasterProduct.objects.filter(id__in=qty).values_list("id", flat=True))
+    BatchDraftItem.objects.bulk_create(
+        [BatchDraftItem(draft=draft, product_id=pid, qty=q) for pid, q in qty.items() if pid in known]
+    )
+    draft.calculated = bool(legacy.get("show_after_calculate"))
+    draft.save(update_fields=["calculated", "updated_at"])
 
 
-def _draft_clear(request):
-    if DRAFT_KEY in request.session:
-        del request.session[DRAFT_KEY]
-        request.session.modified = True
+def _draft_clear(request, draft):
+    if draft is not None:
+        draft.delete()
+    request.session.pop(DRAFT_KEY, None)
 
 
 def bom_production(request):
     draft = _draft_get(request)
 
-    # Build forms prefilled from draft (GET or after actions)
-    initial_header = {
-        "supervisor": draft["header"].get("supervisor", ""),
-        "labour": draft["header"].get("labour", ""),
-        # If Batch.category is FK, use "category": <id>
-        # If Batch.category is CharField, use "category": <string>
-        "category": draft["header"].get("category_id") or None,
-        "base_qty": draft["header"].get("base_qty", ""),
-        "production_qty": draft["header"].get("production_qty", ""),
-        "remark": draft["header"].get("remark", ""),
-    }
-
-    batch_form = BatchForm(initial=initial_header)
+    batch_form = BatchForm(initial=draft.header_initial() if draft else None)
 
     # product dropdown filtering depends on selected category (optional)
     # Example: if category chosen, allow adding RM only. Adjust as needed.
@@ -163,103 +285,107 @@ def bom_production(request):
         # Build item form too
         item_form = BatchItemForm(request.POST, product_qs=item_product_qs)
 
-        # --- helper to copy header fields into draft (so selection does not reset) ---
+        # --- copy a valid header into the draft (so selection does not reset) ---
         def sync_header_into_draft():
-            # If Batch.category is FK:
-            cat_id = request.POST.get("category") or request.POST.get("category_id") or ""
-            draft["header"] = {
-                "supervisor": request.POST.get("supervisor", "").strip(),
-                "labour": request.POST.get("labour", "").strip(),
-                "category_id": str(cat_id).strip(),
-                "base_qty": request.POST.get("base_qty", "").strip(),
-                "production_qty": request.POST.get("production_qty", "").strip(),
-                "remark": request.POST.get("remark", "").strip(),
-            }
+            if batch_form.is_valid():
+                for name in BatchDraft.HEADER_FIELDS:
+                    setattr(draft, name, batch_form.cleaned_data.get(name))
+                draft.save()
 
         if action == "calculate":
             if not batch_form.is_valid():
                 messages.error(request, "Please fill all required fields before Calculate.")
             else:
+                draft = draft or _draft_get(request, create=True)
+                draft.calculated = True
                 sync_header_into_draft()
-                draft["show_after_calculate"] = True
-                _draft_save(request, draft)
+
+                # pre-fill raw materials from the category BOM (only for an empty draft,
+                # so manual edits are not overwritten by a second Calculate)
+                if not draft.items.exists():
+                    reqs = explode(
+                        batch_form.cleaned_data["category"].id,
+                        batch_form.cleaned_data["production_qty"],
+                    )
+                    BatchDraftItem.objects.bulk_create([
+                        BatchDraftItem(draft=draft, product_id=r.master_product_id, qty=r.qty)
+                        for r in reqs
+                        if r.master_product_id and r.qty > 0
+                    ])
+                    unmatched = [r.name for r in reqs if not r.master_product_id]
+                    if unmatched:
+                        messages.warning(
+                            request,
+                            "No raw material found for BOM line(s): " + ", ".join(unmatched),
+                        )
+
                 messages.success(request, "Calculated. You can now add products.")
 
         elif action == "add_item":
             # require Calculate first (matches your expected flow)
-            if not draft.get("show_after_calculate"):
+            if draft is None or not draft.calculated:
                 messages.error(request, "Please click Calculate first.")
             else:
                 sync_header_into_draft()
 
-                product_id = request.POST.get("product") or request.POST.get("product_to_add_id")
-                qty_raw = request.POST.get("qty") or request.POST.get("item_qty")
-
-                if not product_id:
-                    messages.error(request, "Please select a product to add.")
+                # the bound item form checks the product and that qty fits BatchItem.qty
+                if not item_form.is_valid():
+                    messages.error(request, "Please select a product and enter a valid Qty.")
+                elif item_form.cleaned_data["qty"] <= 0:
+                    messages.error(request, "Please enter Qty > 0.")
                 else:
-                    try:
-                        qty_val = float(qty_raw) if qty_raw not in (None, "",) else 0.0
-                    except ValueError:
-                        qty_val = 0.0
-
-                    if qty_val <= 0:
-                        messages.error(request, "Please enter Qty > 0.")
-                    else:
-                        p = MasterProduct.objects.filter(id=product_id).first()
-                        if not p:
-                            messages.error(request, "Invalid product selected.")
+                    product = item_form.cleaned_data["product"]
+                    qty_val = item_form.cleaned_data["qty"]
+                    with transaction.atomic():
+                        # if already exists, add to its qty (legacy-like), within BatchDraftItem.qty
+                        current = (
+                            draft.items.select_for_update()
+                            .filter(product=product)
+                            .values_list("qty", flat=True)
+                            .first()
+                        )
+                        if current is not None and current + qty_val > DRAFT_QTY_MAX:
+                            messages.error(request, f"Qty of {product} would exceed {DRAFT_QTY_MAX}.")
+                        elif current is not None:
+                            draft.items.filter(product=product).update(qty=F("qty") + qty_val)
+                            messages.success(request, "Product added.")
                         else:
-                            # if already exists, update qty (legacy-like)
-                            found = False
-                            for it in draft["items"]:
-                                if str(it["product_id"]) == str(p.id):
-                                    it["qty"] = float(it["qty"]) + qty_val
-                                    found = True
-                                    break
-                            if not found:
-                                draft["items"].append({
-                                    "product_id": p.id,
-                                    "product_name": p.name,
-                                    "qty": qty_val,
-                                })
-
-                            _draft_save(request, draft)
+                            draft.items.create(product=product, qty=qty_val)
                             messages.success(request, "Product added.")
 
         elif action == "delete_item":
-            delete_pid = request.POST.get("delete_product_id") or ""
-            if delete_pid:
-                draft["items"] = [it for it in draft["items"] if str(it["product_id"]) != str(delete_pid)]
-                _draft_save(request, draft)
+            delete_pid = request.POST.get("delete_product_id") or request.GET.get("delete_product_id") or ""
+            if draft is not None and delete_pid.isdigit():
+                draft.items.filter(product_id=delete_pid).delete()
                 messages.success(request, "Item deleted.")
 
         elif action == "start_batch":
-            # Final save: create Batch + BatchItems from draft
+            # Final save: promote the draft to Batch + BatchItems
             if not batch_form.is_valid():
                 messages.error(request, "Please fix errors before Start Batch.")
             else:
-                if not draft.get("items"):
+                items = list(draft.items.all()) if draft else []
+                if not items:
                     messages.error(request, "Please add at least one product item before Start Batch.")
                 else:
-                    batch = batch_form.save(commit=False)
-                    batch.started_at = timezone.now()
-                    batch.status = "RUNNING"
-                    batch.save()
-
-                    for it in draft["items"]:
-                        BatchItem.objects.create(
-                            batch=batch,
-                            product_id=it["product_id"],
-                            qty=it["qty"],
-                        )
-
-                    _draft_clear(request)
+                    with transaction.atomic():
+                        batch = batch_form.save(commit=False)
+                        batch.started_at = timezone.now()
+                        batch.status = "ACTIVE"
+                        batch.save()
+
+                        BatchItem.objects.bulk_create([
+                            BatchItem(batch=batch, product_id=it.product_id, qty=it.qty)
+                            for it in items
+                        ])
+                        stock.post_batch(batch)
+                        _draft_clear(request, draft)
                     messages.success(request, f"Batch #{batch.id} started.")
                     return redirect("bom_production")
 
         elif action == "clear_draft":
-            _draft_clear(request)
+            _draft_clear(request, draft)
+            messages.info(request, "Draft cleared.")
             return redirect("bom_production")
 
     # Show latest 10 batches
@@ -270,38 +396,106 @@ def bom_production(request):
         "item_form": item_form,
 
         # Draft UI flags/data
-        "show_new_product_form": bool(draft.get("show_after_calculate")),
-        "draft_items": draft.get("items", []),
+        "show_new_product_form": bool(draft and draft.calculated),
+        "draft_items": draft.items.select_related("product") if draft else [],
 
         "batches": batches,
     }
     return render(request, "operations/bom_production.html", context)
 
+RECENT_DISPATCH_LIMIT = 50
+
+
+def _skipped_items(selected_ids, assigned):
+    """
+    Why selected items were not assigned: taken by another dispatch, or
+    not found (deleted since the page was loaded). "" when none were skipped.
+    """
+    if assigned == len(selected_ids):
+        return ""
+    taken = DispatchItem.objects.filter(id__in=selected_ids).count() - assigned
+    missing = len(selected_ids) - assigned - taken
+    reasons = []
+    if taken:
+        reasons.append(f"{taken} already assigned to another dispatch")
+    if missing:
+        reasons.append(f"{missing} not found")
+    return ", ".join(reasons)
+
+
+def _assign_dispatch(request, header_form, selected_ids):
+    """
+    Create a dispatch and assign the selected pending items to it in one
+    conditional UPDATE (... WHERE dispatch_id IS NULL AND id IN (...)).
+
+    Items another planner assigned in the meantime are not touched; they
+    are reported apart from ids that no longer exist. Nothing is saved when
+    none of the items could be assigned or when the assigned load exceeds
+    the vehicle capacity.
+    Returns True when the dispatch was created.
+    """
+    now = timezone.now()
+    vehicle = header_form.cleaned_data["vehicle"]
+
+    with transaction.atomic():
+        dispatch = header_form.save(commit=False)
+        dispatch.created_at = now
+        dispatch.save()
+
+        assigned = DispatchItem.objects.filter(
+            id__in=selected_ids, dispatch__isnull=True
+        ).update(dispatch=dispatch, dispatch_date=now.date())
+        skipped = _skipped_items(selected_ids, assigned)
+
+        if not assigned:
+            transaction.set_rollback(True)
+            messages.error(request, f"Nothing was dispatched: {skipped}.")
+            return False
+
+        loaded = dispatch.items.aggregate(total=Sum("qty"))["total"] or Decimal("0")
+        if vehicle.capacity_qty and loaded > vehicle.capacity_qty:
+            transaction.set_rollback(True)
+            messages.error(
+                request,
+                f"Load {loaded} exceeds the capacity of {vehicle.number} ({vehicle.capacity_qty}). "
+                "Nothing was dispatched.",
+            )
+            return False
+
+        unstocked = stock.post_dispatch(dispatch)
+
+    if unstocked:
+        messages.warning(
+            request,
+            "No stock was booked out for products missing from the product master: "
+            + ", ".join(unstocked),
+        )
+    if skipped:
+        messages.warning(
+            request,
+            f"{len(selected_ids) - assigned} of {len(selected_ids)} selected item(s) were skipped: {skipped}.",
+        )
+    messages.success(request, f"Dispatch #{dispatch.id} created with {assigned} item(s).")
+    return True
+
+
 def dispatch_order(request):
     header_form = DispatchHeaderForm()
     load_info = None
+    dispatch_plan = None
 
     if request.method == "POST":
         action = request.POST.get("action")
 
         if action == "create_dispatch":
             header_form = DispatchHeaderForm(request.POST)
-            if header_form.is_valid():
-                dispatch = header_form.save(commit=False)
-                dispatch.created_at = timezone.now()
-                dispatch.save()
+            selected_ids = {i for i in request.POST.getlist("selected_items") if i.isdigit()}
 
-                selected_ids = request.POST.getlist("selected_items")
-                items = DispatchItem.objects.filter(
-                    id__in=selected_ids, dispatch__isnull=True
-                )
-
-                for item in items:
-                    item.dispatch = dispatch
-                    item.dispatch_date = timezone.now().date()
-                    item.save()
-
-                return redirect("dispatch_order")
+            if header_form.is_valid() and not selected_ids:
+                messages.error(request, "Please select at least one item to dispatch.")
+            elif header_form.is_valid():
+                if _assign_dispatch(request, header_form, selected_ids):
+                    return redirect("dispatch_order")
 
         elif action == "estimate_load":
             # just calculate load for selected vehicle
@@ -309,11 +503,10 @@ def dispatch_order(request):
             if header_form.is_valid():
                 vehicle = header_form.cleaned_data["vehicle"]
                 selected_ids = request.POST.getlist("selected_items")
-                items = DispatchItem.objects.filter(
+                total_qty = DispatchItem.objects.filter(
                     id__in=selected_ids, dispatch__isnull=True
-                )
-                total_qty = sum((i.qty for i in items), 0)
-                pct = float(total_qty) / float(vehicle.capacity_qty) * 100 if vehicle.capacity_qty else 0
+                ).aggregate(total=Sum("qty"))["total"] or Decimal("0")
+                pct = load_percent(total_qty, vehicle.capacity_qty)
                 load_info = {
                     "vehicle": vehicle,
                     "total_qty": total_qty,
@@ -321,13 +514,24 @@ def dispatch_order(request):
                     "percent": pct,
                 }
 
+        elif action == "auto_plan":
+            # propose loads for all pending items; each proposal is applied
+            # separately through create_dispatch
+            dispatch_plan = plan_pending()
+
     # pending rows (not dispatched yet)
-    pending_items = DispatchItem.objects.filter(dispatch__isnull=True).order_by("order_id")
+    pending_items = pending_dispatch_items(request.GET)
+
+    # latest dispatches with their load (vehicle + summed qty in one query)
+    recent_dispatches = Dispatch.objects.with_load().order_by("-created_at")[:RECENT_DISPATCH_LIMIT]
 
     context = {
         "header_form": header_form,
         "pending_items": pending_items,
         "load_info": load_info,
+        "age": age_options(request.GET),
+        "dispatch_plan": dispatch_plan,
+        "recent_dispatches": recent_dispatches,
     }
     return render(request, "operations/dispatch_order.html", context)
 
@@ -335,7 +539,8 @@ def material_inward(request):
     if request.method == "POST":
         form = MaterialInwardForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():  # the stock posting commits with it
+                form.save()
             messages.success(request, "Material inward saved.")
             return redirect("material_inward")
     else:
@@ -419,12 +624,6 @@ def split_or_cancel_order(request):
     message = ""
     error = ""
 
-    # you can adjust this filter as needed:
-    orders = (
-        Order.objects.filter(is_cancelled=False)
-        .order_by("-order_created")
-    )
-
     if request.method == "POST":
         selected_ids = request.POST.getlist("selected_orders")
         remark = (request.POST.get("remark") or "").strip()
@@ -459,12 +658,21 @@ def split_or_cancel_order(request):
                 message = f"{qs.count()} order(s) cancelled."
 
             # reload list after update
-            return redirect("split-order")
+            return redirect("split_order")
 
+    # the page is only read when it is rendered (not on a successful POST)
+    orders = keyset_page(
+        split_orders(request.GET),
+        request.GET.get("cursor"),
+        descending=request.GET.get("sort") != "-age",
+    )
     context = {
         "orders": orders,
         "message": message,
         "error": error,
+        "pager": pager(request.GET, orders),
+        "filters": SPLIT_FILTERS.context(request.GET),
+        "age": age_options(request.GET),
     }
     return render(request, "operations/split_order.html", context)
 
@@ -476,9 +684,10 @@ def material_discard(request):
     if request.method == "POST":
         form = MaterialDiscardForm(request.POST)
         if form.is_valid():
-            form.save()
-            # after save go back to dashboard (or wherever you like)
-            return redirect("dashboard")
+            with transaction.atomic():  # the stock posting commits with it
+                form.save()
+            messages.success(request, "Material discard saved.")
+            return redirect("material_discard")
     else:
         form = MaterialDiscardForm()
 
@@ -490,52 +699,132 @@ def material_discard(request):
     return render(request, "operations/material_discard.html", context)
 
 def material_inward_back(request):
-    returned_items = MaterialReturn.objects.order_by("-returned_at")
+    returned_items = with_age(
+        MaterialReturn.objects.order_by("-returned_at"), "returned_at", request.GET
+    )
 
     context = {
         "returned_items": returned_items,
         "page_title": "Inward Returned Material",
+        "age": age_options(request.GET),
     }
     return render(request, "operations/material_inward_back.html", context)
 
+STOCK_ALERTS_PAGE_SIZE = 100
+
+
+def stock_alerts(request):
+    """Products under their min stock level as of the last check_stock run, biggest shortfall first."""
+    rows = StockAlert.objects.select_related("product").order_by(
+        F("on_hand") - F("min_level"), "product__name"
+    )
+    page = Paginator(rows, STOCK_ALERTS_PAGE_SIZE).get_page(request.GET.get("page"))
+    return render(request, "operations/stock_alerts.html", {
+        "page": page,
+        "last_check": StockCheck.objects.order_by("-pk").first(),
+    })
+
+SALES_REPORT_DAYS = 30
+
+
+def _report_day(value, default):
+    try:
+        return parse_date(value or "") or default
+    except ValueError:
+        return default
+
+
+def sales_report(request):
+    """Revenue / quantity by day, product, city and sales person (rollup tables only)."""
+    today = timezone.localdate()
+    end = _report_day(request.GET.get("date_to"), today)
+    start = _report_day(request.GET.get("date_from"), end - timedelta(days=SALES_REPORT_DAYS - 1))
+    if start > end:
+        start, end = end, start
+    return render(request, "operations/sales_report.html", {
+        "start": start,
+        "end": end,
+        "totals": sales.totals(start, end),
+        "daily": sales.daily(start, end),
+        "sections": [
+            (label, list(sales.top(dimension, start, end)))
+            for dimension, label in SalesRollup.DIMENSION_CHOICES
+            if dimension != SalesRollup.ALL
+        ],
+        "top_n": sales.TOP_N,
+    })
+
+
+def incentive_payouts(request):
+    """Stored incentives per sales person for a month (read only); POST recomputes the whole month."""
+    try:
+        month = datetime.strptime(request.GET.get("month") or "", "%Y-%m").date()
+    except ValueError:
+        month = timezone.localdate().replace(day=1)
+
+    if request.method == "POST":
+        incentives.recompute([month])
+        messages.success(request, f"Incentives for {month:%B %Y} recomputed.")
+        return redirect(f"{reverse('incentive_payouts')}?month={month:%Y-%m}")
+
+    rows = list(incentives.payouts(month))
+    return render(request, "operations/incentive_payouts.html", {
+        "month": month,
+        "rows": rows,
+        "total": sum((row.amount for row in rows), Decimal("0.00")),
+        "stale": sum(1 for row in rows if row.stale_since),
+    })
+
+PRODUCT_TYPES = ("FG", "RM", "PK")
+
+
 def update_products(request):
     # Which tab? default FG
     current_type = request.GET.get("type", "FG")
-    if current_type not in ("FG", "RM", "PK"):
+    if current_type not in PRODUCT_TYPES:
         current_type = "FG"
 
     # Search query
     q = request.GET.get("q", "").strip()
 
-    products = MasterProduct.objects.filter(product_type=current_type)
-    if q:
-        products = products.filter(
-            Q(name__icontains=q) | Q(code__icontains=q)
-        )
+    products = search.filter_queryset(
+        MasterProduct.objects.filter(product_type=current_type),
+        "master_product",
+        q,
+        fallback=("name", "code"),
+    )
 
+    row_errors, raw_prices = {}, {}
     if request.method == "POST":
-        # We keep the same filter when saving
-        products = MasterProduct.objects.filter(product_type=current_type)
-        for p in products:
-            sp_field = f"selling_price_{p.id}"
-            pp_field = f"purchase_price_{p.id}"
-            sp_val = request.POST.get(sp_field)
-            pp_val = request.POST.get(pp_field)
-            if sp_val is not None and sp_val != "":
-                try:
-                    p.selling_price = sp_val
-                except ValueError:
-                    pass
-            if pp_val is not None and pp_val != "":
-                try:
-                    p.purchase_price = pp_val
-                except ValueError:
-                    pass
-            p.save()
-        # back to GET so refresh uses query params
-        return redirect(
-            f"{request.path}?type={current_type}&q={q}"
-        )
+        # validate everything first, then write only the rows that changed
+        prices, row_errors, raw_prices = parse_posted_prices(request.POST)
+        with transaction.atomic():
+            changed, missing = changed_products(
+                MasterProduct.objects.filter(product_type=current_type), prices
+            )
+            saved = save_prices(changed)
+
+        for product_id in missing:
+            messages.error(request, f"Product #{product_id} not found in {current_type}.")
+        if saved:
+            messages.success(request, f"{saved} product(s) updated.")
+        elif not row_errors:
+            messages.info(request, "No price changes to save.")
+
+        if not row_errors:
+            # back to GET so refresh uses query params
+            return redirect(
+                f"{request.path}?type={current_type}&q={q}"
+            )
+        messages.error(request, f"{len(row_errors)} product(s) have invalid prices, see the rows below.")
+
+    products = list(products.order_by("name", "id"))
+    for p in products:
+        # re-show what was typed in a rejected field, with its errors
+        p.row_errors = row_errors.get(p.id, [])
+        raw = raw_prices.get(p.id, {})
+        p.selling_input = raw.get("selling_price", p.selling_price)
+        p.purchase_input = raw.get("purchase_price", p.purchase_price)
 
     context = {
         "products": products,
@@ -544,6 +833,59 @@ def update_products(request):
     }
     return render(request, "operations/update_products.html", context)
 
+@require_POST
+def import_product_prices(request):
+    """Upload a CSV / XLSX price list (code, selling_price, purchase_price)."""
+    current_type = request.POST.get("type", "FG")
+    back = f"{reverse('update_products')}?type={current_type}"
+
+    upload = request.FILES.get("price_file")
+    if not upload:
+        messages.error(request, "Choose a price list to import.")
+        return redirect(back)
+
+    # only_type limits the import to the open tab
+    products = MasterProduct.objects.all()
+    if request.POST.get("only_type") and current_type in PRODUCT_TYPES:
+        products = products.filter(product_type=current_type)
+
+    try:
+        result = import_price_list(read_price_list(upload.file, upload.name), products)
+    except (ValueError, UnicodeDecodeError) as exc:
+        messages.error(request, f"Could not read {upload.name}: {exc}")
+        return redirect(back)
+
+    messages.success(
+        request,
+        f"{upload.name}: {result.updated} product(s) updated, {result.unchanged} unchanged "
+        f"({result.rows} row(s)).",
+    )
+    if result.unknown_codes:
+        messages.warning(
+            request,
+            f"{len(result.unknown_codes)} unknown code(s): {', '.join(result.unknown_codes[:20])}"
+            + (" ..." if len(result.unknown_codes) > 20 else ""),
+        )
+    for line, message in result.errors[:20]:
+        messages.error(request, f"Line {line}: {message}")
+    if len(result.errors) > 20:
+        messages.error(request, f"... and {len(result.errors) - 20} more error(s).")
+    return redirect(back)
+
+
+def export_product_prices(request):
+    """Price list as CSV, streamed (type=FG/RM/PK for one tab, else everything)."""
+    products = MasterProduct.objects.all()
+    current_type = request.GET.get("type")
+    if current_type in PRODUCT_TYPES:
+        products = products.filter(product_type=current_type)
+
+    filename = f"price_list_{current_type if current_type in PRODUCT_TYPES else 'all'}.csv"
+    response = StreamingHttpResponse(export_price_list(products), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 def masters_dashboard(request):
     """
     Masters home – tiles for Department, Designation, Employee Master, etc.